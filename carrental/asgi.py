@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'carrental.settings')
+# Route the hot read-only pages to cars.async_views
+os.environ.setdefault('CARRENTAL_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
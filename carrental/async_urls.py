@@ -0,0 +1,25 @@
+"""
+The same URLs with the hot read-only pages served by cars/async_views.py,
+where a sync view would hold one of the ASGI server's threads. Used as
+ROOT_URLCONF when settings.ASYNC_VIEWS is on (asgi.py turns it on).
+"""
+from django.urls import URLPattern
+
+from cars import async_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+# URL name -> async view replacing the views.py one
+ASYNC_VIEWS = {
+    'car_list': async_views.car_list,
+    'car_detail': async_views.car_detail,
+    'my_reservations': async_views.my_reservations,
+    'reservation_detail': async_views.reservation_detail,
+    'check_availability': async_views.check_availability,
+}
+
+urlpatterns = [
+    URLPattern(pattern.pattern, ASYNC_VIEWS[pattern.name], pattern.default_args, pattern.name)
+    if getattr(pattern, 'name', None) in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
@@ -89,6 +89,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN so concurrent bookings serialize
+            # (SQLite has no SELECT ... FOR UPDATE)
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -146,6 +152,44 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Seconds before the in-process availability index reloads from the database
+AVAILABILITY_INDEX_TTL = 60
+
+# Pre-rendered PDF receipts (kept out of MEDIA_ROOT, which is publicly served)
+RECEIPTS_ROOT = BASE_DIR / 'receipts'
+RECEIPT_WORKERS = 2
+# Receipts rendered concurrently (and held in memory) during a bulk export
+RECEIPT_EXPORT_WINDOW = 8
+
+# Catalog fragments are keyed by a fleet version read from the database (see
+# cars/catalog.py), so a per-process cache stays correct; a shared backend
+# (Memcached, Redis) only saves each process from filling its own.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'carmoto',
+    }
+}
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Live reservation updates over SSE (see cars/events.py). DatabaseBroker
+# reaches subscribers in every server process; LocalBroker only those in
+# the publishing one, which is enough for a single ASGI worker.
+EVENTS_BROKER = 'cars.events.DatabaseBroker'
+EVENTS_HEARTBEAT = 15  # seconds between keep-alive comments
+EVENTS_POLL_INTERVAL = 1  # seconds between DatabaseBroker polls
+EVENTS_RETENTION = 60  # seconds published events are kept
+
+# Serve the hot read-only pages with cars/async_views.py (set by asgi.py)
+ASYNC_VIEWS = os.environ.get('CARRENTAL_ASYNC_VIEWS') == '1'
+if ASYNC_VIEWS:
+    ROOT_URLCONF = 'carrental.async_urls'
+
+# Background car image processing (see cars/image_queue.py)
+IMAGE_WORKERS = 2
+IMAGE_JOB_ATTEMPTS = 3
+IMAGE_QUEUE_POLL = 30  # seconds between checks for jobs queued elsewhere
+
 # For development only
 if DEBUG:
     # This allows serving media files in development
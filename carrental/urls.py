@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
-from cars import views
+from cars import api, views
 
 urlpatterns = [
     # Default Django admin
@@ -30,6 +30,8 @@ urlpatterns = [
     
     # Admin Pages - Original
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin/dashboard/events/', views.admin_dashboard_events, name='admin_dashboard_events'),
+    path('admin/analytics/', views.analytics_report, name='admin_analytics'),
     path('admin/car/delete/<int:pk>/', views.car_delete_admin, name='car_delete_admin'),
     path('admin/reservation/<int:reservation_id>/<str:status>/', 
          views.reservation_update_status, name='reservation_update_status'),
@@ -49,11 +51,26 @@ urlpatterns = [
     path('admin/reservations/<int:reservation_id>/update/<str:status>/', 
          views.reservation_update_status, name='admin_reservation_update'),
     path('admin/reservations/<int:pk>/receipt/', views.admin_download_receipt, name='admin_download_receipt'),
+    path('admin/receipts/export/', views.export_receipts, name='export_receipts'),
+    path('admin/reservations/export/', views.export_reservations, name='export_reservations'),
+    path('admin/cars/export/', views.export_cars, name='export_cars'),
     
     # AJAX endpoints
     path('check-availability/', views.check_availability, name='check_availability'),
+    path('search-availability/', views.search_availability, name='search_availability'),
+    
+    # Server-Sent Events
+    path('my-reservations/events/', views.reservation_events, name='reservation_events'),
+    
+    # JSON API (see cars/api.py)
+    path('api/v1/session/', api.session, name='api_session'),
+    path('api/v1/cars/', api.cars, name='api_cars'),
+    path('api/v1/cars/<int:car_id>/', api.car, name='api_car'),
+    path('api/v1/reservations/', api.reservations, name='api_reservations'),
+    path('api/v1/reservations/<int:pk>/', api.reservation, name='api_reservation'),
+    path('api/v1/quotes/', api.quotes, name='api_quotes'),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=views.media, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Car, Reservation
+from .models import Car, CarDailyRollup, ImageJob, Reservation
 
 @admin.register(Car)
 class CarAdmin(admin.ModelAdmin):
@@ -13,3 +13,17 @@ class ReservationAdmin(admin.ModelAdmin):
     list_display = ('car', 'customer', 'start_date', 'end_date', 'status')  # ✅ changed approved -> status
     list_filter = ('status',)  # ✅ changed approved -> status
     search_fields = ('car__name', 'customer__username')
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('car', 'source', 'status', 'attempts', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('car', 'source', 'attempts', 'error', 'created_at', 'updated_at')
+
+
+@admin.register(CarDailyRollup)
+class CarDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('car', 'day', 'rented', 'revenue', 'bookings', 'approved', 'rejected', 'cancelled')
+    list_filter = ('day',)
+    readonly_fields = ('car', 'day', 'rented', 'revenue', 'bookings', 'approved', 'rejected', 'cancelled')
@@ -0,0 +1,283 @@
+"""
+Fleet utilization and revenue analytics from daily rollups.
+
+CarDailyRollup holds one row per car per day with activity: whether an
+approved/completed reservation had the car (rented), that day's share of
+those reservations' revenue, and how many reservations were made that day
+and how they ended up (approved, rejected, cancelled). Reports group these
+rows by car, brand or fuel type and by day, week or month, so they cost
+a query over the rollups and never touch Reservation.
+
+The Reservation signals record which days of which car a save or delete
+can have changed (RollupChange: the old and new date range, and the
+creation day). refresh() recomputes exactly those days from Reservation
+and replaces their rows; run it from cron with `manage.py refresh_rollups`
+or from the analytics page. Bulk update()s bypass the signals and must
+record their changes with mark_changed().
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from . import occupancy
+from .models import Car, CarDailyRollup, Reservation, RollupChange
+
+# Reservations that put a car on the road and earn its revenue
+RENTED_STATUSES = ('approved', 'completed')
+
+GROUPS = {
+    'car': ('car_id', 'car__brand', 'car__name'),
+    'brand': ('car__brand',),
+    'fuel_type': ('car__fuel_type',),
+}
+
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+CENT = Decimal('0.01')
+
+
+# --- Change tracking ---
+def reservation_span(reservation):
+    """
+    (car_id, start, end, created day) of a reservation, or None if those
+    fields were not loaded
+    """
+    if {'car', 'start_date', 'end_date', 'created_at'} & reservation.get_deferred_fields():
+        return None
+    if reservation.pk is None or reservation.created_at is None:
+        return None
+    return (
+        reservation.car_id, reservation.start_date, reservation.end_date,
+        timezone.localdate(reservation.created_at),
+    )
+
+
+def mark_changed(*spans):
+    """
+    Record the days touched by the given reservation spans (see
+    reservation_span) as needing a refresh
+    """
+    ranges = set()
+    for span in spans:
+        if span is None:
+            continue
+        car_id, start, end, created = span
+        ranges.add((car_id, start, end))
+        ranges.add((car_id, created, created))
+    RollupChange.objects.bulk_create([
+        RollupChange(car_id=car_id, start_date=start, end_date=end)
+        for car_id, start, end in ranges
+    ])
+
+
+def pending_changes():
+    return RollupChange.objects.count()
+
+
+# --- Refresh ---
+def _days(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def _daily_shares(amount, days):
+    # Even split in cents; the last day absorbs the rounding
+    amount = Decimal(amount or 0)
+    share = (amount / days).quantize(CENT, rounding=ROUND_DOWN)
+    return share, amount - share * (days - 1)
+
+
+def compute_rollups(car_id, days):
+    """
+    Rollup rows for one car on the given days, computed from Reservation
+    """
+    days = set(days)
+    first, last = min(days), max(days)
+    rows = Reservation.objects.filter(car_id=car_id).filter(
+        Q(start_date__lte=last, end_date__gte=first)
+        | Q(created_at__date__gte=first, created_at__date__lte=last)
+    ).values_list('start_date', 'end_date', 'created_at', 'status', 'total_amount')
+
+    totals = defaultdict(lambda: {
+        'rented': 0, 'revenue': Decimal('0'), 'bookings': 0,
+        'approved': 0, 'rejected': 0, 'cancelled': 0,
+    })
+    for start, end, created_at, status, amount in rows:
+        if status in RENTED_STATUSES:
+            rental_days = _days(start, end)
+            share, last_share = _daily_shares(amount, len(rental_days))
+            for day in rental_days:
+                if day in days:
+                    totals[day]['rented'] = 1
+                    totals[day]['revenue'] += last_share if day == end else share
+        created = timezone.localdate(created_at)
+        if created in days:
+            totals[created]['bookings'] += 1
+            if status in RENTED_STATUSES:
+                totals[created]['approved'] += 1
+            elif status in ('rejected', 'cancelled'):
+                totals[created][status] += 1
+
+    return [CarDailyRollup(car_id=car_id, day=day, **values) for day, values in totals.items()]
+
+
+def refresh(batch=500):
+    """
+    Recompute the rollups of every day with recorded changes. Returns the
+    number of (car, day) pairs refreshed.
+    """
+    refreshed = 0
+    while True:
+        changes = list(RollupChange.objects.order_by('id')[:batch])
+        if not changes:
+            return refreshed
+        days_by_car = defaultdict(set)
+        for change in changes:
+            days_by_car[change.car_id].update(_days(change.start_date, change.end_date))
+
+        with transaction.atomic():
+            existing = set(Car.objects.filter(pk__in=days_by_car).values_list('id', flat=True))
+            for car_id, days in days_by_car.items():
+                CarDailyRollup.objects.filter(car_id=car_id, day__in=days).delete()
+                if car_id in existing:
+                    CarDailyRollup.objects.bulk_create(compute_rollups(car_id, days), batch_size=1000)
+                refreshed += len(days)
+            # Changes recorded meanwhile have higher ids and wait for the next round
+            RollupChange.objects.filter(id__lte=changes[-1].id).delete()
+
+
+def rebuild():
+    """
+    Drop all rollups and recompute them from every reservation
+    """
+    with transaction.atomic():
+        CarDailyRollup.objects.all().delete()
+        RollupChange.objects.all().delete()
+        if occupancy.NUMPY_SUPPORT:
+            _rebuild_vectorized()
+            return
+        for car_id in Car.objects.values_list('id', flat=True).iterator():
+            spans = [
+                (car_id, start, end, timezone.localdate(created_at))
+                for start, end, created_at in Reservation.objects.filter(car_id=car_id).values_list(
+                    'start_date', 'end_date', 'created_at',
+                )
+            ]
+            if not spans:
+                continue
+            days = set()
+            for _, start, end, created in spans:
+                days.update(_days(start, end))
+                days.add(created)
+            CarDailyRollup.objects.bulk_create(compute_rollups(car_id, days), batch_size=1000)
+
+
+def _rebuild_vectorized(cars_per_batch=200):
+    # Batches of cars bound the cars x days matrices occupancy.py builds
+    car_ids = list(Car.objects.order_by('id').values_list('id', flat=True))
+    for offset in range(0, len(car_ids), cars_per_batch):
+        columns = occupancy.load(
+            Reservation.objects.filter(car_id__in=car_ids[offset:offset + cars_per_batch])
+        )
+        window = occupancy.span(columns)
+        if window is None:
+            continue
+        CarDailyRollup.objects.bulk_create(
+            (CarDailyRollup(**values) for values in occupancy.rollups(columns, *window)),
+            batch_size=1000,
+        )
+
+
+# --- Reports ---
+def _period_end(period, start):
+    if period == 'day':
+        return start
+    if period == 'week':
+        return start + timedelta(days=6)
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def report(start, end, group='brand', period='month'):
+    """
+    Utilization, revenue and booking outcomes per group and period between
+    start and end (inclusive), newest period first. Utilization is rented
+    car-days over the car-days the group's current cars could have been
+    rented in the part of the period inside the range.
+    """
+    columns = GROUPS[group]
+    rows = CarDailyRollup.objects.filter(day__gte=start, day__lte=end).annotate(
+        period=PERIODS[period]('day'),
+    ).values('period', *columns).annotate(
+        rented_days=Sum('rented'),
+        revenue=Sum('revenue'),
+        bookings=Sum('bookings'),
+        approved=Sum('approved'),
+        rejected=Sum('rejected'),
+        cancelled=Sum('cancelled'),
+    ).order_by('-period', '-revenue')
+
+    if group == 'car':
+        fleet = defaultdict(lambda: 1)
+    else:
+        field = columns[0].removeprefix('car__')
+        fleet = {
+            row[field]: row['cars']
+            for row in Car.objects.values(field).annotate(cars=Count('id')).order_by()
+        }
+
+    results = []
+    for row in rows:
+        period_start = row['period']
+        if hasattr(period_start, 'date'):
+            period_start = period_start.date()
+        covered = (min(end, _period_end(period, period_start)) - max(start, period_start)).days + 1
+        if group == 'car':
+            key, label = row['car_id'], f"{row['car__brand']} {row['car__name']}"
+        else:
+            key = label = row[columns[0]]
+        cars = fleet[key] if group == 'car' else fleet.get(key, 0)
+        bookings = row['bookings']
+        results.append({
+            'period': period_start,
+            'key': key,
+            'label': label,
+            'cars': cars,
+            'rented_days': row['rented_days'],
+            'utilization': row['rented_days'] / (cars * covered) if cars and covered > 0 else None,
+            'revenue': row['revenue'],
+            'bookings': bookings,
+            'approval_rate': row['approved'] / bookings if bookings else None,
+            'cancellation_rate': row['cancelled'] / bookings if bookings else None,
+            'rejection_rate': row['rejected'] / bookings if bookings else None,
+        })
+    return results
+
+
+def totals(start, end):
+    """
+    Fleet-wide figures for the range, from the rollups
+    """
+    row = CarDailyRollup.objects.filter(day__gte=start, day__lte=end).aggregate(
+        rented_days=Sum('rented'), revenue=Sum('revenue'), bookings=Sum('bookings'),
+        approved=Sum('approved'), cancelled=Sum('cancelled'),
+    )
+    cars = Car.objects.count()
+    days = (end - start).days + 1
+    bookings = row['bookings'] or 0
+    return {
+        'rented_days': row['rented_days'] or 0,
+        'revenue': row['revenue'] or Decimal('0'),
+        'bookings': bookings,
+        'utilization': (row['rented_days'] or 0) / (cars * days) if cars and days > 0 else None,
+        'approval_rate': (row['approved'] or 0) / bookings if bookings else None,
+        'cancellation_rate': (row['cancelled'] or 0) / bookings if bookings else None,
+    }
@@ -0,0 +1,510 @@
+"""
+JSON API, version 1 (mounted at /api/v1/).
+
+Cars and reservations can be listed, fetched, created and changed,
+/api/v1/quotes/ checks availability and prices for many cars and dates
+in one request, and /api/v1/session/ logs a client in. Authentication is the usual session
+cookie. Unsafe methods need the CSRF token in an X-CSRFToken header;
+GET /api/v1/session/ returns one.
+
+Responses are built straight from values() rows by a small per-resource
+field table, never from model instances. ?fields= selects what to return
+(sparse fieldsets), e.g. fields=id,status,car.brand,car.name. A relation
+name on its own ("car") stands for its default fields. Only the columns
+behind the selected fields are read, and related ones are joined into
+the same query, so a list page is a single query. A car's image is the
+URLs of its resized, metadata-free derivatives (images.py), never the
+original upload.
+
+Lists are keyset-paginated (pagination.py): follow "next"/"previous".
+?limit= sets the page size (at most MAX_LIMIT).
+
+Errors are {"error": ..., "details": ...} with a 4xx status, as with the
+other JSON endpoints.
+"""
+import json
+from datetime import date
+from functools import wraps
+
+from django.contrib.auth import authenticate, login, logout
+from django.forms.models import model_to_dict
+from django.http import Http404, HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import get_object_or_404
+
+from . import availability, pagination
+from .forms import CarForm, ReservationForm
+from .models import Car, Reservation
+from .storage import car_image_storage
+
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 100
+# Items per POST /api/v1/quotes/
+MAX_QUOTES = 100
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.details = details
+
+    def response(self):
+        body = {'error': self.message}
+        if self.details is not None:
+            body['details'] = self.details
+        return JsonResponse(body, status=self.status)
+
+
+def api_view(methods, login_required=True):
+    """
+    Restrict a view to methods, require a logged-in user and turn ApiError
+    and Http404 into JSON responses
+    """
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in methods:
+                response = ApiError(405, f"Method {request.method} not allowed").response()
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                if login_required and not request.user.is_authenticated:
+                    raise ApiError(401, "Authentication required")
+                return view(request, *args, **kwargs)
+            except ApiError as exc:
+                return exc.response()
+            except Http404:
+                return ApiError(404, "Not found").response()
+        return inner
+    return decorator
+
+
+def _require_staff(request):
+    if not request.user.is_staff:
+        raise ApiError(403, "Staff only")
+
+
+def _json_body(request):
+    try:
+        body = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError(400, "Request body must be JSON")
+    if not isinstance(body, dict):
+        raise ApiError(400, "Request body must be a JSON object")
+    return body
+
+
+# --- Serialization ---
+class Field:
+    """
+    A public field: the values() columns behind it and an optional
+    conversion to a JSON value (dates and decimals are handled by
+    DjangoJSONEncoder). With several columns, to_json gets all their
+    values.
+    """
+
+    def __init__(self, *columns, to_json=None):
+        self.columns = columns
+        self.to_json = to_json
+
+
+class Resource:
+    def __init__(self, fields, default, groups=None):
+        self.fields = fields
+        self.default = default
+        self.groups = groups or {}
+
+    def parse_fields(self, value):
+        """
+        Field names selected by a ?fields= value (the defaults if empty)
+        """
+        if not value:
+            return list(self.default)
+        names = []
+        for name in value.split(','):
+            name = name.strip()
+            if name in self.groups:
+                names.extend(self.groups[name])
+            elif name in self.fields:
+                names.append(name)
+            elif name:
+                raise ApiError(400, f"Unknown field '{name}'", {
+                    'allowed': sorted([*self.fields, *self.groups]),
+                })
+        return list(dict.fromkeys(names))
+
+    def columns(self, names):
+        # created_at and id are always read: they make up the page cursors
+        return list(dict.fromkeys([
+            'id', 'created_at', *(column for name in names for column in self.fields[name].columns),
+        ]))
+
+    def serialize(self, row, names):
+        data = {}
+        for name in names:
+            field = self.fields[name]
+            values = [row[column] for column in field.columns]
+            value = values[0]
+            if field.to_json is not None and (len(values) > 1 or value is not None):
+                value = field.to_json(*values)
+            target = data
+            *parents, leaf = name.split('.')
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[leaf] = value
+        return data
+
+
+# Derivatives (images.py) the API links to
+IMAGE_VARIANTS = ('card', 'detail')
+
+
+def _image(name, record):
+    # Only the resized, metadata-free derivatives, never the original
+    # upload. None until they are built for the current image.
+    record = record or {}
+    if not name or record.get('source') != name or not record.get('variants'):
+        return None
+    return {
+        variant: {
+            'width': data['width'],
+            'height': data['height'],
+            'urls': {fmt: car_image_storage.url(file) for fmt, file in data['files'].items()},
+        }
+        for variant, data in record['variants'].items() if variant in IMAGE_VARIANTS
+    }
+
+
+CAR_FIELDS = {
+    'id': Field('id'),
+    'brand': Field('brand'),
+    'name': Field('name'),
+    'description': Field('description'),
+    'price_per_day': Field('price_per_day'),
+    'transmission': Field('transmission'),
+    'fuel_type': Field('fuel_type'),
+    'seats': Field('seats'),
+    'is_available': Field('is_available'),
+    'image': Field('image', 'image_variants', to_json=_image),
+    'created_at': Field('created_at'),
+}
+
+CAR = Resource(
+    CAR_FIELDS,
+    default=['id', 'brand', 'name', 'price_per_day', 'transmission', 'fuel_type',
+             'seats', 'is_available', 'image'],
+)
+
+
+def _car_column(column):
+    # car_id is on the reservation row itself, no join needed
+    return 'car_id' if column == 'id' else f'car__{column}'
+
+
+RESERVATION = Resource(
+    {
+        'id': Field('id'),
+        'status': Field('status'),
+        'payment_status': Field('payment_status'),
+        'start_date': Field('start_date'),
+        'end_date': Field('end_date'),
+        'pickup_time': Field('pickup_time'),
+        'dropoff_time': Field('dropoff_time'),
+        'total_amount': Field('total_amount'),
+        'contact_email': Field('contact_email'),
+        'contact_phone': Field('contact_phone'),
+        'special_requests': Field('special_requests'),
+        'created_at': Field('created_at'),
+        'updated_at': Field('updated_at'),
+        'customer.id': Field('customer_id'),
+        'customer.username': Field('customer__username'),
+        **{
+            f'car.{name}': Field(*map(_car_column, field.columns), to_json=field.to_json)
+            for name, field in CAR_FIELDS.items()
+        },
+    },
+    default=['id', 'status', 'payment_status', 'start_date', 'end_date', 'pickup_time',
+             'dropoff_time', 'total_amount', 'car.id', 'car.brand', 'car.name'],
+    groups={
+        'car': ['car.id', 'car.brand', 'car.name'],
+        'customer': ['customer.id', 'customer.username'],
+    },
+)
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError(400, "limit must be a number")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _page_url(request, direction, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params[direction] = cursor
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+
+def serialize_page(resource, queryset, names, after=None, before=None, per_page=DEFAULT_LIMIT):
+    """
+    One keyset page of queryset as (serialized rows, KeysetPage)
+    """
+    page = pagination.paginate(
+        queryset.values(*resource.columns(names)), after=after, before=before, per_page=per_page,
+    )
+    return [resource.serialize(row, names) for row in page], page
+
+
+def list_response(request, resource, queryset):
+    data, page = serialize_page(
+        resource, queryset, resource.parse_fields(request.GET.get('fields')),
+        after=request.GET.get('after'), before=request.GET.get('before'), per_page=_limit(request),
+    )
+    return JsonResponse({
+        'data': data,
+        'next': _page_url(request, 'after', page.next_cursor),
+        'previous': _page_url(request, 'before', page.prev_cursor),
+    })
+
+
+def item_response(request, resource, queryset, status=200):
+    names = resource.parse_fields(request.GET.get('fields'))
+    row = queryset.values(*resource.columns(names)).first()
+    if row is None:
+        raise Http404
+    return JsonResponse({'data': resource.serialize(row, names)}, status=status)
+
+
+def _filter_choice(queryset, request, param, choices):
+    value = request.GET.get(param)
+    if not value:
+        return queryset
+    if value not in dict(choices):
+        raise ApiError(400, f"Invalid {param}", {'allowed': list(dict(choices))})
+    return queryset.filter(**{param: value})
+
+
+# --- Session ---
+@api_view(['GET', 'POST', 'DELETE'], login_required=False)
+def session(request):
+    """
+    GET: current user and a CSRF token. POST {"username", "password"}: log
+    in. DELETE: log out.
+    """
+    if request.method == 'POST':
+        body = _json_body(request)
+        user = authenticate(request, username=body.get('username'), password=body.get('password'))
+        if user is None:
+            raise ApiError(401, "Invalid username or password")
+        login(request, user)
+    elif request.method == 'DELETE':
+        logout(request)
+        return HttpResponse(status=204)
+
+    user = request.user
+    return JsonResponse({
+        'user': {
+            'id': user.pk, 'username': user.username, 'is_staff': user.is_staff,
+        } if user.is_authenticated else None,
+        # Rotated on login, so always hand out the current one
+        'csrf_token': get_token(request),
+    })
+
+
+# --- Cars ---
+@api_view(['GET', 'POST'])
+def cars(request):
+    """
+    GET: cars, newest first. Customers see bookable cars only; staff see
+    all and may filter with ?available=true|false. Filters: brand,
+    transmission, fuel_type. POST (staff): add a car.
+    """
+    if request.method == 'POST':
+        _require_staff(request)
+        form = CarForm(_json_body(request))
+        if not form.is_valid():
+            raise ApiError(400, "Invalid parameters", form.errors)
+        car = form.save(commit=False)
+        car.created_by = request.user
+        car.save()
+        response = item_response(request, CAR, Car.objects.filter(pk=car.pk), status=201)
+        response['Location'] = request.build_absolute_uri(f"{request.path}{car.pk}/")
+        return response
+
+    queryset = Car.objects.all()
+    if not request.user.is_staff:
+        queryset = queryset.filter(is_available=True)
+    elif request.GET.get('available') in ('true', 'false'):
+        queryset = queryset.filter(is_available=request.GET['available'] == 'true')
+    if request.GET.get('brand'):
+        queryset = queryset.filter(brand__iexact=request.GET['brand'])
+    queryset = _filter_choice(queryset, request, 'transmission', Car.TRANSMISSION_CHOICES)
+    queryset = _filter_choice(queryset, request, 'fuel_type', Car.FUEL_TYPE_CHOICES)
+    return list_response(request, CAR, queryset)
+
+
+@api_view(['GET', 'PATCH', 'DELETE'])
+def car(request, car_id):
+    """
+    GET: one car. PATCH (staff): change some of its fields. DELETE (staff).
+    """
+    if request.method == 'GET':
+        return item_response(request, CAR, Car.objects.filter(pk=car_id))
+
+    _require_staff(request)
+    instance = get_object_or_404(Car, pk=car_id)
+    if request.method == 'DELETE':
+        instance.delete()
+        return HttpResponse(status=204)
+
+    # Unsent fields keep their current values; images are uploaded through
+    # the admin pages, not as JSON
+    fields = [name for name in CarForm._meta.fields if name != 'image']
+    form = CarForm({**model_to_dict(instance, fields=fields), **_json_body(request)}, instance=instance)
+    if not form.is_valid():
+        raise ApiError(400, "Invalid parameters", form.errors)
+    form.save()
+    return item_response(request, CAR, Car.objects.filter(pk=car_id))
+
+
+# --- Reservations ---
+# Statuses staff may set (as reservation_update_status)
+STAFF_STATUSES = ('approved', 'rejected', 'completed', 'cancelled')
+
+
+@api_view(['GET', 'POST'])
+def reservations(request):
+    """
+    GET: the user's reservations (staff: everyone's, filterable by
+    ?customer= and ?car=), newest first, filterable by ?status=.
+    POST: book a car: {"car": id, "start_date", "end_date",
+    "contact_email", "contact_phone", ...}.
+    """
+    if request.method == 'POST':
+        return _book(request)
+
+    queryset = Reservation.objects.all()
+    if request.user.is_staff:
+        for param, column in (('customer', 'customer_id'), ('car', 'car_id')):
+            if request.GET.get(param):
+                if not request.GET[param].isdigit():
+                    raise ApiError(400, f"Invalid {param}")
+                queryset = queryset.filter(**{column: request.GET[param]})
+    else:
+        queryset = queryset.filter(customer=request.user)
+    queryset = _filter_choice(queryset, request, 'status', Reservation.STATUS_CHOICES)
+    return list_response(request, RESERVATION, queryset)
+
+
+def _book(request):
+    body = _json_body(request)
+    car_id = body.get('car')
+    if not isinstance(car_id, int):
+        raise ApiError(400, "Invalid parameters", {'car': ["A car id is required."]})
+    car = Car.objects.filter(pk=car_id, is_available=True).first()
+    if car is None:
+        raise ApiError(400, "Invalid parameters", {'car': ["This car can't be booked."]})
+
+    # Same default pickup/dropoff times as the booking page
+    form = ReservationForm({'pickup_time': '10:00:00', 'dropoff_time': '10:00:00', **body})
+    if not form.is_valid():
+        raise ApiError(400, "Invalid parameters", form.errors)
+    reservation = form.save(commit=False)
+    reservation.car = car
+    reservation.customer = request.user
+    reservation.total_amount = car.total_price(reservation.start_date, reservation.end_date)
+    reservation.status = 'pending'
+    try:
+        availability.book(reservation)
+    except availability.BookingConflict as exc:
+        raise ApiError(409, str(exc))
+
+    response = item_response(request, RESERVATION, Reservation.objects.filter(pk=reservation.pk), status=201)
+    response['Location'] = request.build_absolute_uri(f"{request.path}{reservation.pk}/")
+    return response
+
+
+@api_view(['GET', 'PATCH'])
+def reservation(request, pk):
+    """
+    GET: one reservation. PATCH {"status": ...}: customers may cancel their
+    pending reservations; staff may set any of STAFF_STATUSES.
+    """
+    queryset = Reservation.objects.filter(pk=pk)
+    if not request.user.is_staff:
+        queryset = queryset.filter(customer=request.user)
+    if request.method == 'GET':
+        return item_response(request, RESERVATION, queryset)
+
+    body = _json_body(request)
+    if set(body) != {'status'}:
+        raise ApiError(400, "Only status can be changed")
+    instance = get_object_or_404(queryset.select_related('car'))
+    status = body['status']
+    if request.user.is_staff:
+        if status not in STAFF_STATUSES:
+            raise ApiError(400, "Invalid status", {'allowed': list(STAFF_STATUSES)})
+    elif status != 'cancelled':
+        raise ApiError(403, "Customers can only cancel reservations")
+    elif instance.status != 'pending':
+        raise ApiError(409, "Only pending reservations can be cancelled.")
+
+    instance.status = status
+    instance.save()
+    return item_response(request, RESERVATION, queryset)
+
+
+# --- Quotes ---
+def _quote_item(item):
+    if not isinstance(item, dict):
+        raise ValueError("Each item must be an object")
+    car_id = item.get('car')
+    if not isinstance(car_id, int):
+        raise ValueError("car must be a car id")
+    try:
+        start = date.fromisoformat(item.get('start_date'))
+        end = date.fromisoformat(item.get('end_date'))
+    except (TypeError, ValueError):
+        raise ValueError("start_date and end_date must be YYYY-MM-DD dates")
+    if end < start:
+        raise ValueError("end_date must not be before start_date")
+    return car_id, start, end
+
+
+@api_view(['POST'])
+def quotes(request):
+    """
+    POST {"items": [{"car": id, "start_date", "end_date"}, ...]}: whether
+    each car is free for its dates and what it would cost, in item order,
+    answered with a fixed number of queries (availability.quote)
+    """
+    items = _json_body(request).get('items')
+    if not isinstance(items, list) or not items:
+        raise ApiError(400, "items must be a non-empty list")
+    if len(items) > MAX_QUOTES:
+        raise ApiError(400, f"At most {MAX_QUOTES} items per request")
+    parsed, errors = [], {}
+    for i, item in enumerate(items):
+        try:
+            parsed.append(_quote_item(item))
+        except ValueError as exc:
+            errors[i] = [str(exc)]
+    if errors:
+        raise ApiError(400, "Invalid parameters", {'items': errors})
+
+    data = []
+    for (car_id, start, end), result in zip(parsed, availability.quote(parsed)):
+        entry = {'car': car_id, 'start_date': start, 'end_date': end}
+        if result is None:
+            entry['error'] = "Unknown car"
+        else:
+            entry.update(result)
+        data.append(entry)
+    return JsonResponse({'data': data})
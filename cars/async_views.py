@@ -0,0 +1,144 @@
+"""
+Async versions of the hot read-only views, routed instead of the ones in
+views.py by carrental/async_urls.py when settings.ASYNC_VIEWS is on
+(asgi.py turns it on).
+
+Under ASGI a sync view holds one of the sync adapter's threads for the
+whole request; these await the async ORM instead, so a slow query no
+longer ties up a thread. Behaviour, templates and validators are the
+same as their views.py counterparts.
+
+Templates are rendered in a worker thread (render()), only for as long
+as rendering takes. They may still reach the database there, e.g. the
+car grid's queryset when its cached fragment has expired.
+"""
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.shortcuts import render as render_sync
+from django.views.decorators.cache import cache_control
+
+from . import availability, catalog, conditional, stats
+from .forms import CarSearchForm
+from .models import Car, Reservation
+
+
+async def render(request, template_name, context):
+    return await sync_to_async(render_sync)(request, template_name, context)
+
+
+# --- Car List ---
+@login_required
+async def car_list(request):
+    request.user = await request.auser()
+    search_form = CarSearchForm(request.GET or None)
+    if search_form.is_bound and search_form.is_valid():
+        cars = [car async for car in availability.search_cars(**search_form.cleaned_data)]
+        catalog_context = {}
+    else:
+        # Plain catalog: rendered from cached fragments, so on a hit this
+        # queryset is never evaluated
+        cars = Car.objects.filter(is_available=True)
+        catalog_context = catalog.context(await catalog.afleet_version())
+
+    user_reservations = [
+        reservation async for reservation in Reservation.objects.filter(
+            customer=request.user
+        ).select_related('car').only(
+            'id', 'start_date', 'end_date', 'total_amount', 'status', 'created_at',
+            'car__brand', 'car__name',
+        ).order_by('-created_at')[:5]
+    ]
+
+    return await render(request, 'cars/car_list.html', {
+        'cars': cars,
+        'search_form': search_form,
+        'user_reservations': user_reservations,
+        **catalog_context,
+    })
+
+# --- My Reservations ---
+@login_required
+@cache_control(private=True, no_cache=True)
+@conditional.acondition(etag_func=conditional.amy_reservations_etag,
+                        last_modified_func=conditional.amy_reservations_last_modified)
+async def my_reservations(request):
+    queryset = Reservation.objects.filter(
+        customer=request.user
+    ).select_related('car', 'customer').order_by('-created_at')
+
+    reservations = [reservation async for reservation in queryset]
+    for reservation in reservations:
+        reservation.rental_days = reservation.car.total_days(reservation.start_date, reservation.end_date)
+
+    reservation_stats = await stats.areservation_stats(queryset)
+
+    return await render(request, 'cars/my_reservations.html', {
+        'reservations': reservations,
+        'pending_count': reservation_stats['pending'],
+        'approved_count': reservation_stats['approved'],
+        'total_count': reservation_stats['total'],
+        'total_spent': reservation_stats['revenue'],
+    })
+
+# --- Reservation Detail ---
+@login_required
+@cache_control(private=True, no_cache=True)
+@conditional.acondition(etag_func=conditional.areservation_detail_etag,
+                        last_modified_func=conditional.areservation_detail_last_modified)
+async def reservation_detail(request, pk):
+    reservation = await aget_object_or_404(
+        Reservation.objects.select_related('car', 'customer'),
+        pk=pk,
+        customer=request.user
+    )
+
+    days = reservation.car.total_days(reservation.start_date, reservation.end_date)
+    daily_rate = reservation.car.price_per_day
+
+    return await render(request, 'cars/reservation_detail.html', {
+        'reservation': reservation,
+        'days': days,
+        'daily_rate': daily_rate,
+        'subtotal': daily_rate * days,
+        'today': date.today().isoformat(),
+    })
+
+# --- Car Details ---
+@login_required
+@cache_control(private=True, no_cache=True)
+@conditional.acondition(etag_func=conditional.acar_detail_etag,
+                        last_modified_func=conditional.acar_detail_last_modified)
+async def car_detail(request, car_id):
+    version = await catalog.afleet_version()
+    car = await catalog.aget_car(car_id, version)
+    return await render(request, 'cars/car_detail.html', {'car': car, **catalog.context(version)})
+
+# --- AJAX: Check Car Availability ---
+@login_required
+@cache_control(private=True, no_cache=True)
+@conditional.acondition(etag_func=conditional.acheck_availability_etag)
+async def check_availability(request):
+    car_id = request.GET.get('car_id')
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+
+    try:
+        car = await Car.objects.only('price_per_day').aget(id=car_id)
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+
+        stamp = await conditional.acar_reservations_stamp(request, car.id)
+        available = await availability.ais_car_available(car.id, start, end, stamp=stamp)
+
+        return JsonResponse({
+            'available': available,
+            'price_per_day': float(car.price_per_day),
+            'total_days': car.total_days(start, end),
+            'total_price': float(car.total_price(start, end))
+        })
+    except (Car.DoesNotExist, ValueError, TypeError):
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
@@ -0,0 +1,422 @@
+"""
+In-process interval index of blocking reservations.
+
+Every car keeps a list of its pending/approved bookings sorted by start
+date, together with a running maximum of end dates, so an overlap check
+is a single bisect instead of a query against the reservations table.
+The index is filled lazily from the database, kept current by the
+Reservation save/delete signals once their transaction commits (see
+signals.py; a rolled back booking never blocks the car), and reloaded
+after AVAILABILITY_INDEX_TTL seconds so writes made by other worker
+processes are picked up. Callers that read a car's change stamp
+(check_availability does, for its ETag) get that car reloaded as soon as
+another process has written to it.
+
+search_cars() is the set-based counterpart for fleet-wide searches: it
+answers "which cars are free" with one NOT EXISTS query. quote() answers
+many (car, dates) questions at once, with prices, for the JSON API.
+
+book() is the only write path for new reservations. It serializes
+bookings per car by locking the car row (SELECT ... FOR UPDATE) and
+re-checking overlaps against the database inside the transaction. SQLite
+ignores row locks, so there the database is configured for IMMEDIATE
+transactions, which take the write lock when the atomic block opens.
+"""
+import threading
+import time
+from bisect import bisect_right, insort
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from . import versions
+from .models import Car, Reservation
+
+# Reservations in these states hold the car for their date range
+BLOCKING_STATUSES = ('pending', 'approved')
+
+
+class BookingConflict(Exception):
+    """
+    Raised when a booking overlaps an existing pending/approved reservation
+    """
+
+
+class _CarIntervals:
+    """
+    Sorted (start, end, reservation_id) tuples for a single car
+    """
+
+    def __init__(self, entries=()):
+        self.entries = sorted(entries)
+        self._rebuild()
+
+    def add(self, start, end, reservation_id):
+        insort(self.entries, (start, end, reservation_id))
+        self._rebuild()
+
+    def remove(self, reservation_id):
+        self.entries = [e for e in self.entries if e[2] != reservation_id]
+        self._rebuild()
+
+    def copy(self):
+        return _CarIntervals(self.entries)
+
+    def _rebuild(self):
+        max_end, running = [], None
+        for _, end, _ in self.entries:
+            running = end if running is None or end > running else running
+            max_end.append(running)
+        self.starts = [e[0] for e in self.entries]
+        self.max_end = max_end
+
+    def overlaps(self, start, end, exclude=None):
+        """
+        True if any stored interval intersects the inclusive range [start, end]
+        """
+        i = bisect_right(self.starts, end)
+        if not i or self.max_end[i - 1] < start:
+            return False
+        if exclude is None:
+            return True
+        # Rare path: ignore one reservation (e.g. when editing it)
+        return any(
+            e[2] != exclude and e[0] <= end and e[1] >= start
+            for e in self.entries[:i]
+        )
+
+
+class AvailabilityIndex:
+    """
+    Per-process index answering "is car X free" and "which cars are free"
+    for an inclusive date range.
+
+    Lookups take no lock, so async views can ask on the event loop: a
+    car's _CarIntervals is replaced, never changed in place, and a reload
+    builds new tables off to the side and swaps them in. Writers (signal
+    hooks, refresh_car, reloads) hold _lock only while they swap; hooks
+    that arrive while a reload is querying are replayed onto its tables.
+
+    Each car remembers the change stamp of its reservations (versions.py)
+    it was loaded at. Callers that know the current stamp pass it, and a
+    car whose stamp has moved since, e.g. after a booking made through
+    another process, is reloaded before answering.
+    """
+
+    def __init__(self, ttl=None):
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._ttl = ttl
+        self._cars = {}
+        self._placed = {}  # reservation_id -> car_id
+        self._stamps = {}  # car_id -> stamp its intervals were loaded at
+        self._loaded_at = None
+        self._replay = None  # hook changes seen during a reload
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'AVAILABILITY_INDEX_TTL', 60)
+
+    @property
+    def fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def clear(self):
+        with self._lock:
+            self._cars = {}
+            self._placed = {}
+            self._stamps = {}
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        if self.fresh:
+            return
+        # While another thread reloads, a loaded index answers as it stands
+        if not self._reload_lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if not self.fresh:
+                self._reload()
+        finally:
+            self._reload_lock.release()
+
+    def _read(self):
+        """
+        (car stamps, blocking reservation rows) for a full load. Stamps are
+        read first, so a write racing the load leaves its car stale.
+        """
+        stamps = versions.car_reservation_stamps()
+        rows = Reservation.objects.filter(
+            status__in=BLOCKING_STATUSES
+        ).values_list('id', 'car_id', 'start_date', 'end_date')
+        return stamps, rows.iterator(chunk_size=2000)
+
+    def _reload(self):
+        with self._lock:
+            self._replay = []
+        try:
+            stamps, rows = self._read()
+            entries, placed = {}, {}
+            for reservation_id, car_id, start, end in rows:
+                entries.setdefault(car_id, []).append((start, end, reservation_id))
+                placed[reservation_id] = car_id
+            cars = {car_id: _CarIntervals(car_entries) for car_id, car_entries in entries.items()}
+            with self._lock:
+                for change in self._replay:
+                    self._apply(cars, placed, stamps, *change)
+                self._cars, self._placed, self._stamps = cars, placed, stamps
+                self._loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._replay = None
+
+    def _change(self, *change):
+        # Caller holds _lock
+        if self._loaded_at is not None:
+            self._apply(self._cars, self._placed, self._stamps, *change)
+        if self._replay is not None:
+            self._replay.append(change)
+
+    @staticmethod
+    def _apply(cars, placed, stamps, action, *args):
+        if action == 'car':
+            car_id, rows, stamp = args
+            for pk in [pk for pk, old_car in placed.items() if old_car == car_id]:
+                del placed[pk]
+            for pk, _, _ in rows:
+                placed[pk] = car_id
+            cars[car_id] = _CarIntervals((s, e, pk) for pk, s, e in rows)
+            stamps[car_id] = stamp
+            return
+        reservation_id = args[0]
+        car_id = placed.pop(reservation_id, None)
+        if car_id is not None and car_id in cars:
+            intervals = cars[car_id].copy()
+            intervals.remove(reservation_id)
+            cars[car_id] = intervals
+        if action == 'place':
+            _, car_id, start, end = args
+            intervals = cars[car_id].copy() if car_id in cars else _CarIntervals()
+            intervals.add(start, end, reservation_id)
+            cars[car_id] = intervals
+            placed[reservation_id] = car_id
+
+    def refresh_car(self, car_id, stamp=None):
+        """
+        Reload a single car from the database (used on the booking path
+        and when the car's stamp has moved)
+        """
+        if stamp is None:
+            stamp = versions.stamp(versions.car_reservations_key(car_id))
+        rows = list(Reservation.objects.filter(
+            car_id=car_id,
+            status__in=BLOCKING_STATUSES,
+        ).values_list('id', 'start_date', 'end_date'))
+        self._ensure_loaded()
+        with self._lock:
+            self._change('car', car_id, rows, stamp)
+
+    def _stale(self, car_id, stamp):
+        return stamp is not None and stamp > self._stamps.get(car_id, 0)
+
+    def is_available(self, car_id, start, end, exclude=None, stamp=None):
+        """
+        Whether car_id is free for [start, end]. stamp is the car's current
+        reservations stamp, when the caller has read it.
+        """
+        self._ensure_loaded()
+        if self._stale(car_id, stamp):
+            self.refresh_car(car_id, stamp)
+        return self._is_available(car_id, start, end, exclude)
+
+    def cached_is_available(self, car_id, start, end, exclude=None, stamp=None):
+        """
+        is_available() if the index can answer without (re)loading from the
+        database, else None
+        """
+        if not self.fresh or self._stale(car_id, stamp):
+            return None
+        return self._is_available(car_id, start, end, exclude)
+
+    def _is_available(self, car_id, start, end, exclude):
+        intervals = self._cars.get(car_id)
+        if intervals is None:
+            return True
+        return not intervals.overlaps(start, end, exclude=exclude)
+
+    def available_car_ids(self, car_ids, start, end):
+        """
+        Filter car_ids down to the cars that are free for [start, end]
+        """
+        self._ensure_loaded()
+        cars = self._cars
+        free = []
+        for car_id in car_ids:
+            intervals = cars.get(car_id)
+            if intervals is None or not intervals.overlaps(start, end):
+                free.append(car_id)
+        return free
+
+    # --- Signal hooks ---
+    def reservation_saved(self, reservation):
+        with self._lock:
+            if reservation.status in BLOCKING_STATUSES:
+                self._change(
+                    'place', reservation.pk, reservation.car_id, reservation.start_date, reservation.end_date,
+                )
+            else:
+                self._change('discard', reservation.pk)
+
+    def reservation_deleted(self, reservation_id):
+        with self._lock:
+            self._change('discard', reservation_id)
+
+    def reservations_unblocked(self, reservation_ids):
+        """
+        Drop reservations that stopped blocking their car in a bulk update()
+        (see lifecycle.py), which the signals above don't see
+        """
+        with self._lock:
+            for reservation_id in reservation_ids:
+                self._change('discard', reservation_id)
+
+
+index = AvailabilityIndex()
+
+
+def is_car_available(car_id, start, end, exclude=None, stamp=None):
+    return index.is_available(car_id, start, end, exclude=exclude, stamp=stamp)
+
+
+async def ais_car_available(car_id, start, end, exclude=None, stamp=None):
+    """
+    is_car_available() for async views: answered in place while the index
+    is loaded and current, in a worker thread when it has to query the
+    database
+    """
+    available = index.cached_is_available(car_id, start, end, exclude=exclude, stamp=stamp)
+    if available is None:
+        available = await sync_to_async(index.is_available)(car_id, start, end, exclude=exclude, stamp=stamp)
+    return available
+
+
+def available_car_ids(car_ids, start, end):
+    return index.available_car_ids(car_ids, start, end)
+
+
+def book(reservation):
+    """
+    Save a new reservation unless it overlaps another booking of the same car
+    """
+    start, end = reservation.start_date, reservation.end_date
+
+    # Fast rejection without taking the lock; the index may lag writes from
+    # other processes, so confirm a hit against this car's current rows
+    if not index.is_available(reservation.car_id, start, end):
+        index.refresh_car(reservation.car_id)
+        if not index.is_available(reservation.car_id, start, end):
+            raise BookingConflict("This car is already booked for the selected dates.")
+
+    with transaction.atomic():
+        # Serializes concurrent bookings of this car until commit
+        Car.objects.select_for_update().only('id').get(pk=reservation.car_id)
+        conflict = Reservation.objects.filter(
+            car_id=reservation.car_id,
+            status__in=BLOCKING_STATUSES,
+            start_date__lte=end,
+            end_date__gte=start,
+        ).exists()
+        if not conflict:
+            reservation.save()
+            return reservation
+
+    # Another worker won the race; bring this process's index up to date
+    index.refresh_car(reservation.car_id)
+    raise BookingConflict("This car was just booked for the selected dates.")
+
+
+def quote(items):
+    """
+    Availability and price for many (car_id, start, end) items, in order.
+    Unknown cars get None. Costs two queries however many items: the cars'
+    prices, and every blocking reservation overlapping any requested
+    range, which is then matched to the items in memory.
+    """
+    wanted = set(items)
+    if not wanted:
+        return []
+    car_ids = {car_id for car_id, _, _ in wanted}
+    cars = {
+        row['id']: row for row in Car.objects.filter(pk__in=car_ids).values(
+            'id', 'price_per_day', 'is_available',
+        )
+    }
+
+    overlapping = Q()
+    for car_id, start, end in wanted:
+        if car_id in cars:
+            overlapping |= Q(car_id=car_id, start_date__lte=end, end_date__gte=start)
+    booked = {}
+    if overlapping:
+        rows = Reservation.objects.filter(overlapping, status__in=BLOCKING_STATUSES).values_list(
+            'car_id', 'start_date', 'end_date',
+        )
+        for car_id, start, end in rows:
+            booked.setdefault(car_id, []).append((start, end))
+
+    # Car.total_days once per date range
+    days = {(start, end): Car.total_days(start, end) for _, start, end in wanted}
+    quotes = []
+    for car_id, start, end in items:
+        car = cars.get(car_id)
+        if car is None:
+            quotes.append(None)
+            continue
+        total_days = days[start, end]
+        quotes.append({
+            'available': car['is_available'] and not any(
+                b_start <= end and b_end >= start for b_start, b_end in booked.get(car_id, ())
+            ),
+            'price_per_day': car['price_per_day'],
+            'total_days': total_days,
+            'total_price': car['price_per_day'] * total_days,
+        })
+    return quotes
+
+
+def conflicting_reservations(start, end):
+    """
+    Blocking reservations overlapping [start, end], correlated to the outer car
+    """
+    return Reservation.objects.filter(
+        car=OuterRef('pk'),
+        status__in=BLOCKING_STATUSES,
+        start_date__lte=end,
+        end_date__gte=start,
+    )
+
+
+def search_cars(start_date=None, end_date=None, transmission=None, fuel_type=None,
+                seats=None, min_price=None, max_price=None):
+    """
+    Bookable cars matching the filters, as a single NOT EXISTS anti-join
+    against Reservation when a date range is given
+    """
+    cars = Car.objects.filter(is_available=True)
+    if transmission:
+        cars = cars.filter(transmission=transmission)
+    if fuel_type:
+        cars = cars.filter(fuel_type=fuel_type)
+    if seats:
+        cars = cars.filter(seats__gte=seats)
+    if min_price is not None:
+        cars = cars.filter(price_per_day__gte=min_price)
+    if max_price is not None:
+        cars = cars.filter(price_per_day__lte=max_price)
+    if start_date and end_date:
+        cars = cars.filter(~Exists(conflicting_reservations(start_date, end_date)))
+    return cars
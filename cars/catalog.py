@@ -0,0 +1,81 @@
+"""
+Cached car catalog for car_list and car_detail.
+
+The fleet changes a few times a day, so the catalog parts of those pages
+(the available-car grid and count, a car's detail card) are cached as
+rendered fragments, and car_detail's Car lookup as an object. Every key
+includes the fleet version, a change stamp (versions.py) bumped in the
+same transaction as any Car save/delete (signals.py), fleet import or
+derivative update (images.py). Nothing is ever deleted: a bump simply
+makes all older entries unreachable and they expire on their own. A
+cache hit therefore costs one primary-key lookup for the version.
+
+The per-user parts of the pages (greeting, user_reservations) and the
+date search, which depends on reservations, are never cached.
+
+The version is read from the database, so a bump is seen by every server
+process as soon as it commits, whatever the cache backend. A per-process
+cache (LocMem) only costs each process its own misses.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import aget_object_or_404, get_object_or_404
+
+from . import versions
+from .models import Car
+
+
+def timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def fleet_version():
+    """
+    The fleet stamp, or 1 for a fleet never bumped since stamps existed.
+    Never 0, which the templates read as "don't cache".
+    """
+    return versions.stamp(versions.fleet_key()) or 1
+
+
+async def afleet_version():
+    return (await versions.astamps(versions.fleet_key()))[versions.fleet_key()] or 1
+
+
+def bump():
+    """
+    Move the fleet to a new version, as part of the current transaction:
+    readers switch to it when the change commits, never before
+    """
+    versions.touch(versions.fleet_key())
+
+
+def context(version=None):
+    """
+    Template context for the {% cache %} fragments of the catalog pages
+    """
+    version = fleet_version() if version is None else version
+    return {'catalog_version': version, 'catalog_timeout': timeout()}
+
+
+def get_car(car_id, version=None):
+    """
+    Car by id for car_detail, from the cache when possible (404 if missing)
+    """
+    version = fleet_version() if version is None else version
+    key = f'catalog:{version}:car:{car_id}'
+    car = cache.get(key)
+    if car is None:
+        car = get_object_or_404(Car, id=car_id)
+        cache.set(key, car, timeout())
+    return car
+
+
+async def aget_car(car_id, version=None):
+    version = await afleet_version() if version is None else version
+    key = f'catalog:{version}:car:{car_id}'
+    car = cache.get(key)
+    if car is None:
+        car = await aget_object_or_404(Car, id=car_id)
+        cache.set(key, car, timeout())
+    return car
+
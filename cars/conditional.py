@@ -0,0 +1,244 @@
+"""
+Validators for conditional GET on pages customers keep refreshing.
+
+Used with django.views.decorators.http.condition, which calls them before
+the view: when the client's If-None-Match / If-Modified-Since still match,
+the response is a bare 304 and the view (queries and template) never
+runs. The ETag covers everything the page shows:
+
+- the change stamps of the data on it (versions.py), or the row's
+  updated_at for a single reservation. Both are read from the database,
+  once per request, so a change made through any server process is seen
+  by all of them.
+- the user (pages greet them by name) and their CSRF secret (forms on the
+  page embed a token derived from it, and it rotates on login)
+- today's date where the page depends on it
+
+A page with flash messages queued is always rendered, so they aren't
+swallowed by a 304.
+
+The async views (async_views.py) use acondition() instead, which accepts
+coroutine validators; the a-prefixed ones below do their lookups with the
+async ORM and then defer to the sync validator.
+"""
+import hashlib
+from datetime import date, datetime, time, timezone
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.contrib import messages
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import versions
+from .models import Reservation
+
+
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def acondition(etag_func=None, last_modified_func=None):
+    """
+    django.views.decorators.http.condition for async views. Validators may
+    be coroutine functions; plain ones are called as they are, so they must
+    not query the database. request.user is resolved before either runs.
+    """
+    async def call(func, request, *args, **kwargs):
+        if func is None:
+            return None
+        if iscoroutinefunction(func):
+            return await func(request, *args, **kwargs)
+        return func(request, *args, **kwargs)
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            request.user = await request.auser()
+            last_modified = await call(last_modified_func, request, *args, **kwargs)
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+            etag = await call(etag_func, request, *args, **kwargs)
+            etag = quote_etag(etag) if etag is not None else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+def _has_messages(request):
+    return len(messages.get_messages(request)) > 0
+
+
+def _csrf_secret(request):
+    # Makes sure the secret exists now, as rendering the page would
+    get_token(request)
+    return request.META.get('CSRF_COOKIE')
+
+
+def _start_of_today():
+    return datetime.combine(date.today(), time.min, tzinfo=timezone.utc)
+
+
+def _stamps(request, *keys):
+    # One query for the stamps a page depends on, shared by the ETag and
+    # Last-Modified checks of the same request
+    if not hasattr(request, '_stamps'):
+        request._stamps = versions.stamps(*keys)
+    return request._stamps
+
+
+async def _astamps(request, *keys):
+    if not hasattr(request, '_stamps'):
+        request._stamps = await versions.astamps(*keys)
+    return request._stamps
+
+
+def _fleet_stamp(request):
+    return _stamps(request, versions.fleet_key())[versions.fleet_key()]
+
+
+# --- my_reservations ---
+def _my_reservations_keys(request):
+    return versions.customer_reservations_key(request.user.pk), versions.fleet_key()
+
+
+def my_reservations_etag(request):
+    if _has_messages(request):
+        return None
+    customer, fleet = _stamps(request, *_my_reservations_keys(request)).values()
+    return make_etag(
+        'my_reservations', request.user.pk, customer, fleet,
+        _csrf_secret(request), date.today(),
+    )
+
+
+def my_reservations_last_modified(request):
+    if _has_messages(request):
+        return None
+    changed = versions.as_datetime(max(_stamps(request, *_my_reservations_keys(request)).values()))
+    return max(changed, _start_of_today())
+
+
+async def amy_reservations_etag(request):
+    await _astamps(request, *_my_reservations_keys(request))
+    return my_reservations_etag(request)
+
+
+async def amy_reservations_last_modified(request):
+    await _astamps(request, *_my_reservations_keys(request))
+    return my_reservations_last_modified(request)
+
+
+# --- reservation_detail ---
+def _reservation_updated_at(request, pk):
+    # One indexed lookup instead of the page's select_related query, shared
+    # by the ETag and Last-Modified checks of the same request
+    if not hasattr(request, '_reservation_updated_at'):
+        request._reservation_updated_at = Reservation.objects.filter(
+            pk=pk, customer=request.user,
+        ).values_list('updated_at', flat=True).first()
+    return request._reservation_updated_at
+
+
+async def _areservation_updated_at(request, pk):
+    if not hasattr(request, '_reservation_updated_at'):
+        request._reservation_updated_at = await Reservation.objects.filter(
+            pk=pk, customer=request.user,
+        ).values_list('updated_at', flat=True).afirst()
+    return request._reservation_updated_at
+
+
+def reservation_detail_etag(request, pk):
+    updated_at = _reservation_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    return make_etag(
+        'reservation_detail', request.user.pk, pk, updated_at.isoformat(),
+        _fleet_stamp(request), _csrf_secret(request), date.today(),
+    )
+
+
+def reservation_detail_last_modified(request, pk):
+    updated_at = _reservation_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    changed = max(updated_at, versions.as_datetime(_fleet_stamp(request)))
+    return max(changed, _start_of_today())
+
+
+async def areservation_detail_etag(request, pk):
+    await _areservation_updated_at(request, pk)
+    await _astamps(request, versions.fleet_key())
+    return reservation_detail_etag(request, pk)
+
+
+async def areservation_detail_last_modified(request, pk):
+    await _areservation_updated_at(request, pk)
+    await _astamps(request, versions.fleet_key())
+    return reservation_detail_last_modified(request, pk)
+
+
+# --- car_detail ---
+def car_detail_etag(request, car_id):
+    return make_etag('car_detail', request.user.pk, car_id, _fleet_stamp(request))
+
+
+def car_detail_last_modified(request, car_id):
+    return versions.as_datetime(_fleet_stamp(request))
+
+
+async def acar_detail_etag(request, car_id):
+    await _astamps(request, versions.fleet_key())
+    return car_detail_etag(request, car_id)
+
+
+async def acar_detail_last_modified(request, car_id):
+    await _astamps(request, versions.fleet_key())
+    return car_detail_last_modified(request, car_id)
+
+
+# --- check_availability ---
+def _availability_keys(request):
+    car_id = request.GET.get('car_id', '')
+    if car_id.isdigit():
+        return versions.fleet_key(), versions.car_reservations_key(int(car_id))
+    return (versions.fleet_key(),)
+
+
+def check_availability_etag(request):
+    # The view reloads the car in the availability index when its stamp
+    # has moved (car_reservations_stamp), so the stamps cover the answer
+    return make_etag(
+        'check_availability', request.GET.get('car_id'), request.GET.get('start_date'),
+        request.GET.get('end_date'), max(_stamps(request, *_availability_keys(request)).values()),
+    )
+
+
+def car_reservations_stamp(request, car_id):
+    """
+    The car's reservations stamp, from the lookup the validators already
+    made for this request
+    """
+    key = versions.car_reservations_key(car_id)
+    stamps = _stamps(request, *_availability_keys(request))
+    return stamps[key] if key in stamps else versions.stamp(key)
+
+
+async def acar_reservations_stamp(request, car_id):
+    key = versions.car_reservations_key(car_id)
+    stamps = await _astamps(request, *_availability_keys(request))
+    return stamps[key] if key in stamps else (await versions.astamps(key))[key]
+
+
+async def acheck_availability_etag(request):
+    await _astamps(request, *_availability_keys(request))
+    return check_availability_etag(request)
@@ -0,0 +1,399 @@
+"""
+Pub/sub for live reservation updates.
+
+Signals publish a small event after a change commits: reservation
+statuses on the channel of the customer who owns the reservation, and
+reservation rows plus changed dashboard counters on the staff dashboard
+channel. The SSE views (reservation_events, admin_dashboard_events)
+subscribe to one channel and forward what arrives.
+
+The broker is chosen by EVENTS_BROKER. DatabaseBroker, the default, is
+shared by every server process: published events go into the
+BrokerEvent table, and each process polls it every EVENTS_POLL_INTERVAL
+seconds for the subscribers it serves. LocalBroker fans out inside one
+process only, with no polling delay; it is enough for a single ASGI
+server. Subscribers also get a full snapshot when they connect, so a
+missed event only delays an update until the browser reconnects.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import stats
+from .models import BrokerEvent, FleetStats, Reservation
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per subscriber; a client that falls further behind
+# loses the oldest ones
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    """
+    One subscriber's queue, registered on creation. Must be created (and
+    read) on the event loop that serves the subscriber.
+    """
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        broker._add(self)
+
+    def offer(self, event):
+        # Runs on self.loop
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """
+        Next event, or None if nothing arrived within timeout seconds
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker._remove(self)
+
+
+class LocalBroker:
+    """
+    In-process broker. publish() is thread-safe and may be called from
+    sync code (request threads, signal handlers); delivery happens on each
+    subscriber's event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def _add(self, subscription):
+        with self._lock:
+            self._subscriptions[subscription.channel].add(subscription)
+
+    def _remove(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def subscribe(self, channel):
+        return Subscription(self, channel)
+
+    def has_subscribers(self, channel):
+        """
+        Whether publishing on channel can reach anyone. Lets publishers skip
+        building events nobody listens to; a shared broker, which can't
+        see other processes' subscribers, should always return True.
+        """
+        return self.subscriber_count(channel) > 0
+
+    def publish(self, channel, event):
+        self._deliver(channel, event)
+
+    def _deliver(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Its loop has shut down
+                self._remove(subscription)
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscriptions.get(channel, ()))
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+class DatabaseBroker(LocalBroker):
+    """
+    Broker shared by every server process through the BrokerEvent table.
+    publish() inserts a row; a poller thread in each process reads the
+    rows added since its last poll and hands them to that process's
+    subscribers. With poll_interval=0 no thread is started and poll()
+    must be called by hand.
+    """
+
+    # Each poll looks this far behind the previous one, for rows that
+    # committed late or were stamped by a slower clock
+    OVERLAP = timedelta(seconds=5)
+
+    def __init__(self, poll_interval=None):
+        super().__init__()
+        if poll_interval is None:
+            poll_interval = getattr(settings, 'EVENTS_POLL_INTERVAL', 1)
+        self.poll_interval = poll_interval
+        self._since = None
+        self._seen = {}  # event id -> created_at, for the overlap
+        self._pruned_at = None
+        self._poll_lock = threading.Lock()
+        self._poller = None
+        self._poller_lock = threading.Lock()
+
+    def subscribe(self, channel):
+        with self._lock:
+            if self._since is None:
+                self._since = timezone.now()
+        subscription = super().subscribe(channel)
+        self._start_polling()
+        return subscription
+
+    def has_subscribers(self, channel):
+        # Other processes' subscribers can't be counted from here
+        return True
+
+    def publish(self, channel, event):
+        BrokerEvent.objects.create(channel=channel, payload=json.dumps(event, cls=DjangoJSONEncoder))
+
+    def poll(self):
+        """
+        Deliver the events published since the last poll to this process's
+        subscribers. Returns how many were delivered.
+        """
+        with self._poll_lock:
+            with self._lock:
+                since = self._since
+                if not self._subscriptions:
+                    # Nobody listening: start afresh with the next subscriber
+                    self._since, self._seen = None, {}
+                    since = None
+            if since is None:
+                return 0
+            now = timezone.now()
+            rows = BrokerEvent.objects.filter(created_at__gte=since - self.OVERLAP).order_by('id').values_list(
+                'id', 'channel', 'payload', 'created_at',
+            )
+            delivered = 0
+            for event_id, channel, payload, created_at in rows:
+                if event_id in self._seen:
+                    continue
+                self._seen[event_id] = created_at
+                self._deliver(channel, tuple(json.loads(payload)))
+                delivered += 1
+            with self._lock:
+                if self._since is not None:
+                    self._since = now
+            cutoff = now - self.OVERLAP
+            self._seen = {event_id: at for event_id, at in self._seen.items() if at >= cutoff}
+            self._prune(now)
+            return delivered
+
+    def _prune(self, now):
+        retention = timedelta(seconds=getattr(settings, 'EVENTS_RETENTION', 60))
+        if self._pruned_at is None or now - self._pruned_at > retention:
+            BrokerEvent.objects.filter(created_at__lt=now - retention - self.OVERLAP).delete()
+            self._pruned_at = now
+
+    def _start_polling(self):
+        if not self.poll_interval:
+            return
+        with self._poller_lock:
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_forever, name='events-poller', daemon=True)
+                self._poller.start()
+
+    def _poll_forever(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Polling for events failed")
+            finally:
+                close_old_connections()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, 'EVENTS_BROKER', 'cars.events.DatabaseBroker'))()
+        return _broker
+
+
+def reservations_channel(user_id):
+    return f'reservations:{user_id}'
+
+
+DASHBOARD_CHANNEL = 'dashboard'
+
+
+def reservation_event(reservation):
+    return {
+        'id': reservation.pk,
+        'status': reservation.status,
+        'status_display': reservation.get_status_display(),
+        'payment_status': reservation.payment_status,
+    }
+
+
+def deleted_event(reservation_id):
+    return {'id': reservation_id, 'status': 'deleted', 'status_display': 'Removed', 'payment_status': None}
+
+
+def publish_reservation(reservation):
+    broker().publish(reservations_channel(reservation.customer_id), ('status', reservation_event(reservation)))
+
+
+def publish_reservation_deleted(reservation_id, customer_id):
+    broker().publish(reservations_channel(customer_id), ('status', deleted_event(reservation_id)))
+
+
+# --- Admin dashboard feed ---
+# Rows the dashboard's "Recent reservations" table shows
+DASHBOARD_ROWS = 10
+
+STATUS_DISPLAY = dict(Reservation.STATUS_CHOICES)
+
+
+def dashboard_rows(queryset, limit=None):
+    """
+    Table rows for the dashboard, newest first, in one query
+    """
+    rows = queryset.order_by('-created_at', '-id').values(
+        'id', 'customer__username', 'car__brand', 'car__name',
+        'start_date', 'end_date', 'total_amount', 'status',
+    )[:limit]
+    return [{
+        'id': row['id'],
+        'customer': row['customer__username'],
+        'car': f"{row['car__brand']} {row['car__name']}",
+        'dates': f"{row['start_date']:%b %d} – {row['end_date']:%b %d, %Y}",
+        'total_amount': f"{row['total_amount'] or 0:.2f}",
+        'status': row['status'],
+        'status_display': STATUS_DISPLAY.get(row['status'], row['status'].title()),
+    } for row in rows]
+
+
+def publish_dashboard_reservation(reservation_id):
+    if not broker().has_subscribers(DASHBOARD_CHANNEL):
+        return
+    rows = dashboard_rows(Reservation.objects.filter(pk=reservation_id))
+    if rows:
+        broker().publish(DASHBOARD_CHANNEL, ('reservation', rows[0]))
+
+
+def publish_dashboard_reservation_deleted(reservation_id):
+    broker().publish(DASHBOARD_CHANNEL, ('reservation', deleted_event(reservation_id)))
+
+
+def publish_status_changes(rows):
+    """
+    Status events for reservations changed by a bulk update(), from
+    values() rows with id, customer_id, status and payment_status
+    """
+    for row in rows:
+        broker().publish(reservations_channel(row['customer_id']), ('status', {
+            'id': row['id'],
+            'status': row['status'],
+            'status_display': STATUS_DISPLAY.get(row['status'], row['status'].title()),
+            'payment_status': row['payment_status'],
+        }))
+
+
+def publish_dashboard_reservations(reservation_ids):
+    """
+    publish_dashboard_reservation() for many reservations in one query
+    """
+    if not reservation_ids or not broker().has_subscribers(DASHBOARD_CHANNEL):
+        return
+    for row in dashboard_rows(Reservation.objects.filter(pk__in=reservation_ids)):
+        broker().publish(DASHBOARD_CHANNEL, ('reservation', row))
+
+
+def publish_counters(fields):
+    """
+    Current values of the given FleetStats counters, read after commit so
+    they include every change of the transaction
+    """
+    if not fields or not broker().has_subscribers(DASHBOARD_CHANNEL):
+        return
+    counters = FleetStats.objects.filter(pk=1).values(*fields).first()
+    if counters:
+        broker().publish(DASHBOARD_CHANNEL, ('counters', counters))
+
+
+def dashboard_snapshot():
+    return {
+        'counters': stats.dashboard_stats(),
+        'reservations': dashboard_rows(Reservation.objects.all(), limit=DASHBOARD_ROWS),
+    }
+
+
+# --- Server-Sent Events ---
+def format_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def stream(channel, snapshot, live=True):
+    """
+    SSE body: the result of awaiting snapshot() as a 'snapshot' event, then
+    each event published on channel as it arrives, with a comment line
+    every EVENTS_HEARTBEAT seconds so proxies keep the connection open and
+    dead clients are noticed. With live=False only the snapshot is sent
+    and the browser asks again after EVENTS_FALLBACK_RETRY_MS.
+    """
+    heartbeat = getattr(settings, 'EVENTS_HEARTBEAT', 15)
+    if live:
+        retry = getattr(settings, 'EVENTS_RETRY_MS', 5000)
+    else:
+        retry = getattr(settings, 'EVENTS_FALLBACK_RETRY_MS', 30000)
+    # Subscribe before reading the snapshot so no change falls in between
+    subscription = broker().subscribe(channel) if live else None
+    try:
+        yield f"retry: {retry}\n\n"
+        yield format_event('snapshot', await snapshot())
+        while subscription is not None:
+            event = await subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield format_event(*event)
+    finally:
+        if subscription is not None:
+            subscription.close()
+
+
+def reservation_stream(user_id, live=True):
+    """
+    A customer's reservation statuses: all of them, then each change
+    """
+    async def snapshot():
+        reservations = Reservation.objects.filter(customer_id=user_id).only(
+            'id', 'customer_id', 'status', 'payment_status',
+        ).order_by('id')
+        return [reservation_event(r) async for r in reservations]
+    return stream(reservations_channel(user_id), snapshot, live=live)
+
+
+def dashboard_stream(live=True):
+    """
+    The staff dashboard's counters and recent reservations, then each
+    new or changed reservation and counter
+    """
+    return stream(DASHBOARD_CHANNEL, sync_to_async(dashboard_snapshot), live=live)
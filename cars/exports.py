@@ -0,0 +1,113 @@
+"""
+Streaming exports for staff.
+
+Archives and row exports are produced as generators of chunks for
+StreamingHttpResponse, so the first bytes go out immediately and nothing
+is assembled in memory first.
+"""
+import csv
+import re
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class _Sink:
+    """
+    Write-only file object; ZipFile writes into it and the generator
+    drains whatever has accumulated after each entry
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def zip_stream(files):
+    """
+    Yield a ZIP archive of (filename, bytes) pairs chunk by chunk. Entries
+    are stored uncompressed: PDFs are already compressed internally.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for filename, data in files:
+            archive.writestr(filename, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+# --- Row exports (CSV / JSON Lines) ---
+class _Echo:
+    """
+    File object whose write() hands the data back, so csv.writer produces
+    strings instead of writing them anywhere
+    """
+
+    def write(self, value):
+        return value
+
+
+# Spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# ...but a leading + or - on a phone number or plain number is just a sign
+_SIGNED_NUMBER = re.compile(r'[+-][\d\s().-]*')
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if (isinstance(value, str) and value[:1] in FORMULA_PREFIXES
+            and not _SIGNED_NUMBER.fullmatch(value)):
+        return "'" + value
+    return value
+
+
+def _batched(lines, batch):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= batch:
+            yield ''.join(chunk)
+            chunk.clear()
+    if chunk:
+        yield ''.join(chunk)
+
+
+def csv_stream(fields, rows, batch=500):
+    """
+    Yield CSV text for values() rows with the given fields, header first,
+    a batch of lines per chunk
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    yield from _batched(
+        (writer.writerow([_cell(row[field]) for field in fields]) for row in rows), batch,
+    )
+
+
+def jsonl_stream(fields, rows, batch=500):
+    """
+    Yield JSON Lines for values() rows, one object per line with the given
+    fields in order, a batch of lines per chunk
+    """
+    encoder = DjangoJSONEncoder()
+    yield from _batched(
+        (encoder.encode({field: row[field] for field in fields}) + '\n' for row in rows), batch,
+    )
@@ -49,4 +49,106 @@ class ReservationForm(forms.ModelForm):
             if end_date <= start_date:
                 raise forms.ValidationError("End date must be after start date.")
         
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+class DateRangeMixin:
+    """
+    Form mixin rejecting an end_date before the start_date, when both are
+    given
+    """
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        
+        if start_date and end_date and end_date < start_date:
+            raise forms.ValidationError("End date must not be before start date.")
+        
+        return cleaned_data
+
+
+class CarSearchForm(DateRangeMixin, forms.Form):
+    start_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    transmission = forms.ChoiceField(
+        required=False, choices=[('', 'Any transmission')] + Car.TRANSMISSION_CHOICES
+    )
+    fuel_type = forms.ChoiceField(
+        required=False, choices=[('', 'Any fuel')] + Car.FUEL_TYPE_CHOICES
+    )
+    seats = forms.IntegerField(required=False, min_value=1)  # minimum seats
+    min_price = forms.DecimalField(required=False, min_value=0, decimal_places=2)
+    max_price = forms.DecimalField(required=False, min_value=0, decimal_places=2)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        min_price = cleaned_data.get('min_price')
+        max_price = cleaned_data.get('max_price')
+        
+        if bool(start_date) != bool(end_date):
+            raise forms.ValidationError("Provide both a start and an end date.")
+        
+        if min_price is not None and max_price is not None and max_price < min_price:
+            raise forms.ValidationError("Maximum price must not be below minimum price.")
+        
+        return cleaned_data
+
+
+class ReceiptExportForm(DateRangeMixin, forms.Form):
+    start_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    status = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Approved and completed'), ('approved', 'Approved'), ('completed', 'Completed')],
+    )
+
+
+class AnalyticsForm(DateRangeMixin, forms.Form):
+    start_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    group = forms.ChoiceField(
+        choices=[('brand', 'Brand'), ('fuel_type', 'Fuel type'), ('car', 'Car')],
+    )
+    period = forms.ChoiceField(
+        choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')],
+    )
+    
+    # Reports are a query over the rollups, but keep the table readable
+    MAX_DAYS = 731
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        
+        if start_date and end_date and (end_date - start_date).days >= self.MAX_DAYS:
+            raise forms.ValidationError("Choose a range of at most two years.")
+        
+        return cleaned_data
+
+
+EXPORT_FORMAT_CHOICES = [('csv', 'CSV'), ('jsonl', 'JSON Lines')]
+
+
+class ReservationExportForm(DateRangeMixin, forms.Form):
+    format = forms.ChoiceField(choices=EXPORT_FORMAT_CHOICES)
+    status = forms.ChoiceField(
+        required=False, choices=[('', 'All statuses')] + Reservation.STATUS_CHOICES
+    )
+    # Rental start date range, as for the receipt export
+    start_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+
+class CarExportForm(DateRangeMixin, forms.Form):
+    format = forms.ChoiceField(choices=EXPORT_FORMAT_CHOICES)
+    status = forms.ChoiceField(
+        required=False,
+        choices=[('', 'All cars'), ('available', 'Available'), ('unavailable', 'Unavailable')],
+    )
+    # Date the car was added
+    start_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
@@ -0,0 +1,134 @@
+"""
+Background processing of car image uploads.
+
+Saving a car with a new image only records an ImageJob row; decoding,
+orientation fix, metadata stripping and variant encoding (images.py)
+happen on a small pool of worker threads in the same process, so the
+upload request returns as soon as the file is stored. Pages show a
+placeholder until the car's image_variants match its image.
+
+The job table is the queue: workers claim the oldest pending row with a
+conditional UPDATE, so several server processes can share it safely.
+Jobs left pending by a restart are picked up by the next poll, and
+process_image_jobs drains the queue from the command line.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import images
+from .models import Car, ImageJob
+
+logger = logging.getLogger(__name__)
+
+# A job still 'running' after this long belonged to a worker that died
+STALE_AFTER = timedelta(minutes=10)
+
+_wakeup = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def enqueue(car):
+    """
+    Queue a derivative build for car's current image and wake the pool
+    once the surrounding transaction commits
+    """
+    job, _ = ImageJob.objects.get_or_create(
+        car=car, source=car.image.name, status='pending',
+    )
+    transaction.on_commit(start_workers)
+    return job
+
+
+def start_workers():
+    with _workers_lock:
+        _workers[:] = [worker for worker in _workers if worker.is_alive()]
+        if not _workers:
+            requeue_stale()
+            for i in range(getattr(settings, 'IMAGE_WORKERS', 2)):
+                worker = threading.Thread(target=_work, name=f'image-worker-{i}', daemon=True)
+                worker.start()
+                _workers.append(worker)
+    _wakeup.set()
+
+
+def _work():
+    poll = getattr(settings, 'IMAGE_QUEUE_POLL', 30)
+    while True:
+        _wakeup.wait(timeout=poll)
+        _wakeup.clear()
+        try:
+            while run_next():
+                pass
+        except Exception:
+            logger.exception("Image worker failed")
+        finally:
+            close_old_connections()
+
+
+def requeue_stale():
+    return ImageJob.objects.filter(
+        status='running', updated_at__lt=timezone.now() - STALE_AFTER,
+    ).update(status='pending', updated_at=timezone.now())
+
+
+def claim():
+    """
+    Mark the oldest pending job as running and return it (None if the
+    queue is empty)
+    """
+    while True:
+        job = ImageJob.objects.filter(status='pending').order_by('created_at', 'id').first()
+        if job is None:
+            return None
+        claimed = ImageJob.objects.filter(pk=job.pk, status='pending').update(
+            status='running', attempts=F('attempts') + 1, updated_at=timezone.now(),
+        )
+        if claimed:
+            job.status = 'running'
+            job.attempts += 1
+            return job
+        # Another worker got there first
+
+
+def run_next():
+    """
+    Process one job. Returns False when there was nothing to do.
+    """
+    job = claim()
+    if job is None:
+        return False
+    try:
+        process(job)
+    except Exception as exc:
+        logger.exception("Image job %s failed", job.pk)
+        retry = job.attempts < getattr(settings, 'IMAGE_JOB_ATTEMPTS', 3)
+        finish(job, 'pending' if retry else 'failed', error=str(exc))
+    return True
+
+
+def process(job):
+    car = Car.objects.only('id', 'image', 'image_variants').filter(pk=job.car_id).first()
+    if car is None or car.image.name != job.source:
+        # Car deleted or image replaced since; the newer upload has its own job
+        finish(job, 'done')
+        return
+    record = images.process_car_image(car)
+    if record.get('source') == job.source and not record.get('variants'):
+        finish(job, 'failed', error=f"Could not decode {job.source}")
+    else:
+        finish(job, 'done')
+
+
+def finish(job, status, error=''):
+    ImageJob.objects.filter(pk=job.pk).update(
+        status=status, error=error, updated_at=timezone.now(),
+    )
+    job.status = status
+    job.error = error
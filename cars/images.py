@@ -0,0 +1,204 @@
+"""
+Resized, recompressed derivatives of Car.image.
+
+Uploads are kept as-is, but pages never serve them directly. After an
+upload, a background job (image_queue.py) writes each variant below to
+car_images/derived/<source digest>/ as AVIF, WebP and JPEG (whichever
+this Pillow build can encode), never upscaled, and records the result on
+Car.image_variants:
+
+    {'source': 'car_images/3f/3fa1...jpg',
+     'variants': {'card': {'width': 480, 'height': 320,
+                           'files': {'webp': 'car_images/derived/3fa1.../9c/9c02...webp', ...}}}}
+
+The car_picture template tag turns that into <picture>/srcset markup.
+Recording the files on the row means rendering a list page costs no
+storage lookups, and a mismatched 'source' tells us the image changed.
+
+Sources and derivatives live in the content-addressed storage
+(storage.py), so cars sharing a photo share its derivatives too, and
+release() only deletes files once no car uses them. Each source gets its
+own derivatives directory: two uploads that differ only in metadata
+decode to the same pixels, and their derivatives must not share files.
+"""
+import logging
+import os
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile, File
+from django.db.models import Q
+from PIL import Image, ImageOps, features
+
+from . import catalog
+from .models import Car
+from .storage import car_image_storage, name_digest
+
+logger = logging.getLogger(__name__)
+
+# Target widths; each page picks the one that fits its slot
+VARIANTS = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 1200,
+}
+
+# Preferred first; JPEG is the <img> fallback every browser can show
+FORMATS = [
+    fmt for fmt, available in (
+        ('avif', features.check('avif')),
+        ('webp', features.check('webp')),
+        ('jpeg', True),
+    ) if available
+]
+
+CONTENT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+SAVE_OPTIONS = {
+    'avif': {'format': 'AVIF', 'quality': 55},
+    'webp': {'format': 'WEBP', 'quality': 78, 'method': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True},
+}
+
+
+def open_source(source_name):
+    """
+    The uploaded image, upright (EXIF orientation applied), in RGB and
+    stripped of EXIF/XMP metadata (camera details, GPS position). Only the
+    colour profile is kept.
+    """
+    with car_image_storage.open(source_name, 'rb') as source:
+        image = Image.open(source)
+        image.load()
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+        icc_profile = image.info.get('icc_profile')
+        image.info = {'icc_profile': icc_profile} if icc_profile else {}
+        return image
+
+
+def encode(image, fmt):
+    buffer = BytesIO()
+    options = dict(SAVE_OPTIONS[fmt])
+    if 'icc_profile' in image.info:
+        options['icc_profile'] = image.info['icc_profile']
+    image.save(buffer, exif=b'', **options)
+    return buffer.getvalue()
+
+
+def build_variants(source_name):
+    """
+    Write every variant of source_name and return the image_variants
+    record (with no variants if the upload can't be decoded)
+    """
+    try:
+        original = open_source(source_name)
+    except (OSError, Image.DecompressionBombError):
+        logger.exception("Could not read car image %s", source_name)
+        # Remember the failure so every later save doesn't retry it
+        return {'source': source_name, 'variants': {}}
+
+    directory = posixpath.join('car_images', 'derived', name_digest(source_name))
+    variants = {}
+    for variant, width in VARIANTS.items():
+        image = original
+        if original.width > width:
+            height = round(original.height * width / original.width)
+            image = original.resize((width, height), Image.Resampling.LANCZOS)
+        files = {}
+        for fmt in FORMATS:
+            name = posixpath.join(directory, f"{variant}.{'jpg' if fmt == 'jpeg' else fmt}")
+            files[fmt] = car_image_storage.save(name, ContentFile(encode(image, fmt)))
+        variants[variant] = {'width': image.width, 'height': image.height, 'files': files}
+    return {'source': source_name, 'variants': variants}
+
+
+def import_image(path):
+    """
+    Store a local image file as a car image and build its variants.
+    Returns (stored name, image_variants record). Runs in import_fleet's
+    worker processes.
+    """
+    with open(path, 'rb') as source:
+        name = car_image_storage.save(
+            posixpath.join('car_images', os.path.basename(path)), File(source),
+        )
+    return name, build_variants(name)
+
+
+def release(name=None, record=None):
+    """
+    Delete the image blob `name` and the derivatives in the image_variants
+    `record` unless some car still uses that image. Call after commit.
+    """
+    source = (record or {}).get('source')
+    wanted = [image for image in (name, source) if image]
+    if not wanted:
+        return
+    in_use = set(Car.objects.filter(image__in=wanted).values_list('image', flat=True))
+    if name and name not in in_use:
+        car_image_storage.delete(name)
+    if source and source not in in_use:
+        for variant in record.get('variants', {}).values():
+            for derived in variant['files'].values():
+                car_image_storage.delete(derived)
+
+
+def shared_record(car, source):
+    """
+    Derivatives another car already has for the same image, if any
+    """
+    others = Car.objects.filter(image=source).exclude(pk=car.pk).values_list('image_variants', flat=True)
+    for record in others:
+        if record and record.get('source') == source and record.get('variants'):
+            return record
+    return None
+
+
+def needs_processing(car):
+    source = car.image.name if car.image else None
+    return source != (car.image_variants or {}).get('source')
+
+
+def process_car_image(car):
+    """
+    Bring car.image_variants in line with car.image: build (or share)
+    derivatives for a new upload and release those of a replaced one
+    """
+    if not needs_processing(car):
+        return car.image_variants
+    old = car.image_variants
+    source = car.image.name if car.image else ''
+    record = (shared_record(car, source) or build_variants(source)) if source else {}
+    # update() so the save signals don't run again. Matching on the image
+    # keeps a slow build from overwriting the record of a newer upload.
+    rows = type(car).objects.filter(pk=car.pk)
+    rows = rows.filter(image=source) if source else rows.filter(Q(image='') | Q(image__isnull=True))
+    updated = rows.update(image_variants=record)
+    if not updated:
+        release(record=record)
+        return record
+    if old and old.get('source') != source:
+        release(record=old)
+    car.image_variants = record
+    catalog.bump()
+    return record
+
+
+def srcset(record, fmt):
+    """
+    "url 160w, url 480w, ..." for one format
+    """
+    entries = []
+    widths = set()
+    for variant in (record or {}).get('variants', {}).values():
+        name = variant['files'].get(fmt)
+        # Small uploads aren't upscaled, so variants can share a width
+        if name and variant['width'] not in widths:
+            widths.add(variant['width'])
+            entries.append(f"{car_image_storage.url(name)} {variant['width']}w")
+    return ', '.join(entries)
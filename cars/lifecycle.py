@@ -0,0 +1,132 @@
+"""
+Scheduled reservation status changes.
+
+Staff approve, reject and complete reservations one at a time, so rentals
+that have ended stay approved and requests nobody answered stay pending
+(and keep blocking the car). `manage.py reservation_lifecycle`, run daily
+from cron, moves them along:
+
+- approved reservations whose end date has passed become completed
+- pending reservations become cancelled once their start date has passed
+  or they are older than RESERVATION_PENDING_DAYS (default 7)
+
+Each batch is one SELECT of the columns needed and one UPDATE ... WHERE
+id IN (...), in its own transaction. update() skips the Reservation
+signals, so each batch does their work from the selected rows: FleetStats
+deltas, rollup changes and change stamps, and on commit the availability
+index, live events and stored receipts.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import analytics, availability, events, receipts, stats, versions
+from .models import Reservation
+
+BATCH_SIZE = 500
+COLUMNS = ('id', 'car_id', 'customer_id', 'start_date', 'end_date', 'created_at', 'status',
+           'payment_status', 'total_amount')
+
+
+def pending_days():
+    return getattr(settings, 'RESERVATION_PENDING_DAYS', 7)
+
+
+def due_completion(today=None):
+    """
+    Approved reservations whose rental has ended
+    """
+    today = today or timezone.localdate()
+    return Reservation.objects.filter(status='approved', end_date__lt=today)
+
+
+def due_expiry(today=None, days=None):
+    """
+    Pending reservations whose start date has passed or that have waited
+    longer than `days`
+    """
+    today = today or timezone.localdate()
+    days = pending_days() if days is None else days
+    return Reservation.objects.filter(status='pending').filter(
+        Q(start_date__lt=today) | Q(created_at__lt=timezone.now() - timedelta(days=days))
+    )
+
+
+def complete_finished(today=None, batch_size=BATCH_SIZE):
+    return transition(due_completion(today), 'completed', batch_size)
+
+
+def expire_pending(today=None, days=None, batch_size=BATCH_SIZE):
+    return transition(due_expiry(today, days), 'cancelled', batch_size)
+
+
+def transition(queryset, status, batch_size=BATCH_SIZE):
+    """
+    Set every reservation in queryset to status, batch_size per
+    transaction. The queryset must stop matching a reservation once it has
+    the new status. Returns how many were changed.
+    """
+    changed = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update().order_by('id').values(*COLUMNS)[:batch_size]
+            )
+            if not rows:
+                return changed
+            Reservation.objects.filter(pk__in=[row['id'] for row in rows]).update(
+                status=status, updated_at=timezone.now(),
+            )
+            _sync(rows, status)
+        changed += len(rows)
+
+
+def _total(contributions):
+    total = {}
+    for counts in contributions:
+        for field, value in counts.items():
+            total[field] = total.get(field, 0) + value
+    return total
+
+
+def _sync(rows, status):
+    """
+    What the Reservation save signals would have done for these rows
+    (values() dicts from before the update) moving to status
+    """
+    counters = stats.apply_change(
+        _total(stats.reservation_contribution(row['status'], row['total_amount']) for row in rows),
+        _total(stats.reservation_contribution(status, row['total_amount']) for row in rows),
+    )
+    analytics.mark_changed(*(
+        (row['car_id'], row['start_date'], row['end_date'], timezone.localdate(row['created_at']))
+        for row in rows
+    ))
+
+    unblocked = [
+        row['id'] for row in rows
+        if row['status'] in availability.BLOCKING_STATUSES
+        and status not in availability.BLOCKING_STATUSES
+    ]
+    versions.touch(
+        *(versions.customer_reservations_key(row['customer_id']) for row in rows),
+        *(versions.car_reservations_key(row['car_id']) for row in rows),
+    )
+    # Receipts show the status: drop the stored ones, they render again on demand
+    stale_receipts = [
+        row['id'] for row in rows
+        if row['status'] in receipts.RECEIPT_STATUSES or status in receipts.RECEIPT_STATUSES
+    ]
+    changes = [dict(row, status=status) for row in rows]
+
+    def after_commit():
+        availability.index.reservations_unblocked(unblocked)
+        events.publish_status_changes(changes)
+        events.publish_dashboard_reservations([row['id'] for row in rows])
+        events.publish_counters(counters)
+        for reservation_id in stale_receipts:
+            receipts.invalidate(reservation_id)
+    transaction.on_commit(after_commit)
@@ -0,0 +1,131 @@
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core import serializers
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from cars import api
+from cars.models import Car, Reservation
+
+BENCH_ALIAS = 'api_benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the JSON API serializer (cars/api.py) with django.core.serializers "
+        "on one page of reservations and cars: time, payload size and queries. "
+        "Runs against a throwaway SQLite database; the configured one is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=20_000)
+        parser.add_argument('--cars', type=int, default=500)
+        parser.add_argument('--users', type=int, default=2_000)
+        parser.add_argument('--page', type=int, default=50, help="Rows per page")
+        parser.add_argument('--repeat', type=int, default=50,
+                            help="Timed runs per case (median is reported)")
+
+    def handle(self, *args, **options):
+        path = os.path.join(tempfile.mkdtemp(), 'api_benchmark.sqlite3')
+        config = dict(connections.settings[DEFAULT_DB_ALIAS])
+        config.update(ENGINE='django.db.backends.sqlite3', NAME=path)
+        connections.settings[BENCH_ALIAS] = config
+        self.repeat = options['repeat']
+
+        try:
+            call_command('migrate', database=BENCH_ALIAS, verbosity=0)
+            self.seed(options['cars'], options['users'], options['reservations'])
+            self.stdout.write(
+                f"\n{'case':<52} {'median ms':>10} {'bytes':>9} {'queries':>8}"
+            )
+            for name, run in self.cases(options['page']).items():
+                self.report(name, run)
+        finally:
+            connections[BENCH_ALIAS].close()
+            os.remove(path)
+
+    def seed(self, n_cars, n_users, n_reservations):
+        rng = random.Random(42)
+        db = BENCH_ALIAS
+        User.objects.using(db).bulk_create(
+            (User(username=f'bench{i}', password='!') for i in range(n_users)), batch_size=5000,
+        )
+        user_ids = list(User.objects.using(db).values_list('id', flat=True))
+        Car.objects.using(db).bulk_create(
+            (Car(brand=f'Brand{i % 40}', name=f'Model{i}', price_per_day=Decimal(1500 + i % 3000),
+                 description='Well-maintained, fully insured. ' * 4, image=f'car_images/car{i}.jpg')
+             for i in range(n_cars)),
+            batch_size=5000,
+        )
+        car_ids = list(Car.objects.using(db).values_list('id', flat=True))
+        statuses = [status for status, _ in Reservation.STATUS_CHOICES]
+
+        def reservations():
+            for _ in range(n_reservations):
+                start = date.today() + timedelta(days=rng.randrange(-365, 180))
+                yield Reservation(
+                    car_id=rng.choice(car_ids), customer_id=rng.choice(user_ids),
+                    contact_email='bench@example.com', contact_phone='0917 555 0100',
+                    start_date=start, end_date=start + timedelta(days=rng.randrange(1, 10)),
+                    status=rng.choice(statuses), total_amount=Decimal(rng.randrange(1500, 30000)),
+                )
+
+        Reservation.objects.using(db).bulk_create(reservations(), batch_size=5000)
+        self.stdout.write(f"Seeded {n_users} users, {n_cars} cars, {n_reservations} reservations")
+
+    def cases(self, page):
+        db = BENCH_ALIAS
+        reservations = Reservation.objects.using(db)
+        cars = Car.objects.using(db)
+
+        def core_reservations():
+            # What the app needs (car names) takes a second serialize of the cars
+            rows = list(reservations.order_by('-created_at', '-id')[:page])
+            payload = serializers.serialize('json', rows)
+            car_ids = {row.car_id for row in rows}
+            return payload + serializers.serialize('json', cars.filter(pk__in=car_ids))
+
+        def api_reservations(fields=None):
+            names = api.RESERVATION.parse_fields(fields)
+            data, _ = api.serialize_page(api.RESERVATION, reservations, names, per_page=page)
+            return json.dumps({'data': data}, cls=DjangoJSONEncoder)
+
+        def api_cars(fields=None):
+            names = api.CAR.parse_fields(fields)
+            data, _ = api.serialize_page(api.CAR, cars, names, per_page=page)
+            return json.dumps({'data': data}, cls=DjangoJSONEncoder)
+
+        return {
+            'reservations: django.core.serializers (+ cars)': core_reservations,
+            'reservations: api, default fields': api_reservations,
+            'reservations: api, fields=id,status,car.name': lambda: api_reservations('id,status,car.name'),
+            'cars: django.core.serializers': lambda: serializers.serialize(
+                'json', cars.order_by('-created_at', '-id')[:page]
+            ),
+            'cars: api, default fields': api_cars,
+            'cars: api, fields=id,name,price_per_day': lambda: api_cars('id,name,price_per_day'),
+        }
+
+    def report(self, name, run):
+        with CaptureQueriesContext(connections[BENCH_ALIAS]) as queries:
+            payload = run()
+        timings = []
+        for _ in range(self.repeat):
+            began = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - began) * 1000)
+        self.stdout.write(
+            f"{name:<52} {statistics.median(timings):>10.3f} {len(payload.encode()):>9} "
+            f"{len(queries):>8}"
+        )
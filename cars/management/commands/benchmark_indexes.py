@@ -0,0 +1,192 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+
+from cars import availability, pagination
+from cars.models import Car, Reservation
+
+BENCH_ALIAS = 'index_benchmark'
+
+# Mostly history, with a realistic share of bookings still holding cars
+STATUS_WEIGHTS = {
+    'completed': 55, 'cancelled': 12, 'rejected': 8, 'approved': 15, 'pending': 10,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway SQLite database and print query plans and timings "
+        "for the hot reservation/car queries before and after the "
+        "0003_hot_path_indexes migration. The configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=1_000_000)
+        parser.add_argument('--cars', type=int, default=2_000)
+        parser.add_argument('--users', type=int, default=50_000)
+        parser.add_argument('--repeat', type=int, default=20,
+                            help="Timed runs per query (median is reported)")
+        parser.add_argument('--path', help="Database file to use (default: a temp file)")
+        parser.add_argument('--keep', action='store_true', help="Keep the database file")
+
+    def handle(self, *args, **options):
+        path = options['path'] or os.path.join(tempfile.mkdtemp(), 'index_benchmark.sqlite3')
+        config = dict(connections.settings[DEFAULT_DB_ALIAS])
+        config.update(ENGINE='django.db.backends.sqlite3', NAME=path)
+        connections.settings[BENCH_ALIAS] = config
+        self.repeat = options['repeat']
+
+        try:
+            self.stdout.write(f"Benchmark database: {path}")
+            call_command('migrate', database=BENCH_ALIAS, verbosity=0)
+            call_command('migrate', 'cars', '0002', database=BENCH_ALIAS, verbosity=0)
+            self.seed(options['cars'], options['users'], options['reservations'])
+            self.analyze()
+
+            before = self.run_queries("BEFORE (FK indexes only)")
+
+            began = time.perf_counter()
+            call_command('migrate', 'cars', '0003', database=BENCH_ALIAS, verbosity=0)
+            self.analyze()
+            self.stdout.write(f"\nBuilt indexes in {time.perf_counter() - began:.1f}s")
+
+            after = self.run_queries("AFTER (0003_hot_path_indexes)")
+
+            self.stdout.write("\nSummary (median ms)")
+            for name in before:
+                speedup = before[name] / after[name] if after[name] else float('inf')
+                self.stdout.write(
+                    f"  {name:<34} {before[name]:>10.3f} -> {after[name]:>9.3f}  ({speedup:.1f}x)"
+                )
+        finally:
+            connections[BENCH_ALIAS].close()
+            if not options['keep'] and not options['path']:
+                os.remove(path)
+
+    # --- Seeding ---
+    def seed(self, n_cars, n_users, n_reservations):
+        rng = random.Random(42)
+        began = time.perf_counter()
+        db = BENCH_ALIAS
+
+        User.objects.using(db).bulk_create(
+            (User(username=f'bench{i}', password='!') for i in range(n_users)),
+            batch_size=5000,
+        )
+        user_ids = list(User.objects.using(db).values_list('id', flat=True))
+
+        Car.objects.using(db).bulk_create(
+            (Car(brand=f'Brand{i % 40}', name=f'Model{i}', price_per_day=Decimal(1500 + i % 3000),
+                 is_available=i % 10 != 0) for i in range(n_cars)),
+            batch_size=5000,
+        )
+        car_ids = list(Car.objects.using(db).values_list('id', flat=True))
+
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        first_day = date.today() - timedelta(days=5 * 365)
+
+        def reservations():
+            for _ in range(n_reservations):
+                start = first_day + timedelta(days=rng.randrange(5 * 365 + 180))
+                created = datetime.combine(
+                    start - timedelta(days=rng.randrange(60)), datetime.min.time(), dt_timezone.utc
+                ) + timedelta(seconds=rng.randrange(86400))
+                yield Reservation(
+                    car_id=rng.choice(car_ids), customer_id=rng.choice(user_ids),
+                    contact_email='bench@example.com', contact_phone='0',
+                    start_date=start, end_date=start + timedelta(days=rng.randrange(1, 10)),
+                    status=rng.choices(statuses, weights)[0],
+                    total_amount=Decimal(rng.randrange(1500, 30000)),
+                    created_at=created,
+                )
+
+        # Keep the spread-out created_at values instead of "now" for every row
+        created_field = Reservation._meta.get_field('created_at')
+        created_field.auto_now_add = False
+        try:
+            Reservation.objects.using(db).bulk_create(reservations(), batch_size=5000)
+        finally:
+            created_field.auto_now_add = True
+
+        self.stdout.write(
+            f"Seeded {n_users} users, {n_cars} cars, {n_reservations} reservations "
+            f"in {time.perf_counter() - began:.1f}s"
+        )
+
+    def analyze(self):
+        with connections[BENCH_ALIAS].cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    # --- Queries (same shapes as cars/views.py) ---
+    def query_shapes(self):
+        db = BENCH_ALIAS
+        car_id = Car.objects.using(db).order_by('?').values_list('id', flat=True).first()
+        customer_id = Reservation.objects.using(db).order_by('-id').values_list('customer_id', flat=True).first()
+        start = date.today() + timedelta(days=20)
+        end = start + timedelta(days=3)
+        deep = Reservation.objects.using(db).order_by('-created_at', '-id')[200_000:200_001].first() \
+            or Reservation.objects.using(db).order_by('created_at', 'id').first()
+        deep_cursor = pagination.encode_cursor(deep)
+        deep_page = Reservation.objects.using(db).filter(created_at__lte=deep.created_at).filter(
+            Q(created_at__lt=deep.created_at) | Q(pk__lt=deep.pk)
+        ).order_by('-created_at', '-pk')[:26]
+
+        overlap = Reservation.objects.using(db).filter(
+            car_id=car_id, status__in=availability.BLOCKING_STATUSES,
+            start_date__lte=end, end_date__gte=start,
+        )
+        return {
+            'overlap check (book/check)': (overlap, overlap.exists),
+            'fleet search anti-join': (
+                availability.search_cars(start, end).using(db),
+                lambda: list(availability.search_cars(start, end).using(db).values_list('id', flat=True)),
+            ),
+            'my_reservations': (
+                Reservation.objects.using(db).filter(customer_id=customer_id).order_by('-created_at'),
+                lambda: list(Reservation.objects.using(db).filter(customer_id=customer_id).order_by('-created_at')),
+            ),
+            'all_reservations first page': (
+                Reservation.objects.using(db).order_by('-created_at', '-pk')[:26],
+                lambda: pagination.paginate(Reservation.objects.using(db)),
+            ),
+            'all_reservations ?status=pending': (
+                Reservation.objects.using(db).filter(status='pending').order_by('-created_at', '-pk')[:26],
+                lambda: pagination.paginate(Reservation.objects.using(db).filter(status='pending')),
+            ),
+            'all_reservations deep page': (
+                deep_page,
+                lambda: pagination.paginate(Reservation.objects.using(db), after=deep_cursor),
+            ),
+            'admin_car_list ?status=available': (
+                Car.objects.using(db).filter(is_available=True).order_by('-created_at', '-pk')[:25],
+                lambda: pagination.paginate(Car.objects.using(db).filter(is_available=True), per_page=24),
+            ),
+        }
+
+    def run_queries(self, title):
+        self.stdout.write(f"\n=== {title} ===")
+        results = {}
+        for name, (queryset, run) in self.query_shapes().items():
+            run()  # warm the page cache
+            timings = []
+            for _ in range(self.repeat):
+                began = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - began) * 1000)
+            results[name] = statistics.median(timings)
+            self.stdout.write(f"\n-- {name}: {results[name]:.3f} ms")
+            if queryset is not None:
+                for line in queryset.explain().splitlines():
+                    self.stdout.write(f"   {line}")
+        return results
@@ -0,0 +1,140 @@
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import ROUND_DOWN, Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from cars import occupancy
+from cars.models import Car, Reservation
+
+BENCH_ALIAS = 'occupancy_benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-object loops with the NumPy path (cars/occupancy.py) for "
+        "occupancy, revenue per day and overlap counts over a multi-year range. "
+        "Runs against a throwaway SQLite database; the configured one is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=1_000_000)
+        parser.add_argument('--cars', type=int, default=1_000)
+        parser.add_argument('--years', type=int, default=3, help="Length of the reported range")
+
+    def handle(self, *args, **options):
+        if not occupancy.NUMPY_SUPPORT:
+            raise CommandError("This benchmark needs NumPy (pip install numpy)")
+
+        path = os.path.join(tempfile.mkdtemp(), 'occupancy_benchmark.sqlite3')
+        config = dict(connections.settings[DEFAULT_DB_ALIAS])
+        config.update(ENGINE='django.db.backends.sqlite3', NAME=path)
+        connections.settings[BENCH_ALIAS] = config
+
+        try:
+            call_command('migrate', database=BENCH_ALIAS, verbosity=0)
+            end = date.today()
+            start = end - timedelta(days=365 * options['years'])
+            self.seed(options['cars'], options['reservations'], start, end)
+            self.compare(start, end)
+        finally:
+            connections[BENCH_ALIAS].close()
+            os.remove(path)
+
+    def seed(self, n_cars, n_reservations, first, last):
+        rng = random.Random(42)
+        db = BENCH_ALIAS
+        # bulk_create throughout: the counter signals write to the default database
+        User.objects.using(db).bulk_create([User(username='bench', password='!')])
+        customer = User.objects.using(db).get(username='bench')
+        Car.objects.using(db).bulk_create(
+            (Car(brand=f'Brand{i % 40}', name=f'Model{i}', price_per_day=Decimal(1500 + i % 3000))
+             for i in range(n_cars)),
+            batch_size=5000,
+        )
+        car_ids = list(Car.objects.using(db).values_list('id', flat=True))
+        statuses = [status for status, _ in Reservation.STATUS_CHOICES]
+        days = (last - first).days
+
+        def reservations():
+            for _ in range(n_reservations):
+                start = first + timedelta(days=rng.randrange(-10, days))
+                yield Reservation(
+                    car_id=rng.choice(car_ids), customer=customer,
+                    contact_email='bench@example.com', contact_phone='0917 555 0100',
+                    start_date=start, end_date=start + timedelta(days=rng.randrange(0, 14)),
+                    status=rng.choice(statuses), total_amount=Decimal(rng.randrange(150000, 3000000)) / 100,
+                )
+
+        began = time.perf_counter()
+        Reservation.objects.using(db).bulk_create(reservations(), batch_size=5000)
+        self.stdout.write(
+            f"Seeded {n_cars} cars, {n_reservations} reservations in {time.perf_counter() - began:.1f}s"
+        )
+
+    def compare(self, start, end):
+        reservations = Reservation.objects.using(BENCH_ALIAS)
+        load_seconds = 0
+
+        def per_object():
+            # One model instance per reservation, one dict update per reserved day
+            booked = defaultdict(int)
+            revenue = defaultdict(Decimal)
+            for reservation in reservations.iterator(chunk_size=10_000):
+                if reservation.status not in occupancy.RENTED_STATUSES:
+                    continue
+                rental_days = (reservation.end_date - reservation.start_date).days + 1
+                share = (reservation.total_amount / rental_days).quantize(
+                    Decimal('0.01'), rounding=ROUND_DOWN,
+                )
+                day = reservation.start_date
+                while day <= reservation.end_date:
+                    if start <= day <= end:
+                        booked[reservation.car_id, day] += 1
+                        revenue[reservation.car_id, day] += share if day < reservation.end_date else (
+                            reservation.total_amount - share * (rental_days - 1)
+                        )
+                    day += timedelta(days=1)
+            return {
+                'occupied car-days': len(booked),
+                'double-booked car-days': sum(1 for count in booked.values() if count > 1),
+                'revenue': sum(revenue.values(), Decimal('0')),
+            }
+
+        def vectorized():
+            nonlocal load_seconds
+            began = time.perf_counter()
+            columns = occupancy.load(reservations)
+            load_seconds = time.perf_counter() - began
+            counts = occupancy.counts(columns, start, end)
+            revenue = occupancy.revenue(columns, start, end)
+            return {
+                'occupied car-days': int((counts > 0).sum()),
+                'double-booked car-days': int((counts > 1).sum()),
+                'revenue': Decimal(int(revenue.sum())).scaleb(-2),
+            }
+
+        results, timings = {}, {}
+        for name, run in (('per-object loops', per_object), ('numpy (occupancy.py)', vectorized)):
+            began = time.perf_counter()
+            results[name] = run()
+            timings[name] = time.perf_counter() - began
+        timings['  of which values_list to arrays'] = load_seconds
+
+        self.stdout.write(f"\n{'case':<44} {'seconds':>9}")
+        for name, seconds in timings.items():
+            self.stdout.write(f"{name:<44} {seconds:>9.3f}")
+
+        expected, actual = results.values()
+        self.stdout.write("")
+        for key in expected:
+            self.stdout.write(f"{key:<24} {expected[key]!s:>18} {actual[key]!s:>18}")
+        if expected != actual:
+            raise CommandError("The two approaches disagree")
@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+
+from cars import availability
+from cars.management import loadtest
+from cars.models import Car, Reservation
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire many concurrent bookings at one car for the same dates and check "
+        "that exactly one succeeds. Uses a throwaway car and user, deleted "
+        "afterwards; needs DEBUG or --i-know."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--rounds', type=int, default=5)
+        loadtest.add_arguments(parser)
+
+    def handle(self, *args, **options):
+        loadtest.check_database(options)
+        workers = options['workers']
+        user = car = None
+        failed = False
+
+        try:
+            user = User.objects.create_user(f'loadtest_{int(time.time())}')
+            car = Car.objects.create(brand='LoadTest', name='Car', price_per_day=100)
+            for round_no in range(options['rounds']):
+                start = date.today() + timedelta(days=30 + round_no * 10)
+                end = start + timedelta(days=3)
+                outcomes = self._run_round(car, user, start, end, workers)
+
+                booked = Reservation.objects.filter(
+                    car=car, start_date=start, status__in=availability.BLOCKING_STATUSES
+                ).count()
+                self.stdout.write(
+                    f"round {round_no + 1}: {outcomes['booked']} booked, "
+                    f"{outcomes['conflict']} rejected, {outcomes['error']} errors, "
+                    f"{booked} rows in db, slowest {outcomes['slowest'] * 1000:.1f} ms"
+                )
+                if booked != 1 or outcomes['booked'] != 1:
+                    failed = True
+        finally:
+            loadtest.cleanup(options, car=car, user=user)
+
+        if failed:
+            self.stderr.write(self.style.ERROR("Double booking detected"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No double bookings"))
+
+    def _run_round(self, car, user, start, end, workers):
+        barrier = threading.Barrier(workers)
+        outcomes = {'booked': 0, 'conflict': 0, 'error': 0, 'slowest': 0.0}
+        lock = threading.Lock()
+
+        def attempt(_):
+            reservation = Reservation(
+                car=car, customer=user, contact_email='loadtest@example.com',
+                contact_phone='0', start_date=start, end_date=end,
+            )
+            barrier.wait()
+            began = time.perf_counter()
+            try:
+                availability.book(reservation)
+                result = 'booked'
+            except availability.BookingConflict:
+                result = 'conflict'
+            except OperationalError:
+                result = 'error'
+            finally:
+                connection.close()
+            elapsed = time.perf_counter() - began
+            with lock:
+                outcomes[result] += 1
+                outcomes['slowest'] = max(outcomes['slowest'], elapsed)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(attempt, range(workers)))
+        return outcomes
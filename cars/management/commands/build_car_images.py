@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from cars import images
+from cars.models import Car
+
+
+class Command(BaseCommand):
+    help = (
+        "Build resized AVIF/WebP/JPEG derivatives for car images that don't "
+        "have up-to-date ones (e.g. uploaded before the pipeline existed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Rebuild derivatives for every car with an image",
+        )
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        for car in Car.objects.only('id', 'image', 'image_variants').iterator():
+            if options['force']:
+                car.image_variants = {}
+            if not images.needs_processing(car):
+                continue
+            record = images.process_car_image(car)
+            if car.image and not record.get('variants'):
+                failed += 1
+                self.stderr.write(f"Car {car.pk}: could not read {car.image.name}")
+            else:
+                built += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {built} car images ({failed} failed, formats: {', '.join(images.FORMATS)})"
+        ))
@@ -0,0 +1,46 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from cars import catalog, images
+from cars.models import Car
+from cars.storage import car_image_storage, is_content_addressed
+
+
+class Command(BaseCommand):
+    help = (
+        "Move car images uploaded before content-addressed storage under their "
+        "content digest, so duplicate uploads collapse into one file."
+    )
+
+    def handle(self, *args, **options):
+        moved = {}
+        missing = 0
+        cars = Car.objects.exclude(Q(image='') | Q(image__isnull=True)).only('id', 'image', 'image_variants')
+        for car in cars.iterator():
+            old = car.image.name
+            if is_content_addressed(old):
+                continue
+            if old not in moved:
+                if not car_image_storage.exists(old):
+                    missing += 1
+                    self.stderr.write(f"Car {car.pk}: {old} is missing")
+                    continue
+                with car_image_storage.open(old, 'rb') as source:
+                    moved[old] = car_image_storage.save(old, File(source))
+            record = car.image_variants or {}
+            if record.get('source') == old:
+                # Same bytes, so the existing derivatives still apply
+                record['source'] = moved[old]
+            # update() keeps the save signals from releasing the old file early
+            Car.objects.filter(pk=car.pk, image=old).update(image=moved[old], image_variants=record)
+
+        for old in moved:
+            images.release(old)
+        if moved:
+            catalog.bump()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {len(moved)} images into {len(set(moved.values()))} content-addressed files"
+            f" ({missing} missing)"
+        ))
@@ -0,0 +1,206 @@
+import http.client
+import importlib.util
+import shutil
+import socket
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from cars.management import loadtest
+from cars.models import Car, Reservation
+
+SERVERS = {
+    # Sync views, one request per worker thread
+    'wsgi': ['carrental.wsgi:application'],
+    # cars.async_views for the read-only pages (asgi.py sets ASYNC_VIEWS,
+    # which routes them through carrental/async_urls.py)
+    'asgi': ['carrental.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure throughput and latency of the hot read-only pages over HTTP. "
+        "With --serve, starts gunicorn for WSGI and/or ASGI (uvicorn workers) "
+        "on this machine in turn and compares them; otherwise loads --url. "
+        "Requests are made as a throwaway user with one reservation, deleted "
+        "afterwards; needs DEBUG or --i-know."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--serve', nargs='+', choices=sorted(SERVERS),
+                            help="Start these servers one after the other and load each")
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help="Server to load when not using --serve")
+        parser.add_argument('--port', type=int, default=8765, help="Port for --serve")
+        parser.add_argument('--workers', type=int, default=2, help="Server processes for --serve")
+        parser.add_argument('--threads', type=int, default=4,
+                            help="Threads per WSGI worker for --serve")
+        parser.add_argument('--concurrency', type=int, default=32, help="Concurrent client connections")
+        parser.add_argument('--duration', type=float, default=15, help="Seconds measured per server")
+        parser.add_argument('--warmup', type=float, default=3, help="Seconds of unmeasured load first")
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Path to request (repeatable; default: the five read-only pages)")
+        loadtest.add_arguments(parser)
+
+    def handle(self, *args, **options):
+        loadtest.check_database(options)
+        if options['serve']:
+            self._check_servers(options['serve'])
+
+        client = Client()
+        user = car = None
+        results = []
+        try:
+            user = User.objects.create_user(f'httpload_{int(time.time())}')
+            car = Car.objects.create(brand='LoadTest', name='Car', price_per_day=100, is_available=True)
+            start = date.today() + timedelta(days=30)
+            reservation = Reservation.objects.create(
+                car=car, customer=user, contact_email='loadtest@example.com',
+                contact_phone='0', start_date=start, end_date=start + timedelta(days=3),
+            )
+            client.force_login(user)
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+            paths = options['paths'] or [
+                reverse('car_list'),
+                reverse('car_detail', args=[car.pk]),
+                reverse('my_reservations'),
+                reverse('reservation_detail', args=[reservation.pk]),
+                reverse('check_availability') + '?' + urlencode({
+                    'car_id': car.pk, 'start_date': start, 'end_date': start + timedelta(days=1),
+                }),
+            ]
+
+            if options['serve']:
+                for name in options['serve']:
+                    with self._server(name, options):
+                        url = f"http://127.0.0.1:{options['port']}"
+                        results.append((name, self._load(url, paths, cookie, options)))
+            else:
+                results.append((options['url'], self._load(options['url'], paths, cookie, options)))
+        finally:
+            loadtest.cleanup(options, client=client, car=car, user=user)
+
+        self.stdout.write(
+            f"\n{'server':<24} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'max ms':>8} {'errors':>7}"
+        )
+        for name, result in results:
+            self.stdout.write(
+                f"{name:<24} {result['rps']:>8.1f} {result['p50']:>8.1f} {result['p95']:>8.1f} "
+                f"{result['p99']:>8.1f} {result['max']:>8.1f} {result['errors']:>7}"
+            )
+
+    def _check_servers(self, names):
+        if shutil.which('gunicorn') is None:
+            raise CommandError("--serve needs gunicorn on PATH")
+        if 'asgi' in names and importlib.util.find_spec('uvicorn') is None:
+            raise CommandError("--serve asgi needs uvicorn (pip install uvicorn)")
+
+    def _server(self, name, options):
+        command = ['gunicorn', *SERVERS[name], '-w', str(options['workers']),
+                   '-b', f"127.0.0.1:{options['port']}"]
+        if name == 'wsgi':
+            command += ['--threads', str(options['threads'])]
+        return _Server(command, options['port'], cwd=settings.BASE_DIR)
+
+    def _load(self, url, paths, cookie, options):
+        """
+        Keep options['concurrency'] connections busy cycling through paths;
+        returns throughput and latency percentiles of the measured window
+        """
+        parts = urlsplit(url)
+        began = time.monotonic()
+        measure_from = began + options['warmup']
+        deadline = measure_from + options['duration']
+        latencies, errors = [], 0
+        lock = threading.Lock()
+
+        def run(worker):
+            nonlocal errors
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            mine, failed, i = [], 0, worker
+            while True:
+                sent = time.monotonic()
+                if sent >= deadline:
+                    break
+                try:
+                    connection.request('GET', paths[i % len(paths)], headers={'Cookie': cookie})
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    ok = False
+                if sent >= measure_from:
+                    mine.append(time.monotonic() - sent)
+                    failed += not ok
+                i += 1
+            connection.close()
+            with lock:
+                latencies.extend(mine)
+                errors += failed
+
+        self.stdout.write(
+            f"Loading {url} with {options['concurrency']} connections for "
+            f"{options['warmup'] + options['duration']:.0f}s ({len(paths)} paths)"
+        )
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(run, range(options['concurrency'])))
+
+        if len(latencies) < 2:
+            raise CommandError(f"Too few responses from {url} to measure")
+        cuts = statistics.quantiles(latencies, n=100)
+        return {
+            'rps': len(latencies) / options['duration'],
+            'p50': cuts[49] * 1000,
+            'p95': cuts[94] * 1000,
+            'p99': cuts[98] * 1000,
+            'max': max(latencies) * 1000,
+            'errors': errors,
+        }
+
+
+class _Server:
+    """
+    A server subprocess that is ready once its port accepts connections
+    """
+
+    def __init__(self, command, port, cwd):
+        self.command = command
+        self.port = port
+        self.cwd = cwd
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            self.command, cwd=self.cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        waited_until = time.monotonic() + 30
+        while time.monotonic() < waited_until:
+            if self.process.poll() is not None:
+                raise CommandError(f"{' '.join(self.command)} exited with {self.process.returncode}")
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError(f"{' '.join(self.command)} did not start listening on {self.port}")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from cars import image_queue
+from cars.models import ImageJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Work off queued car image jobs in the foreground, e.g. after a restart "
+        "left some pending or to retry failed ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help="Put failed jobs back in the queue first",
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = ImageJob.objects.filter(status='failed').update(status='pending', attempts=0)
+            self.stdout.write(f"Re-queued {retried} failed jobs")
+        stale = image_queue.requeue_stale()
+        if stale:
+            self.stdout.write(f"Re-queued {stale} stale running jobs")
+
+        processed = 0
+        while image_queue.run_next():
+            processed += 1
+
+        failed = ImageJob.objects.filter(status='failed').count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} image jobs ({failed} failed in total)"
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cars import stats
+from cars.models import FleetStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the materialized dashboard counters from the Car, Reservation "
+        "and User tables and report any drift from the stored values."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only report drift (exit with an error if any) without rewriting",
+        )
+
+    def handle(self, *args, **options):
+        expected = stats.compute_counters()
+        stored = FleetStats.objects.filter(pk=1).values(*stats.COUNTER_FIELDS).first()
+
+        drift = []
+        if stored is None:
+            self.stdout.write("No stored counters yet.")
+        else:
+            for field in stats.COUNTER_FIELDS:
+                if stored[field] != expected[field]:
+                    drift.append(field)
+                    self.stdout.write(f"{field}: stored {stored[field]}, actual {expected[field]}")
+
+        if options['check']:
+            if drift or stored is None:
+                raise CommandError(f"Counters out of date ({len(drift)} fields drifted)")
+            self.stdout.write(self.style.SUCCESS("Counters are up to date"))
+            return
+
+        stats.rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt counters ({len(drift)} fields had drifted)"
+        ))
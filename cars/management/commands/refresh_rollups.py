@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the analytics rollups of the days changed since the last run "
+        "(run from cron), or with --full rebuild them from every reservation."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Drop all rollups and rebuild them from scratch",
+        )
+
+    def handle(self, *args, **options):
+        began = time.perf_counter()
+        if options['full']:
+            analytics.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt all rollups in {time.perf_counter() - began:.2f}s"
+            ))
+            return
+
+        pending = analytics.pending_changes()
+        refreshed = analytics.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {refreshed} car-days from {pending} changes "
+            f"in {time.perf_counter() - began:.2f}s"
+        ))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cars import lifecycle
+
+
+class Command(BaseCommand):
+    help = (
+        "Complete approved reservations whose end date has passed and cancel "
+        "pending ones that were never answered (run daily from cron). See "
+        "cars/lifecycle.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=lifecycle.BATCH_SIZE,
+                            help="Reservations updated per transaction")
+        parser.add_argument('--pending-days', type=int,
+                            help="Cancel pending reservations older than this many days "
+                                 "(default: RESERVATION_PENDING_DAYS or 7)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Count the reservations due, change nothing")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if options['pending_days'] is not None and options['pending_days'] < 0:
+            raise CommandError("--pending-days must not be negative")
+
+        began = time.perf_counter()
+        if options['dry_run']:
+            completed = lifecycle.due_completion().count()
+            expired = lifecycle.due_expiry(days=options['pending_days']).count()
+            self.stdout.write(self.style.SUCCESS(
+                f"{completed} reservations to complete, {expired} to cancel (dry run)"
+            ))
+            return
+
+        completed = lifecycle.complete_finished(batch_size=options['batch_size'])
+        expired = lifecycle.expire_pending(days=options['pending_days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Completed {completed} and cancelled {expired} pending reservations "
+            f"in {time.perf_counter() - began:.2f}s"
+        ))
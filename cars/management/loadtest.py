@@ -0,0 +1,43 @@
+"""
+Shared guard for the load-test commands (booking_load_test,
+http_load_test). They create a throwaway user and car, with reservations,
+in the configured database and delete them afterwards, so outside
+development they only run when asked to explicitly.
+"""
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection
+
+
+def add_arguments(parser):
+    parser.add_argument('--i-know', action='store_true',
+                        help="Run with DEBUG off, writing throwaway rows to the configured database")
+    parser.add_argument('--keep', action='store_true',
+                        help="Keep the test user, car and reservations afterwards")
+
+
+def check_database(options):
+    """
+    Refuse to run against what may be a production database
+    """
+    if settings.DEBUG or options['i_know']:
+        return
+    raise CommandError(
+        f"DEBUG is off, so {connection.settings_dict['NAME']} may be a production database. "
+        "This creates and deletes a test user and car there; pass --i-know to run anyway."
+    )
+
+
+def cleanup(options, client=None, car=None, user=None):
+    """
+    Delete what the load test created (its reservations go with the car)
+    unless --keep was given
+    """
+    if options['keep']:
+        return
+    if client is not None:
+        client.logout()
+    if car is not None:
+        car.delete()
+    if user is not None:
+        user.delete()
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FleetStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_cars', models.IntegerField(default=0)),
+                ('available_cars', models.IntegerField(default=0)),
+                ('total_users', models.IntegerField(default=0)),
+                ('total_reservations', models.IntegerField(default=0)),
+                ('pending_reservations', models.IntegerField(default=0)),
+                ('approved_reservations', models.IntegerField(default=0)),
+                ('rejected_reservations', models.IntegerField(default=0)),
+                ('completed_reservations', models.IntegerField(default=0)),
+                ('cancelled_reservations', models.IntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'fleet stats',
+            },
+        ),
+    ]
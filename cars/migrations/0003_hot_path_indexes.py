@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0002_fleetstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['-created_at', '-id'], name='car_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['-created_at', '-id'], name='car_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['car', 'status', 'end_date', 'start_date'], name='reservation_overlap_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['customer', '-created_at'], name='reservation_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='reservation_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['-created_at', '-id'], name='reservation_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
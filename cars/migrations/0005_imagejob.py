@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0004_car_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to='cars.car')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='imagejob_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:58
+
+import cars.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0005_imagejob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='car',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=cars.storage.get_car_image_storage, upload_to='car_images/'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def queue_history(apps, schema_editor):
+    """
+    Mark every car's whole reservation history as changed, so the first
+    analytics refresh builds all rollups
+    """
+    Reservation = apps.get_model('cars', 'Reservation')
+    RollupChange = apps.get_model('cars', 'RollupChange')
+    db = schema_editor.connection.alias
+    spans = Reservation.objects.using(db).values('car_id').annotate(
+        first_start=Min('start_date'), last_end=Max('end_date'),
+        first_created=Min('created_at'), last_created=Max('created_at'),
+    )
+    RollupChange.objects.using(db).bulk_create([
+        RollupChange(
+            car_id=span['car_id'],
+            start_date=min(span['first_start'], span['first_created'].date()),
+            end_date=max(span['last_end'], span['last_created'].date()),
+        )
+        for span in spans
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0006_content_addressed_car_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('car_id', models.BigIntegerField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CarDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('rented', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('bookings', models.IntegerField(default=0)),
+                ('approved', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='cars.car')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'car'], name='rollup_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('car', 'day'), name='rollup_car_day_unique')],
+            },
+        ),
+        migrations.RunPython(queue_history, migrations.RunPython.noop),
+    ]
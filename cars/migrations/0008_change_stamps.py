@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0007_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeStamp',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField()),
+            ],
+        ),
+    ]
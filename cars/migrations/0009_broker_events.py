@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0008_change_stamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BrokerEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=100)),
+                ('payload', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from datetime import date
 
+from .storage import get_car_image_storage
+
 class Car(models.Model):
     TRANSMISSION_CHOICES = [
         ('automatic', 'Automatic'),
@@ -21,7 +23,10 @@ class Car(models.Model):
     is_available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
-    image = models.ImageField(upload_to='car_images/', blank=True, null=True)
+    # Stored once per distinct content, see storage.py
+    image = models.ImageField(upload_to='car_images/', storage=get_car_image_storage, blank=True, null=True)
+    # Resized derivatives of image, maintained by images.process_car_image
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField(blank=True)
     
     # New fields for car details
@@ -37,10 +42,31 @@ class Car(models.Model):
     )
     seats = models.IntegerField(default=4)
     
+    class Meta:
+        indexes = [
+            # admin_car_list keyset pages
+            models.Index(fields=['-created_at', '-id'], name='car_created_idx'),
+            # car_list / fleet search and admin_car_list ?status=available
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='car_available_idx',
+                condition=models.Q(is_available=True),
+            ),
+        ]
+    
     def __str__(self):
         return f"{self.brand} {self.name}"
     
-    def total_days(self, start_date, end_date):
+    def save(self, *args, **kwargs):
+        # One transaction with the counter signals, which lock the stored row
+        # to measure the change against (see stats.py)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+    
+    @staticmethod
+    def total_days(start_date, end_date):
+        # Inclusive: a same-day rental is one day
         return (end_date - start_date).days + 1
     
     def total_price(self, start_date, end_date):
@@ -105,14 +131,156 @@ class Reservation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Overlap checks (book, check_availability, fleet search). end_date
+            # leads the range because "ends on/after the requested start" is
+            # the selective half: almost all history ended long ago.
+            models.Index(fields=['car', 'status', 'end_date', 'start_date'], name='reservation_overlap_idx'),
+            # my_reservations / car_list
+            models.Index(fields=['customer', '-created_at'], name='reservation_customer_idx'),
+            # all_reservations keyset pages, with and without a status filter
+            models.Index(fields=['status', '-created_at', '-id'], name='reservation_status_idx'),
+            models.Index(fields=['-created_at', '-id'], name='reservation_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Reservation #{self.id} - {self.car} by {self.customer.username}"
     
     def save(self, *args, **kwargs):
         if self.start_date and self.end_date and self.car:
             self.total_amount = self.car.total_price(self.start_date, self.end_date)
-        super().save(*args, **kwargs)
+        # See Car.save
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
     
     def get_status_display(self):
         """Get display name for status"""
-        return dict(self.STATUS_CHOICES).get(self.status, self.status)
\ No newline at end of file
+        return dict(self.STATUS_CHOICES).get(self.status, self.status)
+
+class FleetStats(models.Model):
+    """
+    Single-row table of dashboard counters, adjusted incrementally from
+    Car/Reservation/User signals (see stats.py)
+    """
+    total_cars = models.IntegerField(default=0)
+    available_cars = models.IntegerField(default=0)
+    total_users = models.IntegerField(default=0)
+    total_reservations = models.IntegerField(default=0)
+    pending_reservations = models.IntegerField(default=0)
+    approved_reservations = models.IntegerField(default=0)
+    rejected_reservations = models.IntegerField(default=0)
+    completed_reservations = models.IntegerField(default=0)
+    cancelled_reservations = models.IntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name_plural = 'fleet stats'
+    
+    def __str__(self):
+        return f"Fleet stats ({self.total_cars} cars, {self.total_reservations} reservations)"
+
+
+class ImageJob(models.Model):
+    """
+    Pending derivative build for an uploaded car image, worked off by the
+    in-process pool in image_queue.py (no external broker)
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ]
+    
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='image_jobs')
+    # Car.image.name at upload time; a later upload supersedes the job
+    source = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            # Workers claim the oldest pending job
+            models.Index(fields=['status', 'created_at'], name='imagejob_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Image job #{self.id} for car {self.car_id} ({self.status})"
+
+
+class CarDailyRollup(models.Model):
+    """
+    One car's activity on one day, maintained by analytics.py so reports
+    never scan Reservation. Days without any activity have no row.
+    """
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    # 1 if an approved/completed reservation has the car that day
+    rented = models.IntegerField(default=0)
+    # That day's share of those reservations' total_amount
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Reservations made that day, by their current status
+    bookings = models.IntegerField(default=0)
+    approved = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['car', 'day'], name='rollup_car_day_unique'),
+        ]
+        indexes = [
+            # Reports filter on a day range first
+            models.Index(fields=['day', 'car'], name='rollup_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Rollup for car {self.car_id} on {self.day}"
+
+
+class RollupChange(models.Model):
+    """
+    Days of a car whose rollups are out of date, recorded by the Reservation
+    signals and worked off by analytics.refresh()
+    """
+    # Not a foreign key, so recording a change never needs the car row
+    car_id = models.BigIntegerField()
+    start_date = models.DateField()
+    end_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Rollup change for car {self.car_id}: {self.start_date} to {self.end_date}"
+
+
+class ChangeStamp(models.Model):
+    """
+    When something cached or revalidated last changed, by key (see
+    versions.py). In the database so every server process sees the same
+    stamps.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    # time.time_ns() of the last change
+    value = models.BigIntegerField()
+    
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class BrokerEvent(models.Model):
+    """
+    A live update published through events.DatabaseBroker, kept for
+    EVENTS_RETENTION seconds so every server process can pick it up
+    """
+    channel = models.CharField(max_length=100)
+    # JSON [name, data]
+    payload = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"Event on {self.channel} at {self.created_at}"
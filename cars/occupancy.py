@@ -0,0 +1,205 @@
+"""
+Vectorized occupancy and revenue for large date ranges.
+
+Reservations are loaded as columns (values_list, no model instances) and
+expanded into cars x days matrices with NumPy. Each reservation adds +1
+at its first day and -1 after its last in a difference array, and a
+cumulative sum along the days gives per-day counts. The Python cost is
+then per reservation, not per reserved day, and the arithmetic runs in C.
+Days are inclusive and revenue is split the way analytics.py splits it:
+an even share in cents, with the remainder on the last day.
+
+`manage.py benchmark_occupancy` compares this with the per-object loops.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import Reservation
+
+# NumPy is optional; analytics falls back to per-reservation loops without it
+try:
+    import numpy as np
+    NUMPY_SUPPORT = True
+except ImportError:
+    NUMPY_SUPPORT = False
+
+STATUSES = [status for status, _ in Reservation.STATUS_CHOICES]
+RENTED_STATUSES = ('approved', 'completed')
+
+
+class Columns:
+    """
+    Reservations as parallel arrays. Dates are day offsets from `origin`;
+    `car` indexes into `car_ids` and `status` into STATUSES.
+    """
+
+    def __init__(self, origin, car_ids, car, start, end, created, cents, status):
+        self.origin = origin
+        self.car_ids = car_ids
+        self.car = car
+        self.start = start
+        self.end = end
+        self.created = created
+        self.cents = cents
+        self.status = status
+
+    def __len__(self):
+        return len(self.car)
+
+    def offset(self, day):
+        return (day - self.origin).days
+
+    def status_mask(self, statuses):
+        return np.isin(self.status, [STATUSES.index(status) for status in statuses])
+
+
+def load(queryset=None):
+    """
+    Columns for a Reservation queryset (all reservations by default). Rows
+    are fetched as tuples in chunks and converted column by column.
+    """
+    queryset = Reservation.objects.all() if queryset is None else queryset
+    rows = list(queryset.order_by().values_list(
+        'car_id', 'start_date', 'end_date', 'created_at', 'total_amount', 'status',
+    ).iterator(chunk_size=10_000))
+    car_column, start, end, created, amount, status = (
+        [list(column) for column in zip(*rows)] if rows else ([], [], [], [], [], [])
+    )
+    del rows
+
+    car_ids = np.unique(np.array(car_column, dtype=np.int64))
+    car = np.searchsorted(car_ids, np.array(car_column, dtype=np.int64))
+
+    origin = min(start) if start else timezone.localdate()
+    status_codes = {name: code for code, name in enumerate(STATUSES)}
+    return Columns(
+        origin=origin,
+        car_ids=car_ids,
+        car=car,
+        start=np.fromiter((day.toordinal() for day in start), np.int64, len(start)) - origin.toordinal(),
+        end=np.fromiter((day.toordinal() for day in end), np.int64, len(end)) - origin.toordinal(),
+        created=np.fromiter(
+            (timezone.localdate(moment).toordinal() for moment in created), np.int64, len(created),
+        ) - origin.toordinal(),
+        cents=np.fromiter((int(value * 100) for value in amount), np.int64, len(amount)),
+        status=np.fromiter((status_codes[value] for value in status), np.int8, len(status)),
+    )
+
+
+def _spread(columns, mask, first, days, weights=None):
+    """
+    Sum weights (1 by default) over each masked reservation's days, as a
+    cars x days matrix for the window starting at offset `first`
+    """
+    width = days + 1
+    start = np.clip(columns.start[mask] - first, 0, days)
+    stop = np.clip(columns.end[mask] - first + 1, 0, days)
+    inside = start < stop
+    car = columns.car[mask][inside]
+    start, stop = start[inside], stop[inside]
+    if weights is not None:
+        weights = weights[inside]
+
+    size = len(columns.car_ids) * width
+    diff = np.bincount(car * width + start, weights=weights, minlength=size)
+    diff -= np.bincount(car * width + stop, weights=weights, minlength=size)
+    return np.cumsum(diff.reshape(-1, width), axis=1)[:, :days]
+
+
+def counts(columns, start, end, statuses=RENTED_STATUSES):
+    """
+    Reservations with the given statuses covering each car on each day
+    from start to end, as an int cars x days matrix. Above 1 is an overlap.
+    """
+    days = (end - start).days + 1
+    matrix = _spread(columns, columns.status_mask(statuses), columns.offset(start), days)
+    return np.rint(matrix).astype(np.int32)
+
+
+def occupancy(columns, start, end, statuses=RENTED_STATUSES):
+    """
+    Whether each car is reserved on each day, as a bool cars x days matrix
+    """
+    return counts(columns, start, end, statuses) > 0
+
+
+def overlaps(columns, start, end, statuses=RENTED_STATUSES):
+    """
+    Whether each car is double-booked on each day, as a bool cars x days
+    matrix
+    """
+    return counts(columns, start, end, statuses) > 1
+
+
+def revenue(columns, start, end, statuses=RENTED_STATUSES):
+    """
+    Each car's share of revenue on each day in cents, as an int64 cars x
+    days matrix
+    """
+    first, days = columns.offset(start), (end - start).days + 1
+    mask = columns.status_mask(statuses)
+    length = columns.end[mask] - columns.start[mask] + 1
+    cents = columns.cents[mask]
+    share = cents // length
+
+    matrix = _spread(columns, mask, first, days, weights=share.astype(np.float64))
+    # The rounding remainder lands on the last day, if it's in the window
+    last = columns.end[mask] - first
+    inside = (last >= 0) & (last < days)
+    np.add.at(
+        matrix, (columns.car[mask][inside], last[inside]),
+        (cents - share * length)[inside].astype(np.float64),
+    )
+    return np.rint(matrix).astype(np.int64)
+
+
+def created(columns, start, end, statuses=None):
+    """
+    Reservations (optionally with the given statuses) made for each car on
+    each day, as an int cars x days matrix
+    """
+    first, days = columns.offset(start), (end - start).days + 1
+    mask = np.ones(len(columns), dtype=bool) if statuses is None else columns.status_mask(statuses)
+    day = columns.created[mask] - first
+    inside = (day >= 0) & (day < days)
+    matrix = np.zeros((len(columns.car_ids), days), dtype=np.int32)
+    np.add.at(matrix, (columns.car[mask][inside], day[inside]), 1)
+    return matrix
+
+
+def span(columns):
+    """
+    First and last day any reservation touches (rental or creation)
+    """
+    if not len(columns):
+        return None
+    first = min(columns.start.min(), columns.created.min())
+    last = max(columns.end.max(), columns.created.max())
+    return columns.origin + timedelta(days=int(first)), columns.origin + timedelta(days=int(last))
+
+
+def rollups(columns, start, end):
+    """
+    CarDailyRollup field values for every car-day with activity between
+    start and end, the same values analytics.compute_rollups() gives
+    """
+    rented = occupancy(columns, start, end)
+    day_revenue = revenue(columns, start, end)
+    bookings = created(columns, start, end)
+    approved = created(columns, start, end, RENTED_STATUSES)
+    rejected = created(columns, start, end, ('rejected',))
+    cancelled = created(columns, start, end, ('cancelled',))
+
+    for car, day in zip(*np.nonzero(rented | (day_revenue != 0) | (bookings != 0))):
+        yield {
+            'car_id': int(columns.car_ids[car]),
+            'day': start + timedelta(days=int(day)),
+            'rented': int(rented[car, day]),
+            'revenue': Decimal(int(day_revenue[car, day])).scaleb(-2),
+            'bookings': int(bookings[car, day]),
+            'approved': int(approved[car, day]),
+            'rejected': int(rejected[car, day]),
+            'cancelled': int(cancelled[car, day]),
+        }
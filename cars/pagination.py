@@ -0,0 +1,101 @@
+"""
+Keyset (cursor) pagination over (created_at, id), newest first.
+
+Unlike OFFSET paging, each page is a range scan that starts right after the
+last row of the previous page, so page 500 costs the same as page 1 and
+rows inserted meanwhile don't shift the pages. Cursors are opaque
+URL-safe tokens encoding the (created_at, id) of a boundary row.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(obj):
+    # Model instances, or dicts from values() that include created_at and id
+    if isinstance(obj, dict):
+        created_at, pk = obj['created_at'], obj['id']
+    else:
+        created_at, pk = obj.created_at, obj.pk
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    (created_at, id) from a cursor, or None if it is missing or malformed
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def paginate(queryset, after=None, before=None, per_page=25):
+    """
+    One page of queryset, newest first. Pass the `after` cursor for the next
+    (older) page or `before` for the previous (newer) one.
+    """
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    if before_key is not None:
+        created_at, pk = before_key
+        rows = list(
+            queryset.filter(created_at__gte=created_at)
+            .filter(Q(created_at__gt=created_at) | Q(pk__gt=pk))
+            .order_by('created_at', 'pk')[:per_page + 1]
+        )
+        more_newer = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        if rows:
+            return KeysetPage(
+                rows,
+                next_cursor=encode_cursor(rows[-1]),
+                prev_cursor=encode_cursor(rows[0]) if more_newer else None,
+            )
+        # Nothing newer than the cursor: show the first page
+        after_key = None
+
+    queryset = queryset.order_by('-created_at', '-pk')
+    if after_key is not None:
+        created_at, pk = after_key
+        # The plain range on created_at lets the (created_at, id) index seek
+        # straight to the cursor; the OR only resolves ties on created_at
+        queryset = queryset.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(pk__lt=pk)
+        )
+    rows = list(queryset[:per_page + 1])
+    more_older = len(rows) > per_page
+    rows = rows[:per_page]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1]) if rows and more_older else None,
+        prev_cursor=encode_cursor(rows[0]) if rows and after_key is not None else None,
+    )
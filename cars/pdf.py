@@ -0,0 +1,25 @@
+"""
+HTML to PDF conversion.
+
+Kept free of Django imports so it can run inside spawned worker processes
+(see receipts.py).
+"""
+from io import BytesIO
+
+# xhtml2pdf is optional; receipts are disabled without it
+try:
+    from xhtml2pdf import pisa
+    PDF_SUPPORT = True
+except ImportError:
+    PDF_SUPPORT = False
+
+
+def html_to_pdf(html):
+    """
+    PDF bytes for an HTML document, or None if xhtml2pdf reported an error
+    """
+    result = BytesIO()
+    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
+    if pdf.err:
+        return None
+    return result.getvalue()
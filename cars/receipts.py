@@ -0,0 +1,188 @@
+"""
+Pre-rendered PDF receipts.
+
+A receipt never changes once its reservation is approved, so it is
+rendered once, right after the reservation reaches approved/completed,
+and stored under RECEIPTS_ROOT as <reservation id>/<updated_at>-<LAYOUT>.pdf.
+Any later save changes updated_at and therefore the key; the stale file
+is removed and a new one generated. Bumping LAYOUT changes every key, so
+receipts stored before a change to what they show are rendered again.
+The CPU-heavy HTML->PDF step runs in a small process pool so request
+workers only render the template.
+
+The download views serve the stored file. If it isn't there yet (pool
+still busy, or no xhtml2pdf when the reservation changed), they render
+it synchronously and store it.
+
+iter_pdfs() feeds bulk exports: stored receipts are read back, missing
+ones are rendered across the pool with at most RECEIPT_EXPORT_WINDOW
+documents in flight, which bounds memory however many are exported.
+"""
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .pdf import PDF_SUPPORT, html_to_pdf
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_STATUSES = ('approved', 'completed')
+
+# 2: rental days counted inclusively, as total_amount is
+LAYOUT = 2
+
+COMPANY_DETAILS = {
+    'company_name': 'Car Moto',
+    'company_address': '21 Metro Avenue, Manila, Philippines',
+    'company_phone': '+63 (2) 8123 4567',
+    'company_email': 'fleet@carmanager.ph',
+    'company_vat': '123-456-789-000',
+}
+
+storage = FileSystemStorage(location=settings.RECEIPTS_ROOT)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """
+    Shared worker pool, started on first use. Workers are spawned rather
+    than forked so they don't inherit database connections or threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'RECEIPT_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def receipt_context(reservation):
+    days = reservation.car.total_days(reservation.start_date, reservation.end_date)
+    daily_rate = reservation.car.price_per_day
+    context = {
+        'reservation': reservation,
+        'days': days,
+        'daily_rate': daily_rate,
+        'subtotal': daily_rate * days,
+        # Get any additional fees (if your model has these fields)
+        'insurance_fee': getattr(reservation, 'insurance_fee', 0),
+        'extra_fees': getattr(reservation, 'extra_fees', 0),
+        'receipt_date': timezone.now(),
+        'total_amount': reservation.total_amount,
+    }
+    context.update(COMPANY_DETAILS)
+    return context
+
+
+def render_html(reservation):
+    return get_template('cars/receipt_pdf.html').render(receipt_context(reservation))
+
+
+def receipt_name(reservation):
+    return f"{reservation.pk}/{reservation.updated_at.strftime('%Y%m%d%H%M%S%f')}-{LAYOUT}.pdf"
+
+
+def _store(name, pdf):
+    if pdf is not None and not storage.exists(name):
+        storage.save(name, ContentFile(pdf))
+    return name if pdf is not None else None
+
+
+def get_receipt(reservation):
+    """
+    Storage name of the reservation's current receipt, rendering it now
+    if it hasn't been generated yet. None if rendering failed.
+    """
+    name = receipt_name(reservation)
+    if storage.exists(name):
+        return name
+    return _store(name, html_to_pdf(render_html(reservation)))
+
+
+def download_filename(reservation):
+    return f'receipt_{reservation.id}_{reservation.customer.last_name}_{reservation.start_date.strftime("%Y%m%d")}.pdf'
+
+
+def iter_pdfs(reservations, window=None):
+    """
+    Yield (reservation, pdf bytes or None) in input order, rendering
+    missing receipts in parallel with a bounded number in flight
+    """
+    if window is None:
+        window = getattr(settings, 'RECEIPT_EXPORT_WINDOW', 8)
+    in_flight = deque()
+    for reservation in reservations:
+        name = receipt_name(reservation)
+        if storage.exists(name):
+            future = None
+        else:
+            future = executor().submit(html_to_pdf, render_html(reservation))
+        in_flight.append((reservation, name, future))
+        if len(in_flight) >= window:
+            yield _collect(*in_flight.popleft())
+    while in_flight:
+        yield _collect(*in_flight.popleft())
+
+
+def _collect(reservation, name, future):
+    if future is None:
+        with storage.open(name, 'rb') as stored:
+            return reservation, stored.read()
+    pdf = future.result()
+    _store(name, pdf)
+    return reservation, pdf
+
+
+def schedule(reservation):
+    """
+    Generate the receipt in the background (no-op for other statuses)
+    """
+    if not PDF_SUPPORT or reservation.status not in RECEIPT_STATUSES:
+        return None
+    name = receipt_name(reservation)
+    if storage.exists(name):
+        return None
+
+    future = executor().submit(html_to_pdf, render_html(reservation))
+
+    def done(future):
+        try:
+            if _store(name, future.result()) is None:
+                logger.warning("Receipt %s failed to render", name)
+        except Exception:
+            logger.exception("Receipt %s failed to render", name)
+
+    future.add_done_callback(done)
+    return future
+
+
+def invalidate(reservation_id, keep=None):
+    """
+    Delete stored receipts for a reservation, except the `keep` name
+    """
+    directory = str(reservation_id)
+    if not storage.exists(directory):
+        return
+    for filename in storage.listdir(directory)[1]:
+        name = f"{directory}/{filename}"
+        if name != keep:
+            storage.delete(name)
+
+
+def reservation_changed(reservation):
+    current = receipt_name(reservation) if reservation.status in RECEIPT_STATUSES else None
+    invalidate(reservation.pk, keep=current)
+    if current is not None:
+        schedule(reservation)
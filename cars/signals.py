@@ -0,0 +1,170 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Car, Reservation
+from . import analytics, availability, catalog, events, image_queue, images, receipts, stats, versions
+
+
+# --- Availability index ---
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: availability.index.reservation_saved(instance))
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    reservation_id = instance.pk
+    transaction.on_commit(lambda: availability.index.reservation_deleted(reservation_id))
+
+
+# --- Car images (blobs are shared between cars, see storage.py) ---
+@receiver(post_init, sender=Car)
+def remember_image(sender, instance, **kwargs):
+    if not {'image', 'image_variants'} & instance.get_deferred_fields():
+        instance._image_snapshot = (instance.image.name or '', instance.image_variants)
+
+
+@receiver(post_save, sender=Car)
+def car_image_saved(sender, instance, **kwargs):
+    # Deferred-field loads (only()) can't tell whether the image changed
+    if {'image', 'image_variants'} & instance.get_deferred_fields():
+        return
+    old_name, old_record = getattr(instance, '_image_snapshot', ('', None))
+    instance._image_snapshot = (instance.image.name or '', instance.image_variants)
+    if old_name and old_name != instance._image_snapshot[0]:
+        transaction.on_commit(lambda: images.release(old_name, old_record))
+    if not images.needs_processing(instance):
+        return
+    if instance.image:
+        image_queue.enqueue(instance)
+    else:
+        # Image cleared; its files are released above once this commits
+        sender.objects.filter(pk=instance.pk).update(image_variants={})
+        instance.image_variants = {}
+        instance._image_snapshot = ('', {})
+
+
+@receiver(post_delete, sender=Car)
+def car_image_deleted(sender, instance, **kwargs):
+    if not {'image', 'image_variants'} & instance.get_deferred_fields():
+        name, record = instance.image.name, instance.image_variants
+        transaction.on_commit(lambda: images.release(name, record))
+
+
+# --- Catalog cache (see catalog.py) ---
+@receiver(post_save, sender=Car)
+@receiver(post_delete, sender=Car)
+def car_changed(sender, instance, **kwargs):
+    catalog.bump()
+
+
+# --- Change stamps for conditional GET (see conditional.py) ---
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def reservation_changed(sender, instance, **kwargs):
+    # In the save's transaction, so the stamps change when the row does
+    versions.touch(
+        versions.customer_reservations_key(instance.customer_id),
+        versions.car_reservations_key(instance.car_id),
+    )
+
+
+# --- Live status updates (see events.py) ---
+@receiver(post_save, sender=Reservation)
+def reservation_published(sender, instance, **kwargs):
+    transaction.on_commit(lambda: events.publish_reservation(instance))
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_unpublished(sender, instance, **kwargs):
+    reservation_id, customer_id = instance.pk, instance.customer_id
+    transaction.on_commit(lambda: events.publish_reservation_deleted(reservation_id, customer_id))
+
+
+# --- Admin dashboard feed (see events.py) ---
+@receiver(post_save, sender=Reservation)
+def reservation_dashboard(sender, instance, **kwargs):
+    reservation_id = instance.pk
+    transaction.on_commit(lambda: events.publish_dashboard_reservation(reservation_id))
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_dashboard_deleted(sender, instance, **kwargs):
+    reservation_id = instance.pk
+    transaction.on_commit(lambda: events.publish_dashboard_reservation_deleted(reservation_id))
+
+
+# --- Receipts (after commit, so workers never see uncommitted rows) ---
+@receiver(post_save, sender=Reservation)
+def reservation_receipt(sender, instance, **kwargs):
+    transaction.on_commit(lambda: receipts.reservation_changed(instance))
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_receipt_deleted(sender, instance, **kwargs):
+    reservation_id = instance.pk
+    transaction.on_commit(lambda: receipts.invalidate(reservation_id))
+
+
+# --- Analytics rollups (see analytics.py) ---
+@receiver(post_init, sender=Reservation)
+def remember_rollup_span(sender, instance, **kwargs):
+    instance._rollup_span = analytics.reservation_span(instance)
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_rollups(sender, instance, **kwargs):
+    # In the same transaction, so a rolled back save leaves no change behind
+    new = analytics.reservation_span(instance)
+    analytics.mark_changed(getattr(instance, '_rollup_span', None), new)
+    instance._rollup_span = new
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_rollups_deleted(sender, instance, **kwargs):
+    analytics.mark_changed(
+        getattr(instance, '_rollup_span', None), analytics.reservation_span(instance),
+    )
+
+
+# --- Dashboard counters ---
+# The change is measured against the row as stored at write time, not as
+# it was when the instance was loaded (see stats.py)
+def counted_row_before_save(sender, instance, using, update_fields=None, **kwargs):
+    if stats.touches_counters(sender, update_fields):
+        instance._stats_before = stats.stored_contribution(instance, using)
+
+
+def counters_saved(sender, instance, using, **kwargs):
+    old = instance.__dict__.pop('_stats_before', None)
+    if old is None:
+        return
+    new = stats.contribution(instance)
+    if new is None:
+        # Deferred fields: the row now holds what was just written
+        new = stats.stored_contribution(instance, using)
+    changed = stats.apply_change(old, new)
+    if changed:
+        transaction.on_commit(lambda: events.publish_counters(changed), using=using)
+
+
+def counted_row_before_delete(sender, instance, using, **kwargs):
+    instance._stats_before = stats.stored_contribution(instance, using)
+
+
+def counters_deleted(sender, instance, using, **kwargs):
+    old = instance.__dict__.pop('_stats_before', None)
+    if old is None:
+        return
+    changed = stats.apply_change(old, {})
+    if changed:
+        transaction.on_commit(lambda: events.publish_counters(changed), using=using)
+
+
+for model in (Car, Reservation, User):
+    pre_save.connect(counted_row_before_save, sender=model, dispatch_uid=f'stats_pre_save_{model.__name__}')
+    post_save.connect(counters_saved, sender=model, dispatch_uid=f'stats_save_{model.__name__}')
+    pre_delete.connect(counted_row_before_delete, sender=model, dispatch_uid=f'stats_pre_delete_{model.__name__}')
+    post_delete.connect(counters_deleted, sender=model, dispatch_uid=f'stats_delete_{model.__name__}')
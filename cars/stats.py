@@ -0,0 +1,202 @@
+"""
+Counters shown on the admin and customer listing pages.
+
+reservation_stats() and car_stats() run a single conditional-aggregation
+query (COUNT ... FILTER / SUM ... FILTER) over any queryset.
+
+The admin dashboard and the unfiltered admin lists read the materialized
+FleetStats row instead. pre_save/pre_delete read what the stored row
+contributes to the counters, locked for the rest of the save's
+transaction, and post_save/post_delete apply the difference to the new
+state with F() increments. Two saves of the same stale instance (a double
+click, two staff approving at once) therefore count once, and status
+changes made anywhere (approve, reject, cancel, toggle) keep the row
+current without rescans. `manage.py rebuild_stats` recomputes it from
+scratch and reports drift.
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Car, FleetStats, Reservation
+
+# Reservations that count towards revenue / amount spent
+REVENUE_STATUSES = ('approved', 'completed')
+
+
+def _reservation_aggregates():
+    aggregates = {'total': Count('id')}
+    for status, _ in Reservation.STATUS_CHOICES:
+        aggregates[status] = Count('id', filter=Q(status=status))
+    aggregates['revenue'] = Coalesce(
+        Sum('total_amount', filter=Q(status__in=REVENUE_STATUSES)),
+        Decimal('0'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    return aggregates
+
+
+def reservation_stats(queryset=None):
+    """
+    Total, per-status counts and revenue for a reservation queryset
+    """
+    if queryset is None:
+        queryset = Reservation.objects.all()
+    return queryset.order_by().aggregate(**_reservation_aggregates())
+
+
+async def areservation_stats(queryset):
+    return await queryset.order_by().aaggregate(**_reservation_aggregates())
+
+
+def car_stats(queryset=None):
+    """
+    Total and available car counts
+    """
+    if queryset is None:
+        queryset = Car.objects.all()
+    return queryset.order_by().aggregate(
+        total=Count('id'),
+        available=Count('id', filter=Q(is_available=True)),
+    )
+
+
+# --- Materialized counters ---
+STATUS_COUNTERS = {
+    status: f'{status}_reservations' for status, _ in Reservation.STATUS_CHOICES
+}
+
+COUNTER_FIELDS = [
+    'total_cars', 'available_cars', 'total_users', 'total_reservations',
+    *STATUS_COUNTERS.values(), 'total_revenue',
+]
+
+
+def compute_counters():
+    """
+    FleetStats values computed from the source tables
+    """
+    reservations = reservation_stats()
+    cars = car_stats()
+    counters = {
+        'total_cars': cars['total'],
+        'available_cars': cars['available'],
+        'total_users': User.objects.filter(is_staff=False).count(),
+        'total_reservations': reservations['total'],
+        'total_revenue': reservations['revenue'],
+    }
+    for status, field in STATUS_COUNTERS.items():
+        counters[field] = reservations[status]
+    return counters
+
+
+def rebuild_counters():
+    counters = compute_counters()
+    FleetStats.objects.update_or_create(pk=1, defaults=counters)
+    return counters
+
+
+def dashboard_stats():
+    """
+    Everything the admin dashboard header needs, keyed by template variable
+    """
+    counters = FleetStats.objects.filter(pk=1).values(*COUNTER_FIELDS).first()
+    if counters is None:
+        counters = rebuild_counters()
+    return counters
+
+
+def fleet_reservation_stats():
+    """
+    reservation_stats() for the whole table, read from the FleetStats row
+    """
+    counters = dashboard_stats()
+    fleet = {'total': counters['total_reservations'], 'revenue': counters['total_revenue']}
+    for status, field in STATUS_COUNTERS.items():
+        fleet[status] = counters[field]
+    return fleet
+
+
+# Fields each model's contribution is computed from
+CONTRIBUTION_FIELDS = {
+    Reservation: ('status', 'total_amount'),
+    Car: ('is_available',),
+    User: ('is_staff',),
+}
+
+
+def _contribution(model, values):
+    if model is Reservation:
+        return reservation_contribution(values['status'], values['total_amount'])
+    if model is Car:
+        return {'total_cars': 1, 'available_cars': int(bool(values['is_available']))}
+    return {'total_users': int(not values['is_staff'])}
+
+
+def touches_counters(model, update_fields=None):
+    """
+    Whether a save with these update_fields can change the counters
+    """
+    return update_fields is None or bool(set(update_fields) & set(CONTRIBUTION_FIELDS[model]))
+
+
+def contribution(instance):
+    """
+    What one Car/Reservation/User adds to the counters, or None if the
+    needed fields were not loaded
+    """
+    model = instance._meta.concrete_model
+    fields = CONTRIBUTION_FIELDS[model]
+    if set(fields) & instance.get_deferred_fields():
+        return None
+    return _contribution(model, {field: getattr(instance, field) for field in fields})
+
+
+def stored_contribution(instance, using):
+    """
+    What the instance's row as currently stored adds to the counters ({}
+    if there is no row). Inside a transaction the row stays locked until
+    it ends, so concurrent saves of it are measured one after the other.
+    """
+    if instance.pk is None:
+        return {}
+    model = instance._meta.concrete_model
+    rows = model._default_manager.using(using).filter(pk=instance.pk)
+    if not connections[using].get_autocommit():
+        rows = rows.select_for_update()
+    values = rows.values(*CONTRIBUTION_FIELDS[model]).first()
+    return {} if values is None else _contribution(model, values)
+
+
+def reservation_contribution(status, total_amount):
+    """
+    What a reservation with this status and amount adds to the counters
+    """
+    counts = {'total_reservations': 1}
+    if status in STATUS_COUNTERS:
+        counts[STATUS_COUNTERS[status]] = 1
+    if status in REVENUE_STATUSES:
+        counts['total_revenue'] = Decimal(total_amount or 0)
+    return counts
+
+
+def apply_change(old, new):
+    """
+    Shift the counters from an old contribution to a new one; an unknown
+    (None) contribution falls back to a full rebuild. Returns the names of
+    the counters that may have changed.
+    """
+    if old is None or new is None:
+        rebuild_counters()
+        return COUNTER_FIELDS
+    deltas = {}
+    for field in old.keys() | new.keys():
+        delta = new.get(field, 0) - old.get(field, 0)
+        if delta:
+            deltas[field] = F(field) + delta
+    if deltas and not FleetStats.objects.filter(pk=1).update(**deltas):
+        rebuild_counters()
+    return list(deltas)
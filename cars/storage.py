@@ -0,0 +1,73 @@
+"""
+Content-addressed storage for car images.
+
+Files are stored under the SHA-256 of their bytes, e.g.
+car_images/3f/3fa1...e9.jpg, so uploading the same stock photo for ten
+cars (or re-uploading it on edit) keeps a single copy. A blob's
+references are the Car rows pointing at it; images.release() removes it
+once the last one is gone. The bytes behind a name never change, which
+lets the media view mark these URLs immutable.
+"""
+import hashlib
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+# Matches names produced by ContentAddressedStorage (older uploads don't)
+CONTENT_ADDRESSED_NAME = re.compile(r'(^|/)([0-9a-f]{2})/(\2[0-9a-f]{62})\.[a-z0-9]+$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names files after their content. The directory
+    of the requested name is kept as a prefix, the extension lower-cased.
+    """
+
+    def __init__(self, **kwargs):
+        # Same bytes under the same name, so a racing second write is harmless
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def digest(self, content):
+        sha = hashlib.sha256()
+        for chunk in content.chunks():
+            sha.update(chunk)
+        return sha.hexdigest()
+
+    def content_name(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        digest = self.digest(content)
+        return posixpath.join(directory, digest[:2], f"{digest}{extension}")
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is decided in _save from the content
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_ADDRESSED_NAME.search(name))
+
+
+def name_digest(name):
+    """
+    The content digest a content-addressed name carries; for older
+    uploads, a digest of the name itself
+    """
+    match = CONTENT_ADDRESSED_NAME.search(name)
+    return match.group(3) if match else hashlib.sha256(name.encode()).hexdigest()
+
+
+# Under MEDIA_ROOT/MEDIA_URL, alongside uploads made before this existed
+car_image_storage = ContentAddressedStorage()
+
+
+def get_car_image_storage():
+    return car_image_storage
@@ -0,0 +1,58 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from .. import images
+from ..storage import car_image_storage
+
+register = template.Library()
+
+
+@register.simple_tag
+def car_picture(car, variant='card', sizes=None, placeholder_class=None, **attrs):
+    """
+    <picture> for a car image: AVIF/WebP sources with srcset over every
+    derivative and a JPEG <img> fallback at the requested variant.
+    Until the background job has built the derivatives (or if the upload
+    couldn't be decoded) a placeholder icon is shown instead, wrapped in
+    a div with placeholder_class if given.
+
+        {% car_picture car 'card' sizes='(max-width: 600px) 100vw, 360px' %}
+    """
+    if not car.image:
+        return ''
+    alt = attrs.pop('alt', f'{car.brand} {car.name}')
+    extra = format_html_join('', ' {}="{}"', attrs.items())
+    record = car.image_variants or {}
+    fallback = record.get('variants', {}).get(variant)
+    if record.get('source') != car.image.name:
+        return _placeholder('fa-hourglass-half image-pending', 'Image is being processed', placeholder_class)
+    if fallback is None:
+        return _placeholder('fa-car', 'Image unavailable', placeholder_class)
+
+    sizes = sizes or f"{fallback['width']}px"
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (images.CONTENT_TYPES[fmt], images.srcset(record, fmt), sizes)
+            for fmt in images.FORMATS if fmt != 'jpeg' and fmt in fallback['files']
+        ),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" '
+        'loading="lazy" decoding="async"{}></picture>',
+        sources,
+        car_image_storage.url(fallback['files']['jpeg']),
+        images.srcset(record, 'jpeg'),
+        sizes,
+        fallback['width'],
+        fallback['height'],
+        alt,
+        extra,
+    )
+
+
+def _placeholder(icon, title, wrapper_class):
+    html = format_html('<i class="fas {}" title="{}"></i>', icon, title)
+    if wrapper_class:
+        html = format_html('<div class="{}">{}</div>', wrapper_class, html)
+    return html
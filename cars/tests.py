@@ -1,3 +1,1384 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
+from concurrent.futures import Future
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from carrental import async_urls
+
+from . import (
+    analytics, api, availability, events, exports, forms, image_queue, images, lifecycle, occupancy, pagination,
+    receipts, stats, storage, versions,
+)
+from .management.commands import import_fleet
+from .models import Car, CarDailyRollup, ChangeStamp, FleetStats, ImageJob, Reservation
+from .storage import car_image_storage
+
+
+
+class InlineExecutor:
+    """
+    Stands in for the receipt process pool: runs each job right away, in
+    this process
+    """
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+
+def setUpModule():
+    # Receipts rendered by commit hooks go to a scratch directory instead
+    # of RECEIPTS_ROOT, through an in-process pool
+    root = tempfile.mkdtemp()
+    unittest.addModuleCleanup(shutil.rmtree, root)
+    for patch in (mock.patch.object(receipts, 'storage', FileSystemStorage(location=root)),
+                  mock.patch.object(receipts, 'executor', InlineExecutor)):
+        patch.start()
+        unittest.addModuleCleanup(patch.stop)
+
+class QueryBudgetTests(TestCase):
+    """
+    Listing pages must run a fixed number of queries however many rows they
+    show, so a template edit can't quietly reintroduce an N+1.
+    """
+
+    # Queries per page, including the session and user lookups and, on the
+    # catalog and conditional GET pages, the change stamps
+    BUDGETS = {
+        'admin_dashboard': 5,
+        'all_reservations': 4,
+        'car_list': 5,
+        'my_reservations': 5,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        cls.customer = User.objects.create_user('customer', password='pass', email='c@example.com')
+
+    def seed(self, count):
+        start = date.today() + timedelta(days=1)
+        offset = Car.objects.count()
+        for i in range(offset, offset + count):
+            car = Car.objects.create(brand=f'Brand{i}', name=f'Model{i}', price_per_day=100 + i)
+            customer = User.objects.create_user(f'renter{i}')
+            for owner in (customer, self.customer):
+                Reservation.objects.create(
+                    car=car, customer=owner, contact_email='r@example.com', contact_phone='0',
+                    start_date=start, end_date=start + timedelta(days=2),
+                    status=('pending', 'approved', 'completed')[i % 3],
+                )
+
+    def assertPageBudget(self, name, user, budget=None):
+        self.client.force_login(user)
+        with self.assertNumQueries(self.BUDGETS[name] if budget is None else budget):
+            response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+
+    def test_budgets_hold_for_small_and_large_tables(self):
+        for count in (1, 12):
+            self.seed(count)
+            with self.subTest(rows=count):
+                self.assertPageBudget('admin_dashboard', self.staff)
+                self.assertPageBudget('all_reservations', self.staff)
+                self.assertPageBudget('car_list', self.customer)
+                self.assertPageBudget('my_reservations', self.customer)
+                # Cached catalog: only the session, user, fleet stamp and reservations
+                self.assertPageBudget('car_list', self.customer, budget=self.BUDGETS['car_list'] - 1)
+
+
+    def test_catalog_is_cached_before_the_first_car_write(self):
+        self.seed(3)
+        cache.clear()
+        # A database from before change stamps: no fleet stamp yet
+        ChangeStamp.objects.all().delete()
+        self.assertPageBudget('car_list', self.customer)
+        self.assertPageBudget('car_list', self.customer, budget=self.BUDGETS['car_list'] - 1)
+
+class AvailabilityEndpointTests(TestCase):
+    """
+    The JSON endpoints and the reservation pages count rental days the same
+    way (inclusive) and price them the same way.
+    """
+
+    def test_total_days_matches_total_price(self):
+        customer = User.objects.create_user('customer', password='pass')
+        car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=1500)
+        start = date.today() + timedelta(days=3)
+        end = start + timedelta(days=2)
+        params = {'start_date': start.isoformat(), 'end_date': end.isoformat()}
+        self.client.force_login(customer)
+
+        found = self.client.get(reverse('search_availability'), params).json()['cars'][0]
+        checked = self.client.get(reverse('check_availability'), dict(params, car_id=car.pk)).json()
+        quoted = self.client.post(
+            reverse('api_quotes'), {'items': [dict(params, car=car.pk)]}, content_type='application/json',
+        ).json()['data'][0]
+        for entry in (found, checked):
+            self.assertEqual(entry['total_days'], 3)
+            self.assertEqual(entry['price_per_day'] * entry['total_days'], entry['total_price'])
+        self.assertEqual(quoted['total_days'], 3)
+
+    def test_pages_count_rental_days_inclusively(self):
+        staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        customer = User.objects.create_user('customer', password='pass')
+        car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=1500)
+        start = date.today() + timedelta(days=3)
+        reservation = Reservation.objects.create(
+            car=car, customer=customer, contact_email='c@example.com', contact_phone='0',
+            start_date=start, end_date=start + timedelta(days=2),
+        )
+        self.assertEqual(reservation.total_amount, 4500)
+        self.assertEqual(receipts.receipt_context(reservation)['days'], 3)
+        self.assertEqual(receipts.receipt_context(reservation)['subtotal'], 4500)
+
+        self.client.force_login(staff)
+        response = self.client.get(reverse('view_reservation', args=[reservation.pk]))
+        self.assertEqual((response.context['days'], response.context['subtotal']), (3, 4500))
+
+        self.client.force_login(customer)
+        for urlconf in ('carrental.urls', 'carrental.async_urls'):
+            with self.subTest(urlconf), override_settings(ROOT_URLCONF=urlconf):
+                response = self.client.get(reverse('reservation_detail', args=[reservation.pk]))
+                self.assertEqual((response.context['days'], response.context['subtotal']), (3, 4500))
+                response = self.client.get(reverse('my_reservations'))
+                self.assertEqual(response.context['reservations'][0].rental_days, 3)
+
+    def test_quote_matches_each_item_in_two_queries(self):
+        customer = User.objects.create_user('customer')
+        vios = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        city = Car.objects.create(brand='Honda', name='City', price_per_day=120)
+        retired = Car.objects.create(brand='Ford', name='Fiesta', price_per_day=80, is_available=False)
+        day = date.today() + timedelta(days=10)
+
+        def reserve(car, start, end, status):
+            Reservation.objects.create(
+                car=car, customer=customer, contact_email='c@example.com', contact_phone='0',
+                start_date=day + timedelta(days=start), end_date=day + timedelta(days=end), status=status,
+            )
+        reserve(vios, 0, 2, 'approved')
+        reserve(vios, 6, 6, 'pending')
+        reserve(city, 0, 2, 'rejected')
+
+        def item(car_id, start, end):
+            return car_id, day + timedelta(days=start), day + timedelta(days=end)
+        items = [
+            item(vios.pk, 1, 1),      # inside the approved booking
+            item(vios.pk, 3, 4),      # the day after it
+            item(0, 3, 4),            # no such car
+            item(vios.pk, -2, 0),     # ends on its first day
+            item(vios.pk, 4, 8),      # around the pending one
+            item(city.pk, 0, 2),      # only a rejected booking
+            item(retired.pk, 3, 4),   # car taken out of service
+            item(vios.pk, 3, 4),      # repeated
+        ]
+        with self.assertNumQueries(2):
+            quotes = availability.quote(items)
+
+        self.assertEqual(
+            [None if quote is None else (quote['available'], quote['total_days'], quote['total_price'])
+             for quote in quotes],
+            [(False, 1, 100), (True, 2, 200), None, (False, 3, 300), (False, 5, 500),
+             (True, 3, 360), (False, 2, 160), (True, 2, 200)],
+        )
+
+
+class DateRangeFormTests(SimpleTestCase):
+    def test_end_before_start_rejected(self):
+        reversed_range = {'start_date': '2025-03-10', 'end_date': '2025-03-09'}
+        for form in (
+            forms.CarSearchForm(reversed_range),
+            forms.ReceiptExportForm(reversed_range),
+            forms.AnalyticsForm(dict(reversed_range, group='brand', period='month')),
+            forms.ReservationExportForm(dict(reversed_range, format='csv')),
+            forms.CarExportForm(dict(reversed_range, format='csv')),
+        ):
+            with self.subTest(type(form).__name__):
+                self.assertEqual(form.non_field_errors(), ["End date must not be before start date."])
+
+    def test_forms_keep_their_own_checks(self):
+        search = forms.CarSearchForm({'start_date': '2025-03-10', 'min_price': 50, 'max_price': 10})
+        self.assertEqual(search.non_field_errors(), ["Provide both a start and an end date."])
+        report = forms.AnalyticsForm({
+            'start_date': '2023-01-01', 'end_date': '2025-03-09', 'group': 'brand', 'period': 'month',
+        })
+        self.assertEqual(report.non_field_errors(), ["Choose a range of at most two years."])
+
+class CsvExportTests(TestCase):
+    def test_formulas_escaped_phone_numbers_kept(self):
+        rows = [{'contact_phone': '+63 917 555 0100', 'special_requests': '=HYPERLINK("x")'},
+                {'contact_phone': '-', 'special_requests': '+cmd|calc'}]
+        text = ''.join(exports.csv_stream(['contact_phone', 'special_requests'], rows))
+        self.assertEqual(text.splitlines(), [
+            'contact_phone,special_requests',
+            '+63 917 555 0100,"\'=HYPERLINK(""x"")"',
+            "-,'+cmd|calc",
+        ])
+
+
+class FleetCounterTests(TestCase):
+    """
+    FleetStats must end up where compute_counters() is however the writes
+    interleave.
+    """
+
+    def assertCountersExact(self):
+        self.assertEqual(
+            FleetStats.objects.filter(pk=1).values(*stats.COUNTER_FIELDS).get(), stats.compute_counters(),
+        )
+
+    def test_stale_instances_count_a_change_once(self):
+        customer = User.objects.create_user('customer')
+        car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        start = date.today() + timedelta(days=1)
+        reservation = Reservation.objects.create(
+            car=car, customer=customer, contact_email='c@example.com', contact_phone='0',
+            start_date=start, end_date=start,
+        )
+        # Two staff open the same pending reservation and both approve it
+        first, second = Reservation.objects.get(pk=reservation.pk), Reservation.objects.get(pk=reservation.pk)
+        for instance in (first, second):
+            instance.status = 'approved'
+            instance.save()
+        self.assertCountersExact()
+
+        # ...and both delete it
+        first.delete()
+        second.delete()
+        self.assertCountersExact()
+
+        # Two toggles to unavailable, through update_fields and deferred loads
+        first, second = Car.objects.get(pk=car.pk), Car.objects.only('id', 'is_available').get(pk=car.pk)
+        for instance in (first, second):
+            instance.is_available = False
+        first.save(update_fields=['is_available'])
+        second.save()
+        self.assertCountersExact()
+        renamed = Car.objects.only('id', 'name').get(pk=car.pk)
+        renamed.name = 'Vios XLE'
+        renamed.save()
+        self.assertCountersExact()
+
+
+class CarIntervalsTests(SimpleTestCase):
+    def setUp(self):
+        self.day = date(2026, 3, 1)
+        self.intervals = availability._CarIntervals()
+        # A long rental that starts early, plus a short one inside it and one after
+        self.intervals.add(self.on(1), self.on(20), 1)
+        self.intervals.add(self.on(3), self.on(4), 2)
+        self.intervals.add(self.on(25), self.on(27), 3)
+
+    def on(self, offset):
+        return self.day + timedelta(days=offset)
+
+    def test_ranges_are_inclusive(self):
+        self.assertTrue(self.intervals.overlaps(self.on(20), self.on(20)))
+        self.assertTrue(self.intervals.overlaps(self.on(-5), self.on(1)))
+        self.assertTrue(self.intervals.overlaps(self.on(27), self.on(30)))
+        self.assertFalse(self.intervals.overlaps(self.on(21), self.on(24)))
+        self.assertFalse(self.intervals.overlaps(self.on(-5), self.on(0)))
+        self.assertFalse(self.intervals.overlaps(self.on(28), self.on(30)))
+
+    def test_running_max_covers_later_starts(self):
+        # Reservation 2 ends on day 4, but reservation 1 still holds the car
+        self.assertTrue(self.intervals.overlaps(self.on(10), self.on(12)))
+
+    def test_remove(self):
+        self.intervals.remove(1)
+        self.assertFalse(self.intervals.overlaps(self.on(10), self.on(12)))
+        self.assertTrue(self.intervals.overlaps(self.on(4), self.on(4)))
+        self.intervals.remove(2)
+        self.intervals.remove(3)
+        self.assertFalse(self.intervals.overlaps(self.on(-100), self.on(100)))
+
+    def test_exclude(self):
+        self.assertFalse(self.intervals.overlaps(self.on(10), self.on(12), exclude=1))
+        self.assertTrue(self.intervals.overlaps(self.on(3), self.on(3), exclude=1))
+        self.assertTrue(self.intervals.overlaps(self.on(3), self.on(3), exclude=2))
+        self.assertTrue(self.intervals.overlaps(self.on(26), self.on(26), exclude=1))
+        self.assertFalse(self.intervals.overlaps(self.on(26), self.on(26), exclude=3))
+
+
+class AvailabilityIndexTests(TestCase):
+    def setUp(self):
+        availability.index.clear()
+        self.addCleanup(availability.index.clear)
+        self.customer = User.objects.create_user('customer')
+        self.car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        self.start = date.today() + timedelta(days=10)
+
+    def reserve(self, **fields):
+        return Reservation.objects.create(
+            car=self.car, customer=self.customer, contact_email='c@example.com', contact_phone='0',
+            start_date=self.start, end_date=self.start + timedelta(days=2), **fields,
+        )
+
+    def free(self, offset=1):
+        day = self.start + timedelta(days=offset)
+        return availability.is_car_available(self.car.pk, day, day)
+
+    def test_follows_committed_saves_and_deletes(self):
+        self.assertTrue(self.free())
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation = self.reserve()
+        self.assertFalse(self.free())
+        self.assertTrue(availability.index.is_available(
+            self.car.pk, self.start, self.start, exclude=reservation.pk,
+        ))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.status = 'rejected'
+            reservation.save()
+        self.assertTrue(self.free())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.status = 'approved'
+            reservation.save()
+        self.assertFalse(self.free())
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.delete()
+        self.assertTrue(self.free())
+
+    def test_rolled_back_booking_does_not_block(self):
+        self.assertTrue(self.free())
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.reserve()
+                raise RuntimeError
+        self.assertTrue(self.free())
+
+    def test_refresh_car_picks_up_writes_it_missed(self):
+        self.assertTrue(self.free())
+        # Written by "another process": no commit hooks run here
+        reservation = self.reserve()
+        self.assertTrue(self.free())
+        availability.index.refresh_car(self.car.pk)
+        self.assertFalse(self.free())
+
+        Reservation.objects.filter(pk=reservation.pk).update(status='cancelled')
+        availability.index.refresh_car(self.car.pk)
+        self.assertTrue(self.free())
+
+    def test_moved_stamp_reloads_the_car(self):
+        self.assertTrue(self.free())
+        self.reserve()
+        stamp = versions.stamp(versions.car_reservations_key(self.car.pk))
+        day = self.start + timedelta(days=1)
+        self.assertIsNone(availability.index.cached_is_available(self.car.pk, day, day, stamp=stamp))
+        self.assertFalse(availability.is_car_available(self.car.pk, day, day, stamp=stamp))
+        # Reloaded at that stamp: answered in place from now on
+        self.assertIs(availability.index.cached_is_available(self.car.pk, day, day, stamp=stamp), False)
+
+    def test_check_availability_sees_other_processes_bookings(self):
+        self.client.force_login(self.customer)
+        for urlconf in ('carrental.urls', 'carrental.async_urls'):
+            with self.subTest(urlconf), override_settings(ROOT_URLCONF=urlconf):
+                availability.index.clear()
+                self.car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+                url = reverse('check_availability') + f'?car_id={self.car.pk}&start_date={self.start}&end_date={self.start}'
+                self.assertIs(self.client.get(url).json()['available'], True)
+                self.reserve()
+                self.assertIs(self.client.get(url).json()['available'], False)
+
+    def test_lookups_do_not_wait_for_a_reload(self):
+        booked = self.reserve()
+        self.assertFalse(self.free())
+        index = availability.index
+        index._loaded_at -= index.ttl + 1
+        entered, finish = threading.Event(), threading.Event()
+
+        def slow_read():
+            entered.set()
+            finish.wait(5)
+            return {}, [(booked.pk, self.car.pk, booked.start_date, booked.end_date)]
+
+        with mock.patch.object(index, '_read', slow_read):
+            reload = threading.Thread(target=index.is_available, args=(self.car.pk, self.start, self.start))
+            reload.start()
+            self.assertTrue(entered.wait(5))
+            # The stale tables answer meanwhile, and writers don't block
+            self.assertFalse(self.free())
+            later = Reservation(pk=booked.pk + 1, car=self.car, status='pending',
+                                start_date=self.start + timedelta(days=5), end_date=self.start + timedelta(days=5))
+            index.reservation_saved(later)
+            self.assertFalse(self.free(offset=5))
+            finish.set()
+            reload.join(5)
+        self.assertTrue(index.fresh)
+        # The hook that arrived mid-reload was replayed onto the new tables
+        self.assertFalse(self.free(offset=5))
+        self.assertFalse(self.free())
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        for i in range(11):
+            Car.objects.create(brand='Brand', name=f'Model{i}', price_per_day=100, is_available=i % 2 == 0)
+        # Ties on created_at straddle the page boundaries
+        cars = list(Car.objects.order_by('pk'))
+        for i, car in enumerate(cars):
+            Car.objects.filter(pk=car.pk).update(created_at=now - timedelta(minutes=i // 4))
+        cls.newest_first = list(Car.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+    def walk(self, queryset, per_page=3):
+        pages, page = [], pagination.paginate(queryset, per_page=per_page)
+        while True:
+            pages.append([car.pk for car in page])
+            if not page.has_next:
+                return pages, page
+            page = pagination.paginate(queryset, after=page.next_cursor, per_page=per_page)
+
+    def test_forward_pages_cover_every_row_once_in_order(self):
+        pages, last = self.walk(Car.objects.all())
+        self.assertEqual([pk for page in pages for pk in page], self.newest_first)
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 2])
+        self.assertTrue(last.has_previous)
+
+    def test_before_cursor_walks_back_to_the_first_page(self):
+        pages, page = self.walk(Car.objects.all())
+        back = []
+        while page.has_previous:
+            page = pagination.paginate(Car.objects.all(), before=page.prev_cursor, per_page=3)
+            back.append([car.pk for car in page])
+        self.assertEqual(back, pages[-2::-1])
+        self.assertFalse(page.has_previous)
+        self.assertTrue(page.has_next)
+
+    def test_before_the_newest_row_shows_the_first_page(self):
+        first = pagination.paginate(Car.objects.all(), per_page=3)
+        page = pagination.paginate(Car.objects.all(), before=pagination.encode_cursor(first.object_list[0]), per_page=3)
+        self.assertEqual([car.pk for car in page], self.newest_first[:3])
+        self.assertFalse(page.has_previous)
+
+    def test_malformed_cursors_fall_back_to_the_first_page(self):
+        for cursor in ('garbage', '!!!', '', 'eHx5', 'YXxifGM', '8J-YgA'):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(pagination.decode_cursor(cursor))
+                page = pagination.paginate(Car.objects.all(), after=cursor, before=cursor, per_page=3)
+                self.assertEqual([car.pk for car in page], self.newest_first[:3])
+                self.assertFalse(page.has_previous)
+
+    def test_status_filter_pages(self):
+        staff = User.objects.create_user('staff', is_staff=True)
+        customer = User.objects.create_user('customer')
+        car = Car.objects.first()
+        start = date.today() + timedelta(days=1)
+        for i in range(14):
+            Reservation.objects.create(
+                car=car, customer=customer, contact_email='c@example.com', contact_phone='0',
+                start_date=start, end_date=start, status=('pending', 'approved')[i % 2],
+            )
+        Reservation.objects.update(created_at=timezone.now())
+        expected = list(Reservation.objects.filter(status='approved').order_by('-created_at', '-pk')
+                        .values_list('pk', flat=True))
+
+        self.client.force_login(staff)
+        seen, params = [], {'status': 'approved'}
+        while True:
+            with mock.patch('cars.views.RESERVATIONS_PER_PAGE', 3):
+                response = self.client.get(reverse('all_reservations'), params)
+            page = response.context['reservations']
+            seen.extend(reservation.pk for reservation in page)
+            if not page.has_next:
+                break
+            self.assertContains(response, f'?status=approved&after={page.next_cursor}')
+            params = {'status': 'approved', 'after': page.next_cursor}
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(expected), 7)
+
+    def test_status_is_urlencoded_in_page_links(self):
+        page = pagination.KeysetPage([], next_cursor='older', prev_cursor='newer')
+        html = render_to_string('cars/all_reservations.html', {
+            'reservations': page, 'status_filter': 'a&b=c', 'reservation_stats': {}, 'filtered_count': 0,
+        })
+        self.assertIn('?status=a%26b%3Dc&after=older', html)
+        self.assertIn('?status=a%26b%3Dc&before=newer', html)
+
+
+class ConditionalGetTests(TestCase):
+    """
+    Validators come from the database, so a change made through another
+    server process (no commit hooks or cache writes in this one) stops
+    the 304s right away.
+    """
+
+    def setUp(self):
+        self.customer = User.objects.create_user('customer', password='pass')
+        self.car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        start = date.today() + timedelta(days=5)
+        self.reservation = Reservation.objects.create(
+            car=self.car, customer=self.customer, contact_email='c@example.com', contact_phone='0',
+            start_date=start, end_date=start + timedelta(days=1),
+        )
+        self.client.force_login(self.customer)
+
+    def assertRevalidates(self, url, change):
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def approve(self):
+        self.reservation.status = 'approved'
+        self.reservation.save()
+
+    def rename_car(self):
+        self.car.name = 'Vios XLE'
+        self.car.save()
+
+    def test_my_reservations(self):
+        self.assertRevalidates(reverse('my_reservations'), self.approve)
+        self.assertRevalidates(reverse('my_reservations'), self.rename_car)
+
+    def test_car_detail(self):
+        url = reverse('car_detail', args=[self.car.pk])
+        self.assertRevalidates(url, self.rename_car)
+        self.assertContains(self.client.get(url), 'Vios XLE')
+
+    def test_reservation_detail(self):
+        self.assertRevalidates(reverse('reservation_detail', args=[self.reservation.pk]), self.approve)
+
+    def test_check_availability(self):
+        url = reverse('check_availability') + f'?car_id={self.car.pk}&start_date={date.today()}&end_date={date.today()}'
+        self.assertRevalidates(url, self.approve)
+
+
+class ApiTests(TestCase):
+    """
+    Who may do what through the JSON API, and what ?fields= returns.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        cls.customer = User.objects.create_user('customer', password='pass')
+        cls.other = User.objects.create_user('other', password='pass')
+        cls.car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        cls.hidden = Car.objects.create(brand='Honda', name='City', price_per_day=120, is_available=False)
+        cls.start = date.today() + timedelta(days=5)
+
+    def reserve(self, customer, status='pending'):
+        return Reservation.objects.create(
+            car=self.car, customer=customer, contact_email='c@example.com', contact_phone='0',
+            start_date=self.start, end_date=self.start + timedelta(days=1), status=status,
+        )
+
+    def send(self, method, url, data=None):
+        return getattr(self.client, method)(url, data, content_type='application/json')
+
+    def test_session_login_and_logout(self):
+        self.client = self.client_class(enforce_csrf_checks=True)
+        self.assertEqual(self.client.get(reverse('api_cars')).status_code, 401)
+
+        response = self.client.get(reverse('api_session'))
+        self.assertIsNone(response.json()['user'])
+        token = response.json()['csrf_token']
+        credentials = {'username': 'customer', 'password': 'pass'}
+        self.assertEqual(self.send('post', reverse('api_session'), credentials).status_code, 403)
+
+        response = self.client.post(reverse('api_session'), {**credentials, 'password': 'wrong'},
+                                    content_type='application/json', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post(reverse('api_session'), credentials,
+                                    content_type='application/json', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['username'], 'customer')
+        self.assertEqual(self.client.get(reverse('api_cars')).status_code, 200)
+
+        token = response.json()['csrf_token']
+        response = self.client.delete(reverse('api_session'), HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(reverse('api_cars')).status_code, 401)
+
+    def test_customers_cannot_change_cars(self):
+        self.client.force_login(self.customer)
+        url = reverse('api_car', args=[self.car.pk])
+        self.assertEqual(self.send('post', reverse('api_cars'), {'brand': 'Kia'}).status_code, 403)
+        self.assertEqual(self.send('patch', url, {'price_per_day': '1.00'}).status_code, 403)
+        self.assertEqual(self.client.delete(url).status_code, 403)
+        self.car.refresh_from_db()
+        self.assertEqual(self.car.price_per_day, 100)
+
+        ids = [car['id'] for car in self.client.get(reverse('api_cars')).json()['data']]
+        self.assertEqual(ids, [self.car.pk])
+        self.assertEqual(self.client.get(reverse('api_car', args=[999])).status_code, 404)
+
+    def test_staff_manage_cars(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('api_cars') + '?available=false')
+        self.assertEqual([car['id'] for car in response.json()['data']], [self.hidden.pk])
+
+        response = self.send('post', reverse('api_cars'), {
+            'brand': 'Kia', 'name': 'Picanto', 'price_per_day': '80.00',
+            'transmission': 'manual', 'fuel_type': 'gasoline', 'seats': 4, 'is_available': True,
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        created = response.json()['data']['id']
+        self.assertTrue(response['Location'].endswith(reverse('api_car', args=[created])))
+        self.assertEqual(self.send('post', reverse('api_cars'), {'brand': 'Kia'}).status_code, 400)
+
+        # PATCH keeps the fields it doesn't send
+        response = self.send('patch', reverse('api_car', args=[created]), {'price_per_day': '95.00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['price_per_day'], '95.00')
+        self.assertEqual(response.json()['data']['name'], 'Picanto')
+
+        self.assertEqual(self.client.delete(reverse('api_car', args=[created])).status_code, 204)
+        self.assertFalse(Car.objects.filter(pk=created).exists())
+
+    def test_customers_may_only_cancel_their_pending_reservations(self):
+        mine, theirs = self.reserve(self.customer), self.reserve(self.other, status='rejected')
+        self.client.force_login(self.customer)
+        url = reverse('api_reservation', args=[mine.pk])
+
+        ids = [row['id'] for row in self.client.get(reverse('api_reservations')).json()['data']]
+        self.assertEqual(ids, [mine.pk])
+        response = self.send('patch', reverse('api_reservation', args=[theirs.pk]), {'status': 'cancelled'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.send('patch', url, {'status': 'approved'}).status_code, 403)
+        self.assertEqual(self.send('patch', url, {'status': 'cancelled', 'total_amount': 0}).status_code, 400)
+
+        response = self.send('patch', url, {'status': 'cancelled'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['status'], 'cancelled')
+        self.assertEqual(self.send('patch', url, {'status': 'cancelled'}).status_code, 409)
+
+    def test_staff_set_reservation_statuses(self):
+        mine, theirs = self.reserve(self.customer), self.reserve(self.other, status='rejected')
+        self.client.force_login(self.staff)
+        ids = {row['id'] for row in self.client.get(reverse('api_reservations')).json()['data']}
+        self.assertEqual(ids, {mine.pk, theirs.pk})
+
+        url = reverse('api_reservation', args=[mine.pk])
+        response = self.send('patch', url, {'status': 'pending'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['details']['allowed'], list(api.STAFF_STATUSES))
+        self.assertEqual(self.send('patch', url, {'status': 'approved'}).status_code, 200)
+        mine.refresh_from_db()
+        self.assertEqual(mine.status, 'approved')
+
+    def test_overlapping_booking_is_a_conflict(self):
+        self.client.force_login(self.customer)
+        booking = {
+            'car': self.car.pk, 'contact_email': 'c@example.com', 'contact_phone': '+63 912 345 6789',
+            'start_date': str(self.start), 'end_date': str(self.start + timedelta(days=2)),
+        }
+        response = self.send('post', reverse('api_reservations'), booking)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['data']['status'], 'pending')
+
+        self.client.force_login(self.other)
+        response = self.send('post', reverse('api_reservations'), booking)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Reservation.objects.count(), 1)
+        hidden = self.send('post', reverse('api_reservations'), dict(booking, car=self.hidden.pk))
+        self.assertEqual(hidden.status_code, 400)
+
+    def test_sparse_fieldsets(self):
+        reservation = self.reserve(self.customer)
+        self.client.force_login(self.staff)
+        url = reverse('api_reservation', args=[reservation.pk])
+
+        data = self.client.get(url + '?fields=id,status,car.brand').json()['data']
+        self.assertEqual(data, {'id': reservation.pk, 'status': 'pending', 'car': {'brand': 'Toyota'}})
+        # A relation name stands for its default fields
+        data = self.client.get(url + '?fields=car,customer.username').json()['data']
+        self.assertEqual(data, {
+            'car': {'id': self.car.pk, 'brand': 'Toyota', 'name': 'Vios'},
+            'customer': {'username': 'customer'},
+        })
+        data = self.client.get(url).json()['data']
+        self.assertEqual(list(data), ['id', 'status', 'payment_status', 'start_date', 'end_date',
+                                      'pickup_time', 'dropoff_time', 'total_amount', 'car'])
+
+        response = self.client.get(url + '?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('car.brand', response.json()['details']['allowed'])
+
+    def test_image_links_derivatives_only(self):
+        upload = 'car_images/ab/' + 'ab' * 32 + '.jpg'
+        files = {'webp': 'car_images/ab/derived/card.webp', 'jpeg': 'car_images/ab/derived/card.jpg'}
+        Car.objects.filter(pk=self.car.pk).update(image=upload, image_variants={'source': upload, 'variants': {
+            'thumb': {'width': 160, 'height': 107, 'files': files},
+            'card': {'width': 480, 'height': 320, 'files': files},
+        }})
+        self.client.force_login(self.customer)
+        url = reverse('api_car', args=[self.car.pk]) + '?fields=image'
+        image = self.client.get(url).json()['data']['image']
+        self.assertEqual(list(image), ['card'])
+        self.assertEqual(image['card']['urls']['webp'], '/media/car_images/ab/derived/card.webp')
+        self.assertNotIn(upload, str(image))
+        self.reserve(self.customer)
+        data = self.client.get(reverse('api_reservations') + '?fields=car.image').json()['data']
+        self.assertEqual(data, [{'car': {'image': image}}])
+
+        # Derivatives of the previous image aren't offered for a new upload
+        Car.objects.filter(pk=self.car.pk).update(image='car_images/cd/' + 'cd' * 32 + '.jpg')
+        self.assertIsNone(self.client.get(url).json()['data']['image'])
+
+    def test_sparse_list_is_one_query(self):
+        for _ in range(3):
+            self.reserve(self.customer, status='completed')
+        self.client.force_login(self.staff)
+        # Session and user, then the page with the car joined in
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('api_reservations') + '?fields=id,car.name,customer')
+        self.assertEqual(len(response.json()['data']), 3)
+        self.assertEqual(response.json()['data'][0]['customer'], {'id': self.customer.pk, 'username': 'customer'})
+
+
+class LifecycleTests(TestCase):
+    """
+    The scheduled transitions use update(), which skips the Reservation
+    signals, so they must leave the counters, rollups and availability
+    index where the signals would have.
+    """
+
+    def setUp(self):
+        availability.index.clear()
+        self.addCleanup(availability.index.clear)
+        customer = User.objects.create_user('customer')
+        self.car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        today = date.today()
+
+        def reserve(start, days, status, amount=200):
+            return Reservation.objects.create(
+                car=self.car, customer=customer, contact_email='c@example.com', contact_phone='0',
+                start_date=start, end_date=start + timedelta(days=days), status=status,
+                total_amount=amount,
+            )
+        self.finished = reserve(today - timedelta(days=6), 2, 'approved', amount=300)
+        self.unanswered = reserve(today - timedelta(days=1), 3, 'pending')
+        self.stale = reserve(today + timedelta(days=20), 1, 'pending')
+        Reservation.objects.filter(pk=self.stale.pk).update(created_at=timezone.now() - timedelta(days=10))
+        self.upcoming = reserve(today + timedelta(days=3), 2, 'approved')
+        self.waiting = reserve(today + timedelta(days=8), 1, 'pending')
+        # Start from rollups that match the rows above, then load the index
+        analytics.rebuild()
+        availability.index.is_available(self.car.pk, today, today)
+        self.assertIs(self.free(self.stale), False)
+
+    def free(self, reservation):
+        return availability.index.cached_is_available(self.car.pk, reservation.start_date, reservation.end_date)
+
+    def rollups(self):
+        return set(CarDailyRollup.objects.values_list(
+            'car_id', 'day', 'rented', 'revenue', 'bookings', 'approved', 'rejected', 'cancelled',
+        ))
+
+    def test_transitions_keep_derived_data_in_step(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            completed = lifecycle.complete_finished(batch_size=1)
+            expired = lifecycle.expire_pending(batch_size=1)
+        self.assertEqual((completed, expired), (1, 2))
+        self.assertEqual(
+            dict(Reservation.objects.values_list('id', 'status')),
+            {self.finished.pk: 'completed', self.unanswered.pk: 'cancelled', self.stale.pk: 'cancelled',
+             self.upcoming.pk: 'approved', self.waiting.pk: 'pending'},
+        )
+
+        call_command('rebuild_stats', '--check', stdout=StringIO())
+
+        self.assertGreater(analytics.pending_changes(), 0)
+        analytics.refresh()
+        refreshed = self.rollups()
+        analytics.rebuild()
+        self.assertEqual(refreshed, self.rollups())
+
+        # Answered from the index as updated on commit, without a reload
+        self.assertIs(self.free(self.unanswered), True)
+        self.assertIs(self.free(self.stale), True)
+        self.assertIs(self.free(self.upcoming), False)
+        self.assertIs(self.free(self.waiting), False)
+
+
+class AnalyticsTests(TestCase):
+    """
+    Rollups (analytics.py) from the vectorized and the per-reservation
+    rebuild, and refresh() of recorded changes
+    """
+
+    def setUp(self):
+        customer = User.objects.create_user('customer')
+        self.vios = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        self.city = Car.objects.create(brand='Honda', name='City', price_per_day=120, fuel_type='diesel')
+        self.day = date(2025, 3, 10)
+
+        def reserve(car, offset, days, status, amount, made):
+            reservation = Reservation.objects.create(
+                car=car, customer=customer, contact_email='c@example.com', contact_phone='0',
+                start_date=self.on(offset), end_date=self.on(offset + days - 1), status=status,
+            )
+            # save() prices the booking; these need amounts that split unevenly
+            Reservation.objects.filter(pk=reservation.pk).update(
+                total_amount=amount, created_at=timezone.make_aware(datetime.combine(self.on(made), time(9))),
+            )
+            return reservation
+        # 100.00 over 3 days doesn't split evenly: 33.33, 33.33, 33.34
+        self.changed = reserve(self.vios, 0, 3, 'approved', 100, made=-5)
+        reserve(self.vios, 5, 2, 'completed', 250, made=-5)
+        reserve(self.vios, 1, 2, 'rejected', 200, made=-3)
+        reserve(self.city, 2, 4, 'approved', 480, made=-1)
+        reserve(self.city, 9, 1, 'cancelled', 120, made=0)
+        reserve(self.city, 12, 2, 'pending', 240, made=1)
+
+    def on(self, offset):
+        return self.day + timedelta(days=offset)
+
+    def rollups(self):
+        return {
+            (car_id, day): values for car_id, day, *values in CarDailyRollup.objects.values_list(
+                'car_id', 'day', 'rented', 'revenue', 'bookings', 'approved', 'rejected', 'cancelled',
+            )
+        }
+
+    def row_ids(self):
+        return {(car_id, day): pk for car_id, day, pk in CarDailyRollup.objects.values_list('car_id', 'day', 'pk')}
+
+    @unittest.skipUnless(occupancy.NUMPY_SUPPORT, "NumPy is not installed")
+    def test_vectorized_rebuild_matches_the_python_one(self):
+        analytics.rebuild()
+        vectorized = self.rollups()
+        with mock.patch.object(occupancy, 'NUMPY_SUPPORT', False):
+            analytics.rebuild()
+        self.assertEqual(vectorized, self.rollups())
+
+        self.assertEqual(vectorized[self.vios.pk, self.on(0)], [1, Decimal('33.33'), 0, 0, 0, 0])
+        self.assertEqual(vectorized[self.vios.pk, self.on(2)], [1, Decimal('33.34'), 0, 0, 0, 0])
+        self.assertEqual(vectorized[self.vios.pk, self.on(-5)], [0, 0, 2, 2, 0, 0])
+        self.assertEqual(vectorized[self.vios.pk, self.on(-3)], [0, 0, 1, 0, 1, 0])
+        self.assertEqual(vectorized[self.city.pk, self.on(0)], [0, 0, 1, 0, 0, 1])
+        self.assertNotIn((self.city.pk, self.on(12)), vectorized)
+
+    def test_refresh_recomputes_only_the_changed_days(self):
+        analytics.rebuild()
+        before = self.row_ids()
+
+        reservation = Reservation.objects.get(pk=self.changed.pk)
+        reservation.status = 'cancelled'
+        reservation.save()
+        # Its three rental days and the day it was made
+        self.assertEqual(analytics.refresh(), 4)
+
+        touched = {(self.vios.pk, self.on(offset)) for offset in (-5, 0, 1, 2)}
+        after = self.row_ids()
+        for key, pk in before.items():
+            if key not in touched:
+                self.assertEqual(after.get(key), pk, key)
+        self.assertEqual(set(after) - set(before), set())
+        self.assertNotIn((self.vios.pk, self.on(0)), after)
+
+        refreshed = self.rollups()
+        self.assertEqual(refreshed[self.vios.pk, self.on(-5)], [0, 0, 2, 1, 0, 1])
+        analytics.rebuild()
+        self.assertEqual(refreshed, self.rollups())
+
+class ImportFleetTests(TestCase):
+    """
+    import_fleet in one process (workers=0), on a file mixing new cars,
+    updates and invalid rows
+    """
+
+    def setUp(self):
+        self.vios = Car.objects.create(
+            brand='Toyota', name='Vios', price_per_day=100, description='Fleet since 2019',
+            seats=5, is_available=False,
+        )
+        self.city = Car.objects.create(brand='Honda', name='City', price_per_day=120)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # No description column; blank is_available cells leave it unset
+        self.path = f'{directory}/fleet.csv'
+        with open(self.path, 'w', newline='') as output:
+            output.write(
+                'brand,name,price_per_day,transmission,fuel_type,seats,is_available\n'
+                'Toyota,Vios,150,manual,gasoline,5,\n'
+                'Mitsubishi,Mirage,90,automatic,gasoline,5,no\n'
+                'Nissan,Almera,not a price,automatic,gasoline,5,yes\n'
+                'Honda,Jazz,110,automatic,hybrid,5,\n'
+            )
+
+    def import_fleet(self, **options):
+        stderr = StringIO()
+        call_command('import_fleet', self.path, workers=0, stdout=StringIO(), stderr=stderr, **options)
+        return stderr.getvalue()
+
+    def assertCountersExact(self):
+        self.assertEqual(
+            FleetStats.objects.filter(pk=1).values(*stats.COUNTER_FIELDS).get(), stats.compute_counters(),
+        )
+
+    def test_invalid_rows_stop_the_import(self):
+        with self.assertRaisesMessage(CommandError, '1 invalid rows; nothing imported'):
+            self.import_fleet()
+        self.assertEqual(Car.objects.count(), 2)
+
+    def test_creates_and_updates_only_the_given_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            errors = self.import_fleet(skip_invalid=True)
+        self.assertIn('Line 4: price_per_day', errors)
+        # The new cars in one INSERT, the update in an INSERT ... ON CONFLICT
+        car_writes = [query['sql'] for query in queries if query['sql'].startswith('INSERT INTO "cars_car"')]
+        self.assertEqual(len(car_writes), 2)
+        self.assertNotIn('ON CONFLICT', car_writes[0])
+        self.assertIn('ON CONFLICT("id") DO UPDATE', car_writes[1])
+        self.assertNotIn('"description" = EXCLUDED', car_writes[1])
+
+        vios = Car.objects.get(pk=self.vios.pk)
+        self.assertEqual(
+            (vios.price_per_day, vios.transmission, vios.description, vios.is_available, vios.seats),
+            (Decimal('150.00'), 'manual', 'Fleet since 2019', False, 5),
+        )
+        self.assertEqual(Car.objects.get(pk=self.city.pk).price_per_day, Decimal('120.00'))
+        self.assertEqual(
+            set(Car.objects.exclude(pk__in=[self.vios.pk, self.city.pk]).values_list(
+                'brand', 'name', 'fuel_type', 'is_available',
+            )),
+            {('Mitsubishi', 'Mirage', 'gasoline', False), ('Honda', 'Jazz', 'hybrid', True)},
+        )
+        self.assertFalse(Car.objects.filter(name='Almera').exists())
+        self.assertCountersExact()
+
+    def test_counters_follow_the_stored_rows(self):
+        match = import_fleet.Command.match
+
+        def match_then_toggle(command, *args):
+            result = match(command, *args)
+            # Staff make the car available between the read and the write
+            car = Car.objects.get(pk=self.vios.pk)
+            car.is_available = True
+            car.save()
+            return result
+
+        with mock.patch.object(import_fleet.Command, 'match', match_then_toggle):
+            self.import_fleet(skip_invalid=True)
+        self.assertIs(Car.objects.get(pk=self.vios.pk).is_available, True)
+        self.assertCountersExact()
+
+class LoadTestCommandTests(TestCase):
+    """
+    The load tests write to whatever database is configured, so they must
+    ask first outside development and leave nothing behind
+    """
+
+    def call(self, name, *args):
+        call_command(name, *args, stdout=StringIO(), stderr=StringIO())
+
+    def assertNothingLeft(self):
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Car.objects.exists())
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_refused_without_debug(self):
+        for name in ('booking_load_test', 'http_load_test'):
+            with self.subTest(name), self.assertRaisesMessage(CommandError, '--i-know'):
+                self.call(name)
+        self.assertNothingLeft()
+
+    def test_cleaned_up_after_a_failed_run(self):
+        for name, step in (('booking_load_test', '_run_round'), ('http_load_test', '_load')):
+            target = f'cars.management.commands.{name}.Command.{step}'
+            with self.subTest(name), mock.patch(target, side_effect=RuntimeError('boom')):
+                with self.assertRaisesMessage(RuntimeError, 'boom'):
+                    self.call(name, '--i-know')
+            self.assertNothingLeft()
+
+    @override_settings(DEBUG=True)
+    def test_kept_when_asked(self):
+        with mock.patch('cars.management.commands.http_load_test.Command._load', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.call('http_load_test', '--keep')
+        self.assertEqual(Reservation.objects.filter(car__brand='LoadTest').count(), 1)
+
+class DatabaseBrokerTests(TestCase):
+    """
+    Events published in one server process reach subscribers in another.
+    Each broker instance stands for a process; polling is driven by hand.
+    """
+
+    async def test_events_reach_other_processes(self):
+        listener, publisher = events.DatabaseBroker(poll_interval=0), events.DatabaseBroker(poll_interval=0)
+        self.assertTrue(publisher.has_subscribers(events.DASHBOARD_CHANNEL))
+        subscription = listener.subscribe(events.DASHBOARD_CHANNEL)
+        try:
+            await sync_to_async(publisher.publish)(events.DASHBOARD_CHANNEL, ('counters', {'total_cars': 3}))
+            await sync_to_async(publisher.publish)(events.reservations_channel(1), ('status', {'id': 1}))
+            self.assertIsNone(await subscription.get(timeout=0.01))
+
+            self.assertEqual(await sync_to_async(listener.poll)(), 2)
+            self.assertEqual(await subscription.get(timeout=1), ('counters', {'total_cars': 3}))
+            self.assertIsNone(await subscription.get(timeout=0.01))
+            # Later polls don't deliver an event twice
+            self.assertEqual(await sync_to_async(listener.poll)(), 0)
+        finally:
+            subscription.close()
+
+    def test_no_polling_without_subscribers(self):
+        broker = events.DatabaseBroker(poll_interval=0)
+        broker.publish(events.DASHBOARD_CHANNEL, ('counters', {}))
+        with self.assertNumQueries(0):
+            self.assertEqual(broker.poll(), 0)
+
+
+class DashboardFeedTests(TestCase):
+    """
+    The live dashboard feed carries every customer's bookings, so only
+    staff get it
+    """
+
+    def setUp(self):
+        self.url = reverse('admin_dashboard_events')
+        # The stream itself is the broker's business (DatabaseBrokerTests)
+        stream = mock.patch.object(events, 'dashboard_stream', return_value=iter(()))
+        self.stream = stream.start()
+        self.addCleanup(stream.stop)
+
+    async def test_refused_unless_staff(self):
+        customer = await sync_to_async(User.objects.create_user)('customer', password='pass')
+        response = await self.async_client.get(self.url)
+        self.assertRedirects(response, f"{reverse('admin:login')}?next={self.url}", fetch_redirect_response=False)
+
+        await self.async_client.aforce_login(customer)
+        response = await self.async_client.get(self.url)
+        self.assertRedirects(response, f"{reverse('admin:login')}?next={self.url}", fetch_redirect_response=False)
+        self.stream.assert_not_called()
+
+    async def test_streamed_to_staff(self):
+        staff = await sync_to_async(User.objects.create_user)('staff', password='pass', is_staff=True)
+        await self.async_client.aforce_login(staff)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.stream.assert_called_once_with(live=True)
+
+@override_settings(ROOT_URLCONF='carrental.async_urls')
+class AsyncViewTests(TestCase):
+    """
+    The async read-only pages (served under ASGI) answer like their sync
+    counterparts, including conditional GET.
+    """
+
+    def setUp(self):
+        self.customer = User.objects.create_user('customer', password='pass')
+        self.car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        start = date.today() + timedelta(days=5)
+        self.reservation = Reservation.objects.create(
+            car=self.car, customer=self.customer, contact_email='c@example.com', contact_phone='0',
+            start_date=start, end_date=start + timedelta(days=1), total_amount=200,
+        )
+        self.urls = {
+            'car_list': reverse('car_list'),
+            'car_detail': reverse('car_detail', args=[self.car.pk]),
+            'my_reservations': reverse('my_reservations'),
+            'reservation_detail': reverse('reservation_detail', args=[self.reservation.pk]),
+            'check_availability': reverse('check_availability')
+            + f'?car_id={self.car.pk}&start_date={start}&end_date={start}',
+        }
+
+    def approve(self):
+        self.reservation.status = 'approved'
+        self.reservation.save()
+
+    def rename_car(self):
+        self.car.name = 'Vios XLE'
+        self.car.save()
+
+    async def test_pages_are_served_by_async_views(self):
+        await self.async_client.aforce_login(self.customer)
+        for name, url in self.urls.items():
+            with self.subTest(name):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIs(response.resolver_match.func, async_urls.ASYNC_VIEWS[name])
+        self.assertEqual(response.json()['available'], False)
+        self.assertEqual(response.json()['total_days'], 1)
+
+    async def test_catalog_follows_car_changes(self):
+        await self.async_client.aforce_login(self.customer)
+        self.assertContains(await self.async_client.get(self.urls['car_list']), 'Vios')
+        # Served from the cached fragments, then rendered again for the new version
+        self.assertContains(await self.async_client.get(self.urls['car_list']), 'Vios')
+        await sync_to_async(self.rename_car)()
+        self.assertContains(await self.async_client.get(self.urls['car_list']), 'Vios XLE')
+        self.assertContains(await self.async_client.get(self.urls['car_detail']), 'Vios XLE')
+
+    async def assertRevalidates(self, url, change):
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        await sync_to_async(change)()
+        response = await self.async_client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    async def test_conditional_get(self):
+        await self.async_client.aforce_login(self.customer)
+        await self.assertRevalidates(self.urls['my_reservations'], self.approve)
+        await self.assertRevalidates(self.urls['my_reservations'], self.rename_car)
+        await self.assertRevalidates(self.urls['reservation_detail'], self.approve)
+        await self.assertRevalidates(self.urls['car_detail'], self.rename_car)
+        await self.assertRevalidates(self.urls['check_availability'], self.approve)
+
+
+class CarImageTests(TestCase):
+    """
+    Derivatives (images.py) in content-addressed storage (storage.py) and
+    the job queue that builds them (image_queue.py)
+    """
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        # Jobs are run by hand with run_next(), not by worker threads
+        workers = mock.patch.object(image_queue, 'start_workers')
+        workers.start()
+        self.addCleanup(workers.stop)
+
+    def upload(self, **save_options):
+        buffer = BytesIO()
+        Image.new('RGB', (640, 480), (200, 30, 30)).save(buffer, 'JPEG', quality=90, **save_options)
+        return car_image_storage.save('car_images/photo.jpg', ContentFile(buffer.getvalue()))
+
+    def car_with(self, source):
+        car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        Car.objects.filter(pk=car.pk).update(image=source, image_variants=images.build_variants(source))
+        return Car.objects.get(pk=car.pk)
+
+    def derived(self, car):
+        return {name for variant in car.image_variants['variants'].values() for name in variant['files'].values()}
+
+    def test_same_pixels_different_metadata_keep_their_own_derivatives(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera Maker'
+        plain, tagged = self.upload(), self.upload(exif=exif.tobytes())
+        self.assertNotEqual(plain, tagged)
+        first, second = self.car_with(plain), self.car_with(tagged)
+        self.assertTrue(self.derived(first).isdisjoint(self.derived(second)))
+        for name in self.derived(first):
+            self.assertTrue(name.startswith(f'car_images/derived/{storage.name_digest(plain)}/'), name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertFalse(car_image_storage.exists(plain))
+        self.assertFalse(any(car_image_storage.exists(name) for name in self.derived(first)))
+        self.assertTrue(all(car_image_storage.exists(name) for name in self.derived(second)))
+
+    def derived_exist(self, car):
+        return [car_image_storage.exists(name) for name in self.derived(car)]
+
+    def test_queue_builds_then_shares_derivatives(self):
+        photo = self.upload()
+        first = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100, image=photo)
+        self.assertTrue(image_queue.run_next())
+        self.assertEqual(ImageJob.objects.get(car=first).status, 'done')
+        first.refresh_from_db()
+        self.assertEqual(first.image_variants['source'], photo)
+        self.assertTrue(all(self.derived_exist(first)))
+
+        # Same bytes, same blob; its derivatives are reused, not rebuilt
+        self.assertEqual(self.upload(), photo)
+        second = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100, image=photo)
+        with mock.patch.object(images, 'build_variants') as build:
+            self.assertTrue(image_queue.run_next())
+        build.assert_not_called()
+        second.refresh_from_db()
+        self.assertEqual(second.image_variants, first.image_variants)
+        self.assertFalse(image_queue.run_next())
+
+    def test_files_are_released_with_the_last_car_using_them(self):
+        photo = self.upload()
+        first, second = self.car_with(photo), self.car_with(photo)
+        self.assertEqual(first.image_variants, second.image_variants)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(car_image_storage.exists(photo))
+        self.assertTrue(all(self.derived_exist(second)))
+
+        # Replacing the image releases the old one, now that nobody uses it
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera Maker'
+        with self.captureOnCommitCallbacks(execute=True):
+            second.image = self.upload(exif=exif.tobytes())
+            second.save()
+        self.assertFalse(car_image_storage.exists(photo))
+        self.assertFalse(any(self.derived_exist(first)))
+
+    def test_claim_takes_the_oldest_pending_job_once(self):
+        car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        older = ImageJob.objects.create(car=car, source='car_images/a.jpg')
+        newer = ImageJob.objects.create(car=car, source='car_images/b.jpg')
+        ImageJob.objects.filter(pk=older.pk).update(created_at=timezone.now() - timedelta(minutes=1))
+
+        claimed = image_queue.claim()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (older.pk, 'running', 1))
+        self.assertEqual(image_queue.claim().pk, newer.pk)
+        self.assertIsNone(image_queue.claim())
+
+    def test_racing_workers_claim_a_job_once(self):
+        car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        job = ImageJob.objects.create(car=car, source='car_images/a.jpg')
+        first = QuerySet.first
+        rival = {}
+
+        def first_then_rival(queryset):
+            found = first(queryset)
+            if queryset.model is ImageJob and not rival:
+                # The other worker claims the job between our SELECT and UPDATE
+                rival['job'] = None
+                rival['job'] = image_queue.claim()
+            return found
+
+        with mock.patch.object(QuerySet, 'first', first_then_rival):
+            self.assertIsNone(image_queue.claim())
+        self.assertEqual(rival['job'].pk, job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('running', 1))
+
+    def test_requeue_stale(self):
+        car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        stale = ImageJob.objects.create(car=car, source='car_images/a.jpg', status='running')
+        busy = ImageJob.objects.create(car=car, source='car_images/b.jpg', status='running')
+        ImageJob.objects.filter(pk=stale.pk).update(
+            updated_at=timezone.now() - image_queue.STALE_AFTER - timedelta(minutes=1),
+        )
+        self.assertEqual(image_queue.requeue_stale(), 1)
+        self.assertEqual(ImageJob.objects.get(pk=stale.pk).status, 'pending')
+        self.assertEqual(ImageJob.objects.get(pk=busy.pk).status, 'running')
+
+
+@unittest.skipUnless(receipts.PDF_SUPPORT, "xhtml2pdf is not installed")
+class ReceiptTests(TestCase):
+    """
+    Stored receipts (receipts.py) and the streamed ZIP export
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        cls.customer = User.objects.create_user('customer', password='pass', last_name='Santos')
+        cls.car = Car.objects.create(brand='Toyota', name='Vios', price_per_day=100)
+        cls.start = date.today() + timedelta(days=3)
+
+    def reserve(self, offset=0, status='pending'):
+        start = self.start + timedelta(days=offset * 3)
+        return Reservation.objects.create(
+            car=self.car, customer=self.customer, contact_email='c@example.com', contact_phone='0',
+            start_date=start, end_date=start + timedelta(days=1), total_amount=200, status=status,
+        )
+
+    def stored(self, reservation):
+        directory = str(reservation.pk)
+        if not receipts.storage.exists(directory):
+            return []
+        return [f'{directory}/{name}' for name in receipts.storage.listdir(directory)[1]]
+
+    def save(self, reservation, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            for field, value in fields.items():
+                setattr(reservation, field, value)
+            reservation.save()
+
+    def test_stored_per_version_from_approval_on(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation = self.reserve()
+        self.assertEqual(self.stored(reservation), [])
+
+        self.save(reservation, status='approved')
+        name = f"{reservation.pk}/{reservation.updated_at:%Y%m%d%H%M%S%f}-{receipts.LAYOUT}.pdf"
+        self.assertEqual(self.stored(reservation), [name])
+        with receipts.storage.open(name, 'rb') as pdf:
+            self.assertEqual(pdf.read(5), b'%PDF-')
+        self.assertEqual(receipts.get_receipt(reservation), name)
+
+        # Any change is a new version: the old file goes, a new one is made
+        self.save(reservation, special_requests='Child seat')
+        self.assertEqual(self.stored(reservation), [receipts.receipt_name(reservation)])
+        self.assertNotEqual(self.stored(reservation), [name])
+
+        self.save(reservation, status='cancelled')
+        self.assertEqual(self.stored(reservation), [])
+
+        self.save(reservation, status='completed')
+        self.assertEqual(len(self.stored(reservation)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.delete()
+        self.assertEqual(self.stored(reservation), [])
+
+    def test_zip_export(self):
+        # One receipt already stored, the rest rendered during the export
+        with self.captureOnCommitCallbacks(execute=True):
+            stored = self.reserve(0, status='approved')
+        exported = [stored, *(self.reserve(i, status='completed') for i in range(1, 4))]
+        self.reserve(4, status='pending')
+        self.reserve(40, status='approved')  # outside the range
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('export_receipts'), {
+            'start_date': self.start, 'end_date': self.start + timedelta(days=12),
+        })
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            entries = archive.infolist()
+            self.assertEqual(
+                [entry.filename for entry in entries],
+                [receipts.download_filename(reservation) for reservation in exported],
+            )
+            for entry in entries:
+                self.assertEqual(entry.compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(archive.read(entry)[:5], b'%PDF-')
+        # Rendered receipts were stored for next time
+        self.assertTrue(all(self.stored(reservation) for reservation in exported))
+
+    def test_export_window_bounds_renders_in_flight(self):
+        reservations = list(
+            Reservation.objects.select_related('car', 'customer').filter(
+                pk__in=[self.reserve(i, status='approved').pk for i in range(5)],
+            ).order_by('id')
+        )
+        pool = InlineExecutor()
+        in_flight = []
+        with mock.patch.object(receipts, 'executor', lambda: pool):
+            for collected, (reservation, pdf) in enumerate(receipts.iter_pdfs(reservations, window=2), 1):
+                # Submitted and not yet handed over, counting this one
+                in_flight.append(pool.submitted - collected + 1)
+                self.assertEqual(pdf[:5], b'%PDF-')
+        self.assertEqual(pool.submitted, 5)
+        self.assertEqual(max(in_flight), 2)
@@ -0,0 +1,75 @@
+"""
+Change stamps kept in the database.
+
+A stamp is the time (in nanoseconds) something last changed: the fleet,
+one customer's reservations, one car's bookings. Writers touch them in
+the same transaction as the change (signals.py, lifecycle.py), so every
+server process sees the new stamp exactly when the change commits.
+Readers fold them into cache keys (catalog.py) and HTTP validators
+(conditional.py) for one primary-key lookup. A stamp that was never
+touched reads as 0.
+"""
+import time
+from datetime import datetime, timezone
+
+from .models import ChangeStamp
+
+
+def stamps(*keys):
+    """
+    {key: stamp} for the given keys, in one query
+    """
+    found = dict(ChangeStamp.objects.filter(key__in=keys).values_list('key', 'value'))
+    return {key: found.get(key, 0) for key in keys}
+
+
+async def astamps(*keys):
+    found = {
+        key: value async for key, value in
+        ChangeStamp.objects.filter(key__in=keys).values_list('key', 'value')
+    }
+    return {key: found.get(key, 0) for key in keys}
+
+
+def stamp(key):
+    return stamps(key)[key]
+
+
+def touch(*keys):
+    """
+    Set the keys' stamps to now, as part of the current transaction. Keys
+    are written in sorted order, so concurrent writers lock their rows in
+    the same order.
+    """
+    now = time.time_ns()
+    ChangeStamp.objects.bulk_create(
+        [ChangeStamp(key=key, value=now) for key in sorted(set(keys))],
+        update_conflicts=True, unique_fields=['key'], update_fields=['value'],
+    )
+
+
+def as_datetime(value):
+    return datetime.fromtimestamp(value / 1e9, tz=timezone.utc)
+
+
+def fleet_key():
+    return 'stamp:fleet'
+
+
+def customer_reservations_key(user_id):
+    return f'stamp:reservations:customer:{user_id}'
+
+
+CAR_RESERVATIONS_PREFIX = 'stamp:reservations:car:'
+
+
+def car_reservations_key(car_id):
+    return f'{CAR_RESERVATIONS_PREFIX}{car_id}'
+
+
+def car_reservation_stamps():
+    """
+    {car_id: stamp} for every car whose reservations have ever changed
+    """
+    rows = ChangeStamp.objects.filter(key__startswith=CAR_RESERVATIONS_PREFIX).values_list('key', 'value')
+    return {int(key[len(CAR_RESERVATIONS_PREFIX):]): value for key, value in rows}
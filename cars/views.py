@@ -3,26 +3,47 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.utils import timezone
-from datetime import date, datetime
-from django.db.models import Sum, Q
-from django.http import HttpResponse, FileResponse, JsonResponse
-from django.template.loader import get_template
+from datetime import date, datetime, timedelta
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.conf import settings
-from io import BytesIO
-from .models import Car, Reservation, User
-from .forms import CarForm, RegisterForm, ReservationForm
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.static import serve
+from .models import Car, Reservation
+from .forms import (
+    AnalyticsForm, CarExportForm, CarForm, CarSearchForm, ReceiptExportForm, RegisterForm,
+    ReservationExportForm, ReservationForm,
+)
+from . import analytics, availability, catalog, conditional, events, exports, pagination, receipts, stats, storage
 import json
-from django.core import serializers
-
-# Try to import xhtml2pdf, but handle gracefully if not installed
-try:
-    from xhtml2pdf import pisa
-    PDF_SUPPORT = True
-except ImportError:
-    PDF_SUPPORT = False
+
+# xhtml2pdf is optional (see pdf.py)
+from .pdf import PDF_SUPPORT
+if not PDF_SUPPORT:
     print("Warning: xhtml2pdf not installed. Receipt downloads will be disabled.")
 
+# Page sizes for the keyset-paginated admin lists
+RESERVATIONS_PER_PAGE = 25
+CARS_PER_PAGE = 24
+
+# Columns of the staff CSV/JSONL exports (values() lookups)
+RESERVATION_EXPORT_FIELDS = (
+    'id', 'created_at', 'status', 'payment_status', 'start_date', 'end_date',
+    'pickup_time', 'dropoff_time', 'total_amount', 'car_id', 'car__brand', 'car__name',
+    'customer_id', 'customer__username', 'customer__email', 'contact_email', 'contact_phone',
+    'special_requests',
+)
+CAR_EXPORT_FIELDS = (
+    'id', 'created_at', 'brand', 'name', 'price_per_day', 'is_available', 'transmission',
+    'fuel_type', 'seats', 'description',
+)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv', exports.csv_stream),
+    'jsonl': ('application/x-ndjson', 'jsonl', exports.jsonl_stream),
+}
+EXPORT_CHUNK_SIZE = 2000
+
 # --- Authentication ---
 def register_view(request):
     if request.method == 'POST':
@@ -62,51 +83,26 @@ def admin_dashboard(request):
     print("=== DEBUG: Admin Dashboard View Called ===")
     print(f"User: {request.user}, Is Staff: {request.user.is_staff}")
     
-    # Get statistics
-    total_cars = Car.objects.count()
-    available_cars = Car.objects.filter(is_available=True).count()
-    total_reservations = Reservation.objects.count()
-    pending_reservations = Reservation.objects.filter(status='pending').count()
-    approved_reservations = Reservation.objects.filter(status='approved').count()
-    completed_reservations = Reservation.objects.filter(status='completed').count()
-    cancelled_reservations = Reservation.objects.filter(status='cancelled').count()
-    total_users = User.objects.filter(is_staff=False).count()
-    
-    # Revenue statistics
-    total_revenue = Reservation.objects.filter(
-        Q(status='approved') | Q(status='completed')
-    ).aggregate(total=Sum('total_amount'))['total'] or 0
+    # Get statistics (materialized counters, see stats.py)
+    context = stats.dashboard_stats()
     
-    print(f"Stats - Cars: {total_cars}, Available: {available_cars}")
-    print(f"Stats - Reservations: {total_reservations}, Pending: {pending_reservations}")
+    print(f"Stats - Cars: {context['total_cars']}, Available: {context['available_cars']}")
+    print(f"Stats - Reservations: {context['total_reservations']}, Pending: {context['pending_reservations']}")
     
-    # Get latest data
-    cars = Car.objects.all().order_by('-created_at')[:10]
-    reservations = Reservation.objects.all().order_by('-created_at')[:10]
+    # Get latest data (pre-joined and trimmed to the columns the tables show)
+    cars = Car.objects.only(
+        'id', 'brand', 'name', 'price_per_day', 'is_available', 'image', 'image_variants', 'created_at'
+    ).order_by('-created_at')[:10]
+    reservations = Reservation.objects.select_related('car', 'customer').only(
+        'id', 'start_date', 'end_date', 'total_amount', 'status', 'created_at',
+        'car__brand', 'car__name', 'customer__username',
+    ).order_by('-created_at')[:10]
     
-    # Convert to JSON
-    cars_data = serializers.serialize('json', cars)
-    reservations_data = serializers.serialize('json', reservations)
-    
-    print(f"Cars in context: {len(cars)}")
-    print(f"Reservations in context: {len(reservations)}")
-    
-    context = {
+    context.update({
         'cars': cars,
         'reservations': reservations,
-        'cars_json': cars_data,
-        'reservations_json': reservations_data,
-        'total_cars': total_cars,
-        'available_cars': available_cars,
-        'total_reservations': total_reservations,
-        'pending_reservations': pending_reservations,
-        'approved_reservations': approved_reservations,
-        'completed_reservations': completed_reservations,
-        'cancelled_reservations': cancelled_reservations,
-        'total_revenue': total_revenue,
-        'total_users': total_users,
         'current_date': datetime.now().strftime("%B %d, %Y"),
-    }
+    })
     
     print("=== DEBUG: Rendering Template ===")
     return render(request, 'cars/admin_dashboard.html', context)
@@ -124,7 +120,7 @@ def add_car(request):
         seats = request.POST.get('seats', 4)
         is_available = request.POST.get('is_available') == 'on'
         
-        car = Car.objects.create(
+        Car.objects.create(
             brand=brand,
             name=name,
             description=description,
@@ -133,13 +129,10 @@ def add_car(request):
             fuel_type=fuel_type,
             seats=seats,
             is_available=is_available,
-            created_by=request.user
+            created_by=request.user,
+            image=request.FILES.get('image'),
         )
         
-        if 'image' in request.FILES:
-            car.image = request.FILES['image']
-            car.save()
-        
         messages.success(request, f'Car {brand} {name} added successfully!')
         return redirect('admin_dashboard')
     
@@ -186,8 +179,8 @@ def delete_car_admin(request, car_id):
 # --- NEW: View Reservation Details ---
 @staff_member_required
 def view_reservation(request, reservation_id):
-    reservation = get_object_or_404(Reservation, id=reservation_id)
-    days = (reservation.end_date - reservation.start_date).days
+    reservation = get_object_or_404(Reservation.objects.select_related('car', 'customer'), id=reservation_id)
+    days = reservation.car.total_days(reservation.start_date, reservation.end_date)
     subtotal = reservation.car.price_per_day * days
     
     context = {
@@ -230,12 +223,32 @@ def toggle_car_status(request, car_id):
 @staff_member_required
 def all_reservations(request):
     status_filter = request.GET.get('status', '')
+    reservations = Reservation.objects.select_related('car', 'customer').only(
+        'id', 'created_at', 'contact_email', 'start_date', 'end_date', 'pickup_time',
+        'total_amount', 'payment_status', 'status',
+        'car__brand', 'car__name', 'car__transmission', 'car__fuel_type', 'car__price_per_day',
+        'customer__username', 'customer__email',
+    )
     if status_filter:
-        reservations = Reservation.objects.filter(status=status_filter).order_by('-created_at')
-    else:
-        reservations = Reservation.objects.all().order_by('-created_at')
+        reservations = reservations.filter(status=status_filter)
+    
+    # Keyset pagination on (created_at, id); cost doesn't grow with depth
+    reservations = pagination.paginate(
+        reservations,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        per_page=RESERVATIONS_PER_PAGE,
+    )
+    
+    # Whole-table counters from the FleetStats row, not a scan per page load
+    reservation_stats = stats.fleet_reservation_stats()
     
-    context = {'reservations': reservations, 'status_filter': status_filter}
+    context = {
+        'reservations': reservations,
+        'status_filter': status_filter,
+        'reservation_stats': reservation_stats,
+        'filtered_count': reservation_stats.get(status_filter, reservation_stats['total']),
+    }
     return render(request, 'cars/all_reservations.html', context)
 
 # --- NEW: All Cars View for Admin ---
@@ -247,18 +260,25 @@ def admin_car_list(request):
     status_filter = request.GET.get('status', '')
     
     if status_filter == 'available':
-        cars = Car.objects.filter(is_available=True).order_by('-created_at')
+        cars = Car.objects.filter(is_available=True)
     elif status_filter == 'unavailable':
-        cars = Car.objects.filter(is_available=False).order_by('-created_at')
+        cars = Car.objects.filter(is_available=False)
     else:
-        cars = Car.objects.all().order_by('-created_at')
+        cars = Car.objects.all()
+    
+    cars = pagination.paginate(
+        cars,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        per_page=CARS_PER_PAGE,
+    )
     
-    # Calculate stats
-    cars_available = Car.objects.filter(is_available=True).count()
+    counters = stats.dashboard_stats()
     
     context = {
         'cars': cars,
-        'cars_available': cars_available,
+        'cars_available': counters['available_cars'],
+        'cars_total': counters['total_cars'],
         'status_filter': status_filter,
     }
     return render(request, 'cars/admin_car_list.html', context)
@@ -308,14 +328,19 @@ def book_car(request, car_id):
                 reservation.end_date
             )
             reservation.status = 'pending'  # Default status
-            reservation.save()
             
-            messages.success(request, 
-                f"Car {car.brand} {car.name} booked successfully! "
-                f"Your reservation ID is #{reservation.id}. "
-                f"We have sent a confirmation to {reservation.contact_email}. "
-                f"Total amount: ₱{reservation.total_amount}")
-            return redirect('my_reservations')  # Redirect to my_reservations after booking
+            # Locked overlap check + save; losers of a race get a form error
+            try:
+                availability.book(reservation)
+            except availability.BookingConflict as exc:
+                form.add_error(None, str(exc))
+            else:
+                messages.success(request, 
+                    f"Car {car.brand} {car.name} booked successfully! "
+                    f"Your reservation ID is #{reservation.id}. "
+                    f"We have sent a confirmation to {reservation.contact_email}. "
+                    f"Total amount: ₱{reservation.total_amount}")
+                return redirect('my_reservations')  # Redirect to my_reservations after booking
     else:
         # Pre-fill email if user has one
         initial_data = {
@@ -332,14 +357,30 @@ def book_car(request, car_id):
 # --- User Car List ---
 @login_required
 def car_list(request):
-    cars = Car.objects.filter(is_available=True)
-    
-    # Get user's reservations
-    user_reservations = Reservation.objects.filter(customer=request.user).order_by('-created_at')
+    # Search mode: any query parameter switches to date/spec filtering
+    search_form = CarSearchForm(request.GET or None)
+    if search_form.is_bound and search_form.is_valid():
+        cars = availability.search_cars(**search_form.cleaned_data)
+        catalog_context = {}
+    else:
+        # Plain catalog: rendered from cached fragments, so on a hit this
+        # queryset is never evaluated
+        cars = Car.objects.filter(is_available=True)
+        catalog_context = catalog.context()
+    
+    # Get user's latest reservations (the page shows five)
+    user_reservations = list(
+        Reservation.objects.filter(customer=request.user).select_related('car').only(
+            'id', 'start_date', 'end_date', 'total_amount', 'status', 'created_at',
+            'car__brand', 'car__name',
+        ).order_by('-created_at')[:5]
+    )
     
     return render(request, 'cars/car_list.html', {
         'cars': cars,
-        'user_reservations': user_reservations
+        'search_form': search_form,
+        'user_reservations': user_reservations,
+        **catalog_context,
     })
 
 # --- User CRUD for cars ---
@@ -391,49 +432,48 @@ def car_delete(request, pk):
 # --- ENHANCED: User Reservations with Statistics and Receipts ---
 # --- ENHANCED: User Reservations with Statistics and Receipts ---
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.my_reservations_etag,
+           last_modified_func=conditional.my_reservations_last_modified)
 def my_reservations(request):
     """
     Enhanced view for users to see all their reservations with statistics
     """
     reservations = Reservation.objects.filter(
         customer=request.user
-    ).select_related('car').order_by('-created_at')
+    ).select_related('car', 'customer').order_by('-created_at')
     
     # Calculate rental days for each reservation
     for reservation in reservations:
-        reservation.rental_days = (reservation.end_date - reservation.start_date).days
-    
-    # Calculate statistics
-    pending_count = reservations.filter(status='pending').count()
-    approved_count = reservations.filter(status='approved').count()
-    total_count = reservations.count()
+        reservation.rental_days = reservation.car.total_days(reservation.start_date, reservation.end_date)
     
-    # Calculate total spent (only approved/completed reservations)
-    total_spent = reservations.filter(
-        Q(status='approved') | Q(status='completed')
-    ).aggregate(total=Sum('total_amount'))['total'] or 0
+    # Calculate statistics (total spent counts approved/completed only)
+    reservation_stats = stats.reservation_stats(reservations)
     
     context = {
         'reservations': reservations,
-        'pending_count': pending_count,
-        'approved_count': approved_count,
-        'total_count': total_count,
-        'total_spent': total_spent,
+        'pending_count': reservation_stats['pending'],
+        'approved_count': reservation_stats['approved'],
+        'total_count': reservation_stats['total'],
+        'total_spent': reservation_stats['revenue'],
     }
     return render(request, 'cars/my_reservations.html', context)
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.reservation_detail_etag,
+           last_modified_func=conditional.reservation_detail_last_modified)
 def reservation_detail(request, pk):
     """
     View reservation details for users
     """
     reservation = get_object_or_404(
-        Reservation, 
+        Reservation.objects.select_related('car', 'customer'), 
         pk=pk, 
         customer=request.user
     )
     
     # Calculate days
-    days = (reservation.end_date - reservation.start_date).days
+    days = reservation.car.total_days(reservation.start_date, reservation.end_date)
     daily_rate = reservation.car.price_per_day
     subtotal = daily_rate * days
     
@@ -472,7 +512,7 @@ def cancel_reservation(request, pk):
 @login_required
 def download_receipt(request, pk):
     """
-    Generate and download PDF receipt for approved/completed reservations
+    Download the PDF receipt for approved/completed reservations
     """
     # Check if PDF support is available
     if not PDF_SUPPORT:
@@ -480,57 +520,25 @@ def download_receipt(request, pk):
         return redirect('my_reservations')
     
     reservation = get_object_or_404(
-        Reservation, 
+        Reservation.objects.select_related('car', 'customer'), 
         pk=pk, 
         customer=request.user
     )
     
     # Only allow receipt download for approved or completed reservations
-    if reservation.status not in ['approved', 'completed']:
+    if reservation.status not in receipts.RECEIPT_STATUSES:
         messages.error(request, 'Receipt is only available for approved or completed reservations.')
         return redirect('my_reservations')
     
-    # Calculate rental details
-    days = (reservation.end_date - reservation.start_date).days
-    daily_rate = reservation.car.price_per_day
-    subtotal = daily_rate * days
-    
-    # Get any additional fees (if your model has these fields)
-    insurance_fee = getattr(reservation, 'insurance_fee', 0)
-    extra_fees = getattr(reservation, 'extra_fees', 0)
-    
-    # Template context
-    context = {
-        'reservation': reservation,
-        'days': days,
-        'daily_rate': daily_rate,
-        'subtotal': subtotal,
-        'insurance_fee': insurance_fee,
-        'extra_fees': extra_fees,
-        'receipt_date': timezone.now(),
-        'company_name': 'Car Moto',
-        'company_address': '21 Metro Avenue, Manila, Philippines',
-        'company_phone': '+63 (2) 8123 4567',
-        'company_email': 'fleet@carmanager.ph',
-        'company_vat': '123-456-789-000',
-        'total_amount': reservation.total_amount,
-    }
-    
-    # Render PDF
-    template = get_template('cars/receipt_pdf.html')
-    html = template.render(context)
-    result = BytesIO()
-    
-    # Create PDF
-    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
-    
-    if not pdf.err:
-        # Generate filename
-        filename = f'receipt_{reservation.id}_{reservation.customer.last_name}_{reservation.start_date.strftime("%Y%m%d")}.pdf'
-        
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+    # Served from storage; rendered now only if the background worker hasn't
+    name = receipts.get_receipt(reservation)
+    if name:
+        return FileResponse(
+            receipts.storage.open(name, 'rb'),
+            as_attachment=True,
+            filename=receipts.download_filename(reservation),
+            content_type='application/pdf',
+        )
     
     messages.error(request, 'Error generating PDF receipt.')
     return redirect('my_reservations')
@@ -545,50 +553,189 @@ def admin_download_receipt(request, pk):
         messages.error(request, 'PDF generation is not available.')
         return redirect('admin_dashboard')
     
-    reservation = get_object_or_404(Reservation, pk=pk)
-    
-    # Calculate rental details
-    days = (reservation.end_date - reservation.start_date).days
-    daily_rate = reservation.car.price_per_day
-    subtotal = daily_rate * days
-    
-    context = {
-        'reservation': reservation,
-        'days': days,
-        'daily_rate': daily_rate,
-        'subtotal': subtotal,
-        'receipt_date': timezone.now(),
-        'company_name': 'Car Moto',
-        'company_address': '21 Metro Avenue, Manila, Philippines',
-        'company_phone': '+63 (2) 8123 4567',
-        'company_email': 'fleet@carmanager.ph',
-        'company_vat': '123-456-789-000',
-        'admin_download': True,
-    }
+    reservation = get_object_or_404(Reservation.objects.select_related('car', 'customer'), pk=pk)
     
-    template = get_template('cars/receipt_pdf.html')
-    html = template.render(context)
-    result = BytesIO()
-    
-    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
-    
-    if not pdf.err:
+    name = receipts.get_receipt(reservation)
+    if name:
         filename = f'receipt_admin_{reservation.id}_{reservation.customer.last_name}.pdf'
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+        return FileResponse(
+            receipts.storage.open(name, 'rb'),
+            as_attachment=True,
+            filename=filename,
+            content_type='application/pdf',
+        )
     
     messages.error(request, 'Error generating PDF receipt.')
     return redirect('admin_dashboard')
 
+# --- NEW: Admin Bulk Receipt Export ---
+@staff_member_required
+def export_receipts(request):
+    """
+    Stream a ZIP of every receipt matching a date range and status
+    """
+    if not PDF_SUPPORT:
+        messages.error(request, 'PDF generation is not available.')
+        return redirect('all_reservations')
+    
+    form = ReceiptExportForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, 'Choose a valid date range to export receipts.')
+        return redirect('all_reservations')
+    
+    start_date = form.cleaned_data['start_date']
+    end_date = form.cleaned_data['end_date']
+    status = form.cleaned_data['status']
+    
+    reservations = Reservation.objects.select_related('car', 'customer').filter(
+        start_date__gte=start_date,
+        start_date__lte=end_date,
+        status__in=[status] if status else receipts.RECEIPT_STATUSES,
+    ).order_by('start_date', 'id').iterator(chunk_size=200)
+    
+    files = (
+        (receipts.download_filename(reservation), pdf)
+        for reservation, pdf in receipts.iter_pdfs(reservations)
+        if pdf is not None
+    )
+    response = StreamingHttpResponse(exports.zip_stream(files), content_type='application/zip')
+    response['Content-Disposition'] = (
+        f'attachment; filename="receipts_{start_date:%Y%m%d}_{end_date:%Y%m%d}.zip"'
+    )
+    return response
+
+# --- NEW: Admin Data Exports (CSV / JSON Lines) ---
+def _export_response(queryset, fields, name, export_format):
+    # values() rows off a chunked cursor: memory stays flat however many rows
+    content_type, extension, stream = EXPORT_FORMATS[export_format]
+    rows = queryset.order_by('id').values(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    response = StreamingHttpResponse(stream(fields, rows), content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}_{date.today():%Y%m%d}.{extension}"'
+    )
+    return response
+
+@staff_member_required
+def export_reservations(request):
+    """
+    Stream reservations matching a status and rental date range as CSV or JSONL
+    """
+    form = ReservationExportForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, 'Choose a valid format, status and date range to export reservations.')
+        return redirect('all_reservations')
+    
+    reservations = Reservation.objects.all()
+    if form.cleaned_data['status']:
+        reservations = reservations.filter(status=form.cleaned_data['status'])
+    if form.cleaned_data['start_date']:
+        reservations = reservations.filter(start_date__gte=form.cleaned_data['start_date'])
+    if form.cleaned_data['end_date']:
+        reservations = reservations.filter(start_date__lte=form.cleaned_data['end_date'])
+    
+    return _export_response(
+        reservations, RESERVATION_EXPORT_FIELDS, 'reservations', form.cleaned_data['format'],
+    )
+
+@staff_member_required
+def export_cars(request):
+    """
+    Stream cars matching an availability filter and date added as CSV or JSONL
+    """
+    form = CarExportForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, 'Choose a valid format, status and date range to export cars.')
+        return redirect('admin_car_list')
+    
+    cars = Car.objects.all()
+    if form.cleaned_data['status']:
+        cars = cars.filter(is_available=form.cleaned_data['status'] == 'available')
+    if form.cleaned_data['start_date']:
+        cars = cars.filter(created_at__date__gte=form.cleaned_data['start_date'])
+    if form.cleaned_data['end_date']:
+        cars = cars.filter(created_at__date__lte=form.cleaned_data['end_date'])
+    
+    return _export_response(cars, CAR_EXPORT_FIELDS, 'cars', form.cleaned_data['format'])
+
+# --- NEW: Admin Fleet Analytics ---
+@staff_member_required
+def analytics_report(request):
+    """
+    Utilization, revenue and booking outcomes from the daily rollups
+    """
+    if request.method == 'POST':
+        refreshed = analytics.refresh()
+        messages.success(request, f'Analytics refreshed ({refreshed} car-days recomputed).')
+        return redirect(request.get_full_path())
+    
+    today = date.today()
+    form = AnalyticsForm(request.GET or {
+        'start_date': today - timedelta(days=29),
+        'end_date': today,
+        'group': 'brand',
+        'period': 'week',
+    })
+    rows, totals = [], None
+    if form.is_valid():
+        start_date = form.cleaned_data['start_date']
+        end_date = form.cleaned_data['end_date']
+        rows = analytics.report(
+            start_date, end_date, group=form.cleaned_data['group'], period=form.cleaned_data['period'],
+        )
+        totals = analytics.totals(start_date, end_date)
+    
+    return render(request, 'cars/admin_analytics.html', {
+        'form': form,
+        'rows': rows,
+        'totals': totals,
+        'pending_changes': analytics.pending_changes(),
+    })
+
 # --- Car Details ---
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.car_detail_etag,
+           last_modified_func=conditional.car_detail_last_modified)
 def car_detail(request, car_id):
-    car = get_object_or_404(Car, id=car_id)
-    return render(request, 'cars/car_detail.html', {'car': car})
+    version = catalog.fleet_version()
+    car = catalog.get_car(car_id, version)
+    return render(request, 'cars/car_detail.html', {'car': car, **catalog.context(version)})
+
+# --- SSE: Live Reservation Status ---
+@login_required
+async def reservation_events(request):
+    """
+    Server-Sent Events stream of the logged-in user's reservation statuses
+    """
+    user = await request.auser()
+    # Under WSGI a response can't stay open without pinning a worker thread,
+    # so send the snapshot and let the browser reconnect later instead
+    live = isinstance(request, ASGIRequest)
+    response = StreamingHttpResponse(
+        events.reservation_stream(user.pk, live=live), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# --- SSE: Live Admin Dashboard ---
+@staff_member_required
+async def admin_dashboard_events(request):
+    """
+    Server-Sent Events stream of new reservations and counter changes
+    """
+    live = isinstance(request, ASGIRequest)
+    response = StreamingHttpResponse(
+        events.dashboard_stream(live=live), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 # --- AJAX: Check Car Availability ---
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.check_availability_etag)
 def check_availability(request):
     """
     AJAX endpoint to check if a car is available for given dates
@@ -598,23 +745,58 @@ def check_availability(request):
     end_date = request.GET.get('end_date')
     
     try:
-        car = Car.objects.get(id=car_id)
+        car = Car.objects.only('price_per_day').get(id=car_id)
         start = datetime.strptime(start_date, '%Y-%m-%d').date()
         end = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        # Check for conflicting reservations
-        conflicting = Reservation.objects.filter(
-            car=car,
-            status__in=['pending', 'approved'],
-            start_date__lte=end,
-            end_date__gte=start
-        ).exists()
+        # Check for conflicting reservations against the in-memory index,
+        # reloading the car if another process has booked it since
+        stamp = conditional.car_reservations_stamp(request, car.id)
+        available = availability.is_car_available(car.id, start, end, stamp=stamp)
         
         return JsonResponse({
-            'available': not conflicting,
+            'available': available,
             'price_per_day': float(car.price_per_day),
-            'total_days': (end - start).days,
+            'total_days': car.total_days(start, end),
             'total_price': float(car.total_price(start, end))
         })
-    except (Car.DoesNotExist, ValueError):
-        return JsonResponse({'error': 'Invalid parameters'}, status=400)
\ No newline at end of file
+    except (Car.DoesNotExist, ValueError, TypeError):
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
+
+# --- AJAX: Search Available Cars ---
+@login_required
+def search_availability(request):
+    """
+    AJAX endpoint returning every car free for the given dates and filters
+    """
+    form = CarSearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'error': 'Invalid parameters', 'details': form.errors}, status=400)
+    
+    filters = form.cleaned_data
+    start, end = filters['start_date'], filters['end_date']
+    cars = availability.search_cars(**filters).values(
+        'id', 'brand', 'name', 'price_per_day', 'transmission', 'fuel_type', 'seats'
+    )
+    
+    total_days = Car.total_days(start, end) if start and end else None
+    results = []
+    for car in cars:
+        entry = dict(car, price_per_day=float(car['price_per_day']))
+        if total_days is not None:
+            entry['total_days'] = total_days
+            entry['total_price'] = float(car['price_per_day'] * total_days)
+        results.append(entry)
+    
+    return JsonResponse({'count': len(results), 'cars': results})
+
+# --- Media files ---
+def media(request, path):
+    """
+    Serve MEDIA_ROOT (development); content-addressed car images never
+    change under their name, so browsers may cache them forever
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if storage.is_content_addressed(path):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response